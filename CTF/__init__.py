@@ -5,15 +5,23 @@ CTF比赛推送插件
 数据来源: 
 - 国内: https://raw.githubusercontent.com/ProbiusOfficial/Hello-CTFtime/main/CN.json
 - 全球: https://raw.githubusercontent.com/ProbiusOfficial/Hello-CTFtime/main/Global.json
+- CTFtime: https://ctftime.org/api/v1/events/ (可选)
 """
-from datetime import datetime, timedelta
+from datetime import datetime
 from nonebot.log import logger
 from pathlib import Path
-import requests
+from typing import Any, Dict, List, Optional, Tuple
 from nonebot import get_bot, require, get_plugin_config, on_command
 from nonebot.adapters.onebot.v11 import GroupMessageEvent, Message, Bot
+from nonebot.adapters.onebot.v11.permission import GROUP_ADMIN, GROUP_OWNER
+from nonebot.permission import SUPERUSER
 from nonebot.params import CommandArg
 from .config import Config
+from .cache import FeedCache, RenderCache
+from .sources import (Aggregator, Contest, SOURCE_TYPES, STATUS_NAMES, STATUS_RUNNING, STATUS_UPCOMING,
+                      build_sources)
+from .subscription import ContestView, Subscription, SubscriptionStore, parse_subscription_args
+from .diff import FeedDiffer, ContestEvent, EVENT_ADDED, EVENT_REMOVED
 from nonebot.plugin import PluginMetadata
 from .rule import *
 
@@ -26,6 +34,11 @@ __plugin_meta__ = PluginMetadata(
     
     手动查询: 
     - /查询赛事 [权重]: 查询国内和国际CTF赛事信息，国际赛事权重默认为50
+    
+    订阅设置(群管理员):
+    - /赛事订阅: 查看本群的推送设置
+    - /赛事订阅 权重=50 范围=国内|国际|全部 形式=jeopardy,awd 标签=Web 提前=3: 修改本群的推送设置
+    - /取消赛事订阅: 本群不再接收推送
     """,
     homepage="https://github.com/CG-Jue/NoneBotPlugins",
     type="application",
@@ -44,18 +57,33 @@ DEFAULT_LIMIT_TIME = 30  # 默认检查时间为30分钟
 DEFAULT_WAIT_TIME = 3  # 默认提前3天推送
 DEFAULT_GROUP_LIST = []  # 默认为空列表
 DEFAULT_GLOBAL_MIN_WEIGHT = 50  # 默认全球CTF权重阈值
+DEFAULT_CN_URL = "https://raw.githubusercontent.com/ProbiusOfficial/Hello-CTFtime/main/CN.json"
+DEFAULT_GLOBAL_URL = "https://raw.githubusercontent.com/ProbiusOfficial/Hello-CTFtime/main/Global.json"
+DEFAULT_CTFTIME_URL = "https://ctftime.org/api/v1/events/"
+DEFAULT_SOURCES = ["hello-ctftime-cn", "hello-ctftime-global"]  # 默认数据源，排在前面的优先
+DEFAULT_SOURCE_TIMEOUT = 10  # 每个数据源的超时时间，单位为秒
 
 try:
     limit_time = config.CONFIG.get("LIMIT_TIME", DEFAULT_LIMIT_TIME)
     wait_time = config.CONFIG.get("SEND_TIME", DEFAULT_WAIT_TIME)
     group_list = config.CONFIG.get("SEND_LIST", DEFAULT_GROUP_LIST)
     global_min_weight = config.CONFIG.get("GLOBAL_MIN_WEIGHT", DEFAULT_GLOBAL_MIN_WEIGHT)
-    logger.debug(f"配置项已加载: 检查时间：{limit_time}, 推送时间：{wait_time}, 发送的群聊：{group_list}, 比赛权重：{global_min_weight}")
+    cn_url = config.CONFIG.get("CN_URL", DEFAULT_CN_URL)
+    global_url = config.CONFIG.get("GLOBAL_URL", DEFAULT_GLOBAL_URL)
+    ctftime_url = config.CONFIG.get("CTFTIME_URL", DEFAULT_CTFTIME_URL)
+    source_names = config.CONFIG.get("SOURCES", DEFAULT_SOURCES)
+    source_timeout = config.CONFIG.get("SOURCE_TIMEOUT", DEFAULT_SOURCE_TIMEOUT)
+    logger.debug(f"配置项已加载: 检查时间：{limit_time}, 推送时间：{wait_time}, 发送的群聊：{group_list}, 比赛权重：{global_min_weight}, 数据源：{source_names}")
 except (AttributeError, KeyError):
     limit_time = DEFAULT_LIMIT_TIME
     wait_time = DEFAULT_WAIT_TIME
     group_list = DEFAULT_GROUP_LIST
     global_min_weight = DEFAULT_GLOBAL_MIN_WEIGHT
+    cn_url = DEFAULT_CN_URL
+    global_url = DEFAULT_GLOBAL_URL
+    ctftime_url = DEFAULT_CTFTIME_URL
+    source_names = DEFAULT_SOURCES
+    source_timeout = DEFAULT_SOURCE_TIMEOUT
     logger.debug(f"配置项加载失败，使用默认值: 检查时间：{limit_time}, 推送时间：{wait_time}, 发送的群聊：{group_list}, 比赛权重：{global_min_weight}")
 
 # 确保db.txt文件存在
@@ -65,199 +93,265 @@ if not DB_PATH.exists():
         f.write("")
 
  
-def format_time(time_str: str) -> str:
+def format_time(time_obj: Optional[datetime]) -> str:
     """
-    格式化时间字符串，只保留月日时分
+    格式化时间，只保留月日时分
     
     Args:
-        time_str: 时间字符串，格式为"2023年10月01日 12:00"
+        time_obj: 时间
     
     Returns:
-        格式化后的时间字符串，如"10月01日 12:00"
+        格式化后的时间字符串，如"10月01日 12:00"，没有时间时返回"未知"
     """
-    time_obj = datetime.strptime(time_str, "%Y年%m月%d日 %H:%M")
-    return time_obj.strftime("%m月%d日 %H:%M")
+    return time_obj.strftime("%m月%d日 %H:%M") if time_obj else "未知"
+
+
+def format_period(start: Optional[datetime], end: Optional[datetime]) -> str:
+    """格式化时间段，如"04月12日 01:00 - 04月13日 01:00" """
+    return f"{format_time(start)} - {format_time(end)}"
+
+
+def source_label(contest: Contest) -> str:
+    """比赛的数据来源说明，合并后的比赛列出所有数据源"""
+    labels = []
+    for name in contest.sources:
+        label = SOURCE_TYPES[name].label if name in SOURCE_TYPES else name
+        if label not in labels:
+            labels.append(label)
+    return ", ".join(labels)
+
 
+# 多数据源聚合，每个数据源独立超时和熔断
+aggregator = Aggregator(build_sources(
+    source_names,
+    {"hello-ctftime-cn": cn_url, "hello-ctftime-global": global_url, "ctftime": ctftime_url},
+    timeout=source_timeout,
+))
 
-def format_global_time(time_str: str) -> str:
+# 合并后的赛事数据快照，过期时间与检查间隔一致；数据变化时丢弃已渲染的查询结果
+feed_cache = FeedCache(aggregator.fetch_all, ttl=limit_time * 60)
+render_cache = RenderCache()
+feed_cache.on_refresh(render_cache.clear)
+
+
+def load_push_records() -> set:
+    """读取推送记录，启动时只读取一次"""
+    try:
+        with open(DB_PATH, "r", encoding="utf-8") as f:
+            return {x.strip() for x in f if x.strip()}
+    except IOError as e:
+        logger.error(f"读取推送记录文件失败: {e}")
+        return set()
+
+
+push_records = load_push_records()
+
+
+def has_pushed(key: str, group_id: int, ctf_name: str = "") -> bool:
     """
-    格式化全球赛事时间字符串，转为短格式
+    判断比赛是否已经推送到某个群
     
     Args:
-        time_str: 时间字符串，格式为"2025-04-12 01:00:00 - 2025-04-13 01:00:00 UTC+8"
-    
-    Returns:
-        格式化后的时间字符串
+        key: 比赛的稳定标识
+        group_id: 群号
+        ctf_name: 比赛名称，用于兼容旧版本按名称记录的推送记录
     """
-    # 提取开始和结束时间
-    start_time_str, end_time_str = time_str.split(" - ")
-    start_time = datetime.strptime(start_time_str.strip(), "%Y-%m-%d %H:%M:%S")
-    end_time = datetime.strptime(end_time_str.split(" UTC")[0].strip(), "%Y-%m-%d %H:%M:%S")
-    
-    # 格式化为简短形式
-    return f"{start_time.strftime('%m月%d日 %H:%M')} - {end_time.strftime('%m月%d日 %H:%M')}"
+    if f"{group_id}|{key}" in push_records:
+        return True
+    return bool(ctf_name) and (ctf_name in push_records or f"{group_id}|{ctf_name}" in push_records)
 
 
-def calculate_time_difference(start_time: str) -> timedelta:
+def is_ctf_has_push(key: str, group_id: int, ctf_name: str = "") -> bool:
     """
-    计算当前时间和比赛开始报名时间之间的差值
+    判断比赛是否已经推送过
     
     Args:
-        start_time: 比赛开始报名时间，格式为"2023年10月01日 12:00"
+        key: 比赛的稳定标识
+        group_id: 推送的群号
+        ctf_name: 比赛名称，旧版本记录的纯比赛名称对所有群生效
         
     Returns:
-        时间差值 (timedelta)
+        True: 比赛未推送过，已将标识添加到记录
+        False: 比赛已推送过
     """
-    start_datetime = datetime.strptime(start_time, "%Y年%m月%d日 %H:%M")
-    return start_datetime - datetime.now()
+    if has_pushed(key, group_id, ctf_name):
+        return False
+    
+    record = f"{group_id}|{key}"
+    try:
+        with open(DB_PATH, "a", encoding="utf-8") as f:
+            f.write(f"{record}\n")
+    except IOError as e:
+        logger.error(f"写入推送记录文件失败: {e}")
+        return False
+    push_records.add(record)
+    return True
 
 
-def calculate_global_time_difference(time_str: str) -> timedelta:
+def to_contest_view(contest: Contest) -> Optional[ContestView]:
     """
-    计算当前时间和全球比赛开始时间之间的差值
+    提取订阅匹配需要的比赛属性
     
     Args:
-        time_str: 时间字符串，格式为"2025-04-12 01:00:00 - 2025-04-13 01:00:00 UTC+8"
+        contest: 比赛
         
     Returns:
-        时间差值 (timedelta)
+        ContestView或None(数据不完整)
     """
-    start_time_str = time_str.split(" - ")[0].strip()
-    start_datetime = datetime.strptime(start_time_str, "%Y-%m-%d %H:%M:%S")
-    return start_datetime - datetime.now()
+    # 国内比赛按报名开始时间推送，国际比赛按比赛开始时间推送
+    start = contest.reg_start if not contest.is_global and contest.reg_start else contest.start
+    if start is None:
+        return None
+    return ContestView(
+        key=contest.key,
+        name=contest.name,
+        is_global=contest.is_global,
+        weight=contest.weight,
+        format=contest.format,
+        tags=contest.tags if not contest.is_global else "",
+        start=start,
+        raw=contest,
+    )
+
+
+# 相邻快照比较，只在数据变化时重新解析发生变化的比赛
+feed_differ = FeedDiffer(to_contest_view, Path(__file__).parent / "snapshot.json")
+pending_events: List[ContestEvent] = []
+
+@feed_cache.on_refresh
+def diff_feed(version: int) -> None:
+    """快照更新时计算变化事件，等待定时任务发送"""
+    pending_events.extend(feed_differ.update(feed_cache.peek()))
 
 
-def fetch_ctf_data(is_global: bool = False) -> dict:
+async def collect_push_candidates() -> list:
+    """获取所有即将开始的比赛，国内比赛排在国际比赛之前"""
+    await feed_cache.ensure_fresh()
+    return feed_differ.views(upcoming_only=True)
+
+
+def format_push_message(contest: ContestView, sub: Subscription) -> str:
     """
-    获取CTF数据
+    格式化推送消息
     
     Args:
-        is_global: 是否获取全球CTF数据
-    
+        contest: 比赛
+        sub: 目标群的订阅设置
+        
     Returns:
-        CTF比赛数据或None(获取失败)
+        推送消息
     """
-    url = "https://raw.githubusercontent.com/ProbiusOfficial/Hello-CTFtime/main/Global.json" if is_global else "https://raw.githubusercontent.com/ProbiusOfficial/Hello-CTFtime/main/CN.json"
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.debug(f"获取CTF数据失败: {e}")
-        return None
-    
+    ctf: Contest = contest.raw
+    if not contest.is_global:
+        return (
+            f"（¯﹃¯）{sub.lead_days * 24}小时内开始报名的国内比赛:\n"
+            f"比赛名称: {ctf.name}\n"
+            f"报名时间: \n {format_period(ctf.reg_start, ctf.reg_end)}\n"
+            f"比赛时间: \n {format_period(ctf.start, ctf.end)}\n"
+            f"比赛链接: {ctf.link}\n"
+            f"数据来源: {source_label(ctf)}\n"
+            f"获取其余赛事 /查询赛事 权重(可选)\n"
+        )
+    return (
+        f"（¯﹃¯）{sub.lead_days * 24}小时内开始的国际比赛:\n"
+        f"比赛名称: {ctf.name}\n"
+        f"比赛时间（UTC+8）: \n {format_period(ctf.start, ctf.end)}\n"
+        f"比赛形式: {ctf.format or '未知'}\n"
+        f"比赛权重: {ctf.weight_text or '未知'}（仅>={sub.min_weight:g}）\n"
+        f"赛事主办: {ctf.organizer or '未知'}\n"
+        f"比赛链接: {ctf.link}\n"
+        f"数据来源: {source_label(ctf)}\n"
+        f"获取其余赛事 /查询赛事 权重(可选)"
+    )
 
-def is_to_push(time_str: str, wait_time: int, is_global: bool = False) -> bool:
+
+async def push_ctf() -> Dict[int, str]:
     """
-    判断比赛是否在推送时间范围内
-    
-    Args:
-        time_str: 比赛时间字符串
-        wait_time: 提前多少天推送
-        is_global: 是否为全球比赛
+    按群订阅获取需要推送的CTF比赛信息，每个群每次最多推送一场
         
     Returns:
-        是否应该推送
+        {群号: 格式化的比赛信息}
     """
-    if is_global:
-        time_difference = calculate_global_time_difference(time_str)
-    else:
-        time_difference = calculate_time_difference(time_str)
-    return time_difference <= timedelta(days=wait_time)
+    # 定时任务每次都强制刷新快照
+    await feed_cache.refresh()
+    
+    matched = subscriptions.index.match(await collect_push_candidates())
+    
+    messages = {}
+    for group_id, contests in matched.items():
+        sub = subscriptions.get(group_id)
+        for contest in contests:
+            if is_ctf_has_push(contest.key, group_id, contest.name):
+                messages[group_id] = format_push_message(contest, sub)
+                break
+    return messages
 
 
-def is_ctf_has_push(ctf_name: str) -> bool:
+def format_change_value(value: Any) -> str:
+    """格式化变更通知中的字段值"""
+    if isinstance(value, datetime):
+        return format_time(value)
+    if not value:
+        return "无"
+    return STATUS_NAMES.get(value, str(value))
+
+
+def format_change_message(event: ContestEvent) -> str:
     """
-    判断比赛是否已经推送过
+    格式化比赛变更通知
     
     Args:
-        ctf_name: 比赛名称
+        event: 变更或移除事件
         
     Returns:
-        True: 比赛未推送过，已将名称添加到记录
-        False: 比赛已推送过
+        通知消息
     """
-    try:
-        with open(DB_PATH, "r", encoding="utf-8") as f:
-            db_list = [x.strip() for x in f.readlines()]
-        
-        if ctf_name in db_list:
-            return False
-        
-        with open(DB_PATH, "a", encoding="utf-8") as f:
-            f.write(f"{ctf_name}\n")
-        return True
-    except IOError as e:
-        print(f"读写推送记录文件失败: {e}")
-        return False
+    region = "国际" if event.is_global else "国内"
+    if event.kind == EVENT_REMOVED:
+        return (
+            f"（⊙ˍ⊙）{region}比赛已从赛程中移除:\n"
+            f"比赛名称: {event.name}\n"
+            f"数据来源: {source_label(event.contest)}"
+        )
+    
+    lines = [f"（⊙ˍ⊙）{region}比赛信息有变更:", f"比赛名称: {event.name}"]
+    for label, (before, after) in event.changes.items():
+        lines.append(f"{label}: {format_change_value(before)} → {format_change_value(after)}")
+    lines.append(f"数据来源: {source_label(event.contest)}")
+    return "\n".join(lines)
 
 
-def push_ctf(wait_days: int) -> str:
+def collect_change_notices() -> Dict[int, List[str]]:
     """
-    获取即将开始的CTF比赛信息
+    取出待发送的变化事件，生成发给已推送过该比赛的群的通知
     
-    Args:
-        wait_days: 提前多少天推送
-        
     Returns:
-        格式化的比赛信息或None(无需推送)
+        {群号: 通知消息列表}
     """
-    # 先检查国内CTF
-    ctf_data = fetch_ctf_data(is_global=False)
-    if ctf_data:
-        upcoming_ctf_list = []
-        
-        # 查找符合条件的国内比赛
-        for ctf in ctf_data["data"]["result"]:
-            if (ctf.get("status") == "即将开始" and 
-                is_to_push(ctf["reg_time_start"], wait_days) and 
-                is_ctf_has_push(ctf["name"])):
-                upcoming_ctf_list.append(ctf)
-        
-        # 有符合条件的国内比赛
-        if upcoming_ctf_list:
-            ctf = upcoming_ctf_list[0]
-            msg = (
-                f"（¯﹃¯）{wait_days * 24}小时内开始报名的国内比赛:\n"
-                f"比赛名称: {ctf['name']}\n"
-                f"报名时间: \n {format_time(ctf['reg_time_start'])} - {format_time(ctf['reg_time_end'])}\n"
-                f"比赛时间: \n {format_time(ctf['comp_time_start'])} - {format_time(ctf['comp_time_end'])}\n"
-                f"比赛链接: {ctf['link']}\n"
-                f"数据来源: Hello-CTFtime\n"
-                f"获取其余赛事 /查询赛事 权重(可选)\n"
-            )
-            return msg
-    
-    # 检查全球CTF
-    global_data = fetch_ctf_data(is_global=True)
-    if global_data:
-        upcoming_global_ctf_list = []
-        
-        # 查找符合条件的全球比赛
-        for ctf in global_data:
-            if (ctf.get("比赛状态") == "oncoming" and 
-                float(ctf.get("比赛权重", "0")) >= global_min_weight and
-                is_to_push(ctf["比赛时间"], wait_days, is_global=True) and 
-                is_ctf_has_push(ctf["比赛名称"])):
-                upcoming_global_ctf_list.append(ctf)
-        
-        # 有符合条件的全球比赛
-        if upcoming_global_ctf_list:
-            ctf = upcoming_global_ctf_list[0]
-            msg = (
-                f"（¯﹃¯）{wait_days * 24}小时内开始的国际比赛:\n"
-                f"比赛名称: {ctf['比赛名称']}\n"
-                f"比赛时间（UTC+8）: \n {format_global_time(ctf['比赛时间'])}\n"
-                f"比赛形式: {ctf.get('比赛形式', '未知')}\n"
-                f"比赛权重: {ctf.get('比赛权重', '未知')}（仅>={global_min_weight}）\n"
-                f"赛事主办: {ctf.get('赛事主办', '未知').split(' (')[0]}\n"
-                f"比赛链接: {ctf['比赛链接']}\n"
-                f"数据来源: Hello-CTFtime\n"
-                f"获取其余赛事 /查询赛事 权重(可选)"
-            )
-            return msg
-    
-    return None
+    events = pending_events[:]
+    pending_events.clear()
+    
+    notices: Dict[int, List[str]] = {}
+    for event in events:
+        # 新增的比赛由 push_ctf 按订阅推送
+        if event.kind == EVENT_ADDED:
+            continue
+        # 已结束的比赛从数据源中移除属于正常情况
+        if event.kind == EVENT_REMOVED and event.old.status != STATUS_UPCOMING:
+            continue
+        msg = format_change_message(event)
+        for sub in subscriptions.all():
+            if sub.enabled and has_pushed(event.key, sub.group_id, event.name):
+                notices.setdefault(sub.group_id, []).append(msg)
+    return notices
+
+
+# 各群的订阅设置，SEND_LIST中的群默认使用全局配置
+subscriptions = SubscriptionStore(
+    Path(__file__).parent / "subscriptions.json",
+    default_groups=group_list,
+    default_factory=lambda gid: Subscription(gid, min_weight=global_min_weight, lead_days=wait_time),
+)
 
 
 # 注册定时任务
@@ -266,38 +360,62 @@ scheduler = require("nonebot_plugin_apscheduler").scheduler
 @scheduler.scheduled_job("interval", minutes=limit_time)
 async def ctf_push_job():
     """定时任务，每limit_time分钟执行一次"""
-    msg = push_ctf(wait_time)
-    # logger.debug(f"CTF推送消息: {msg}")
-    if not msg:
+    messages = {group_id: [msg] for group_id, msg in (await push_ctf()).items()}
+    for group_id, notices in collect_change_notices().items():
+        messages.setdefault(group_id, []).extend(notices)
+    if not messages:
         logger.debug("没有符合条件的CTF比赛，无需推送")
         return
     bot = get_bot()
     if not bot:
         logger.debug("获取bot实例失败")
         return
-    for group_id in group_list:
-        try:
-            await bot.send_msg(group_id=group_id, message=str(msg))
-        except Exception as e:
-            logger.debug(f"向群 {group_id} 发送消息失败: {e}")
+    for group_id, msgs in messages.items():
+        for msg in msgs:
+            try:
+                await bot.send_msg(group_id=group_id, message=str(msg))
+            except Exception as e:
+                logger.debug(f"向群 {group_id} 发送消息失败: {e}")
 
 # 查询命令注册
 query_ctf = on_command("/查询赛事", priority=5, rule=check_if_403)
 
-def get_start_time(ctf: dict) -> datetime:
+
+def filter_contests(contests: Optional[List[Contest]], is_global: bool, min_weight: float = 0.0) -> dict:
     """
-    从比赛时间中提取开始时间
+    筛选正在进行和即将开始的比赛
     
     Args:
-        ctf: CTF比赛数据
+        contests: 合并后的比赛列表
+        is_global: 筛选国际比赛还是国内比赛
+        min_weight: 国际比赛最小权重阈值
         
     Returns:
-        比赛开始时间的datetime对象
+        {"upcoming": [...], "ongoing": [...]}，按开始时间排序
     """
-    time_str = ctf["比赛时间"].split(" - ")[0].strip()
-    return datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
+    upcoming_ctfs = []
+    ongoing_ctfs = []
+    
+    for ctf in contests or []:
+        if ctf.is_global != is_global:
+            continue
+        if ctf.status not in (STATUS_UPCOMING, STATUS_RUNNING):  # 跳过已结束的比赛
+            continue
+        if is_global and ctf.weight < min_weight:
+            continue
+        if ctf.status == STATUS_UPCOMING:
+            upcoming_ctfs.append(ctf)
+        else:
+            ongoing_ctfs.append(ctf)
+    
+    # 根据开始时间排序，越早开始的排在越前面
+    upcoming_ctfs.sort(key=lambda c: c.start)
+    ongoing_ctfs.sort(key=lambda c: c.start)
+    
+    return {"upcoming": upcoming_ctfs, "ongoing": ongoing_ctfs}
+
 
-def fetch_global_ctf_data(min_weight: float = 50.0) -> dict:
+async def fetch_global_ctf_data(min_weight: float = 50.0) -> dict:
     """
     获取全球CTF比赛数据并按权重过滤
     
@@ -307,35 +425,15 @@ def fetch_global_ctf_data(min_weight: float = 50.0) -> dict:
     Returns:
         符合条件的CTF比赛列表
     """
-    global_data = fetch_ctf_data(is_global=True)
-    if not global_data:
-        return {"upcoming": [], "ongoing": []}
-    
-    upcoming_ctfs = []
-    ongoing_ctfs = []
-    
-    for ctf in global_data:
-        if ctf.get("比赛状态") not in ["oncoming", "nowrunning"]:  # 跳过已结束的比赛
-            continue
-        
-        try:
-            weight = float(ctf.get("比赛权重", "0"))
-        except ValueError:
-            weight = 0.0
-            
-        if weight >= min_weight:
-            if ctf.get("比赛状态") == "oncoming":
-                upcoming_ctfs.append(ctf)
-            else:
-                ongoing_ctfs.append(ctf)
-    
-    # 根据开始时间排序，越早开始的排在越前面
-    upcoming_ctfs.sort(key=get_start_time)
-    ongoing_ctfs.sort(key=get_start_time)
-    
-    return {"upcoming": upcoming_ctfs, "ongoing": ongoing_ctfs}
+    return filter_contests(await feed_cache.get(), is_global=True, min_weight=min_weight)
 
-def format_ctf_message(ctf: dict, is_upcoming: bool) -> str:
+
+async def fetch_cn_ctf_data() -> dict:
+    """获取国内CTF比赛数据"""
+    return filter_contests(await feed_cache.get(), is_global=False)
+
+
+def format_ctf_message(ctf: Contest, is_upcoming: bool) -> str:
     """
     格式化CTF比赛信息
     
@@ -349,94 +447,57 @@ def format_ctf_message(ctf: dict, is_upcoming: bool) -> str:
     status = "即将开始" if is_upcoming else "正在进行"
     
     return (
-        f"[{status}] {ctf['比赛名称']}\n"
-        f"比赛时间: \n {format_global_time(ctf['比赛时间'])}\n"
-        f"比赛形式: {ctf.get('比赛形式', '未知')}\n"
-        f"比赛权重: {ctf.get('比赛权重', '未知')}\n"
-        f"赛事主办: {ctf.get('赛事主办', '未知').split(' (')[0]}\n"
-        f"比赛链接: {ctf['比赛链接']}\n"
-        f"数据来源: Hello-CTFtime"
+        f"[{status}] {ctf.name}\n"
+        f"比赛时间: \n {format_period(ctf.start, ctf.end)}\n"
+        f"比赛形式: {ctf.format or '未知'}\n"
+        f"比赛权重: {ctf.weight_text or '未知'}\n"
+        f"赛事主办: {ctf.organizer or '未知'}\n"
+        f"比赛链接: {ctf.link}\n"
+        f"数据来源: {source_label(ctf)}"
     )
 
-def get_cn_start_time(ctf: dict) -> datetime:
-    """从国内比赛时间中提取开始时间"""
-    try:
-        time_str = ctf["comp_time_start"]
-        return datetime.strptime(time_str, "%Y年%m月%d日 %H:%M")
-    except (KeyError, ValueError):
-        # 如果解析失败，返回未来很远的日期，排在最后
-        return datetime.now() + timedelta(days=3650)
 
-
-def fetch_cn_ctf_data() -> dict:
-    """获取国内CTF比赛数据"""
-    cn_data = fetch_ctf_data(is_global=False)
-    if not cn_data or "data" not in cn_data or "result" not in cn_data["data"]:
-        return {"upcoming": [], "ongoing": []}
-    
-    upcoming_ctfs = []
-    ongoing_ctfs = []
-    
-    for ctf in cn_data["data"]["result"]:
-        if ctf.get("status") not in ["即将开始", "正在进行"]:  # 跳过已结束的比赛
-            continue
-        
-        if ctf.get("status") == "即将开始":
-            upcoming_ctfs.append(ctf)
-        else:
-            ongoing_ctfs.append(ctf)
-    
-    # 根据开始时间排序，越早开始的排在越前面
-    upcoming_ctfs.sort(key=get_cn_start_time)
-    ongoing_ctfs.sort(key=get_cn_start_time)
-    
-    return {"upcoming": upcoming_ctfs, "ongoing": ongoing_ctfs}
-
-
-def format_cn_ctf_message(ctf: dict, is_upcoming: bool) -> str:
+def format_cn_ctf_message(ctf: Contest, is_upcoming: bool) -> str:
     """格式化国内CTF比赛信息"""
     status = "即将开始" if is_upcoming else "正在进行"
     contact_info = ""
-    if ctf.get("contac") and isinstance(ctf["contac"], dict) and ctf["contac"]:
+    if ctf.contacts:
         contact_items = []
-        for k, v in ctf["contac"].items():
+        for k, v in ctf.contacts.items():
             contact_items.append(f"{k}: {v}")
         contact_info = f"联系方式: \n {' | '.join(contact_items)}\n"
     
     return (
-        f"[{status}] {ctf['name']}\n"
-        f"比赛时间: \n {format_time(ctf['comp_time_start'])} - {format_time(ctf['comp_time_end'])}\n"
-        f"报名时间: \n {format_time(ctf['reg_time_start'])} - {format_time(ctf['reg_time_end'])}\n"
-        f"比赛形式: {ctf.get('type', '未知')}\n"
-        f"比赛标签: {ctf.get('tag', '未知')}\n"
-        f"赛事主办: {ctf.get('organizer', '未知')}\n"
+        f"[{status}] {ctf.name}\n"
+        f"比赛时间: \n {format_period(ctf.start, ctf.end)}\n"
+        f"报名时间: \n {format_period(ctf.reg_start, ctf.reg_end)}\n"
+        f"比赛形式: {ctf.format or '未知'}\n"
+        f"比赛标签: {ctf.tags or '未知'}\n"
+        f"赛事主办: {ctf.organizer or '未知'}\n"
         f"{contact_info}"
-        f"比赛链接: {ctf['link']}\n"
-        f"数据来源: Hello-CTFtime"
+        f"比赛链接: {ctf.link}\n"
+        f"数据来源: {source_label(ctf)}"
     )
 
-@query_ctf.handle()
-async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = CommandArg()):
-    """处理查询CTF赛事命令"""
-    # 解析权重参数
-    arg_str = args.extract_plain_text().strip()
-    try:
-        min_weight = float(arg_str) if arg_str else DEFAULT_GLOBAL_MIN_WEIGHT
-    except ValueError:
-        await query_ctf.finish("请输入有效的权重值！(float类型)")
-        return
-    
-    # 获取数据
-    global_ctfs = fetch_global_ctf_data(min_weight)
-    cn_ctfs = fetch_cn_ctf_data()
+def build_query_messages(cn_ctfs: dict, global_ctfs: dict, min_weight: float, self_id: int) -> Optional[Tuple[list, list]]:
+    """
+    构建 /查询赛事 的合并转发节点树
     
+    Args:
+        cn_ctfs: 国内比赛数据
+        global_ctfs: 国际比赛数据
+        min_weight: 国际比赛最小权重
+        self_id: 机器人QQ号
+        
+    Returns:
+        (messages, news) 或None(没有符合条件的比赛)
+    """
     # 检查是否有符合条件的比赛
     has_cn_ctf = cn_ctfs["upcoming"] or cn_ctfs["ongoing"]
     has_global_ctf = global_ctfs["upcoming"] or global_ctfs["ongoing"]
     
     if not has_cn_ctf and not has_global_ctf:
-        await query_ctf.finish(f"未找到符合条件的比赛信息。")
-        return
+        return None
     
     # 生成主合并转发消息
     main_messages = []
@@ -475,7 +536,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
         'type': 'node',
         'data': {
             'name': 'CTF比赛查询',
-            'uin': event.self_id,
+            'uin': self_id,
             'content': overview_msg
         }
     })
@@ -490,7 +551,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
             'type': 'node',
             'data': {
                 'name': 'CTF比赛查询',
-                'uin': event.self_id,
+                'uin': self_id,
                 'content': cn_prompt
             }
         })
@@ -503,7 +564,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
             'type': 'node',
             'data': {
                 'name': 'CTF比赛查询',
-                'uin': event.self_id,
+                'uin': self_id,
                 'content': f"【国内CTF比赛】共{cn_ongoing_count + cn_upcoming_count}场"
             }
         })
@@ -516,7 +577,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
                 'type': 'node',
                 'data': {
                     'name': 'CTF比赛查询',
-                    'uin': event.self_id,
+                    'uin': self_id,
                     'content': cn_ongoing_prompt
                 }
             })
@@ -529,7 +590,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
                     'type': 'node',
                     'data': {
                         'name': 'CTF比赛查询',
-                        'uin': event.self_id,
+                        'uin': self_id,
                         'content': msg_content
                     }
                 })
@@ -539,7 +600,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
                 'type': 'node',
                 'data': {
                     'name': '正在进行的比赛',
-                    'uin': event.self_id,
+                    'uin': self_id,
                     'content': cn_ongoing_messages
                 }
             })
@@ -551,7 +612,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
                 'type': 'node',
                 'data': {
                     'name': 'CTF比赛查询',
-                    'uin': event.self_id,
+                    'uin': self_id,
                     'content': cn_upcoming_prompt
                 }
             })
@@ -564,7 +625,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
                     'type': 'node',
                     'data': {
                         'name': 'CTF比赛查询',
-                        'uin': event.self_id,
+                        'uin': self_id,
                         'content': msg_content
                     }
                 })
@@ -574,7 +635,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
                 'type': 'node',
                 'data': {
                     'name': '即将开始的比赛',
-                    'uin': event.self_id,
+                    'uin': self_id,
                     'content': cn_upcoming_messages
                 }
             })
@@ -584,7 +645,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
             'type': 'node',
             'data': {
                 'name': '国内CTF比赛',
-                'uin': event.self_id,
+                'uin': self_id,
                 'content': cn_messages,
                 'news': [{"text": f"国内CTF比赛: 共{cn_ongoing_count + cn_upcoming_count}场比赛"}]
             }
@@ -601,7 +662,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
             'type': 'node',
             'data': {
                 'name': 'CTF比赛查询',
-                'uin': event.self_id,
+                'uin': self_id,
                 'content': global_prompt
             }
         })
@@ -614,7 +675,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
             'type': 'node',
             'data': {
                 'name': 'CTF比赛查询',
-                'uin': event.self_id,
+                'uin': self_id,
                 'content': f"【国际CTF比赛】共{global_ongoing_count + global_upcoming_count}场"
             }
         })
@@ -627,7 +688,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
                 'type': 'node',
                 'data': {
                     'name': 'CTF比赛查询',
-                    'uin': event.self_id,
+                    'uin': self_id,
                     'content': global_ongoing_prompt
                 }
             })
@@ -640,7 +701,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
                     'type': 'node',
                     'data': {
                         'name': 'CTF比赛查询',
-                        'uin': event.self_id,
+                        'uin': self_id,
                         'content': msg_content
                     }
                 })
@@ -650,7 +711,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
                 'type': 'node',
                 'data': {
                     'name': '正在进行的比赛',
-                    'uin': event.self_id,
+                    'uin': self_id,
                     'content': global_ongoing_messages
                 }
             })
@@ -662,7 +723,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
                 'type': 'node',
                 'data': {
                     'name': 'CTF比赛查询',
-                    'uin': event.self_id,
+                    'uin': self_id,
                     'content': global_upcoming_prompt
                 }
             })
@@ -675,7 +736,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
                     'type': 'node',
                     'data': {
                         'name': 'CTF比赛查询',
-                        'uin': event.self_id,
+                        'uin': self_id,
                         'content': msg_content
                     }
                 })
@@ -685,7 +746,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
                 'type': 'node',
                 'data': {
                     'name': '即将开始的比赛',
-                    'uin': event.self_id,
+                    'uin': self_id,
                     'content': global_upcoming_messages
                 }
             })
@@ -695,7 +756,7 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
             'type': 'node',
             'data': {
                 'name': '国际CTF比赛',
-                'uin': event.self_id,
+                'uin': self_id,
                 'content': global_messages,
                 'news': [{"text": f"国际CTF比赛: 共{global_ongoing_count + global_upcoming_count}场比赛 (权重 ≥ {min_weight})"}]
             }
@@ -705,6 +766,35 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
         main_news.append({"text": f"CTF比赛查询: {global_prompt}"})
         main_news.append({"text": f"国际CTF比赛: [聊天记录]"})
     
+    return main_messages, main_news
+
+@query_ctf.handle()
+async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = CommandArg()):
+    """处理查询CTF赛事命令"""
+    # 解析权重参数
+    arg_str = args.extract_plain_text().strip()
+    try:
+        min_weight = float(arg_str) if arg_str else DEFAULT_GLOBAL_MIN_WEIGHT
+    except ValueError:
+        await query_ctf.finish("请输入有效的权重值！(float类型)")
+        return
+    
+    # 快照未变化时直接复用已渲染的节点树
+    await feed_cache.ensure_fresh()
+    cache_key = (feed_cache.version, min_weight, event.self_id)
+    if cache_key in render_cache:
+        rendered = render_cache.get(cache_key)
+    else:
+        rendered = build_query_messages(await fetch_cn_ctf_data(), await fetch_global_ctf_data(min_weight),
+                                        min_weight, event.self_id)
+        render_cache.set(cache_key, rendered)
+    
+    if not rendered:
+        await query_ctf.finish(f"未找到符合条件的比赛信息。")
+        return
+    
+    main_messages, main_news = rendered
+    
     # 发送合并转发消息
     try:
         await bot.call_api(
@@ -714,4 +804,36 @@ async def handle_query_ctf(bot:Bot, event: GroupMessageEvent, args: Message = Co
             news=main_news
         )
     except Exception as e:
-        await query_ctf.finish(f"发送失败: {e}")
\ No newline at end of file
+        await query_ctf.finish(f"发送失败: {e}")
+
+
+# 订阅命令注册
+subscribe_ctf = on_command("/赛事订阅", priority=5, rule=check_if_403, permission=SUPERUSER | GROUP_ADMIN | GROUP_OWNER)
+unsubscribe_ctf = on_command("/取消赛事订阅", priority=5, rule=check_if_403, permission=SUPERUSER | GROUP_ADMIN | GROUP_OWNER)
+
+@subscribe_ctf.handle()
+async def handle_subscribe_ctf(event: GroupMessageEvent, args: Message = CommandArg()):
+    """查看或修改本群的赛事订阅"""
+    arg_str = args.extract_plain_text().strip()
+    current = subscriptions.get(event.group_id)
+    
+    if not arg_str:
+        if not current:
+            await subscribe_ctf.finish("本群尚未订阅赛事推送\n使用 /赛事订阅 权重=50 范围=全部 提前=3 开启订阅")
+        await subscribe_ctf.finish(f"本群的赛事订阅设置:\n{current.describe()}")
+    
+    base = current or Subscription(event.group_id, min_weight=global_min_weight, lead_days=wait_time)
+    try:
+        sub = parse_subscription_args(arg_str, base)
+    except ValueError as e:
+        await subscribe_ctf.finish(f"参数错误: {e}\n格式: /赛事订阅 权重=50 范围=国内|国际|全部 形式=jeopardy,awd 标签=Web 提前=3")
+    
+    subscriptions.set(sub)
+    await subscribe_ctf.finish(f"已更新本群的赛事订阅:\n{sub.describe()}")
+
+@unsubscribe_ctf.handle()
+async def handle_unsubscribe_ctf(event: GroupMessageEvent):
+    """取消本群的赛事订阅"""
+    if subscriptions.remove(event.group_id):
+        await unsubscribe_ctf.finish("已取消本群的赛事推送")
+    await unsubscribe_ctf.finish("本群没有订阅赛事推送")
@@ -0,0 +1,205 @@
+"""
+CTF插件离线基准测试
+
+通过本地替身服务回放录制的 CN.json / Global.json（或合成的大规模数据），
+分别测量获取、解析、多数据源合并、筛选、变化检测、去重、渲染以及完整 push_ctf 的耗时，无需访问GitHub。
+
+用法（在插件所在目录的上一级执行，需要安装 nonebot2、onebot v11 适配器和 nonebot_plugin_apscheduler）:
+    python CTF/benchmark.py                     # 使用 fixtures 中的录制数据
+    python CTF/benchmark.py --contests 5000     # 国内和国际各生成5000场合成比赛
+    python CTF/benchmark.py --contests 5000 --groups 200 --rounds 50 --latency 0.05
+    python CTF/benchmark.py --contests 5000 --ctftime  # 同时启用由国际赛事转换的CTFtime数据源
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from replay import FixtureServer, load_fixture_feeds, make_synthetic_feeds
+
+PLUGIN_DIR = Path(__file__).resolve().parent
+
+
+def load_plugin(server: FixtureServer, groups: int, ctftime: bool = False):
+    """以none驱动初始化NoneBot并加载CTF插件，数据地址指向本地替身服务"""
+    import nonebot
+
+    sources = ["hello-ctftime-cn", "hello-ctftime-global"] + (["ctftime"] if ctftime else [])
+    nonebot.init(
+        driver="~none",
+        CONFIG={
+            "SEND_LIST": list(range(1, groups + 1)),
+            "SEND_TIME": 3,
+            "LIMIT_TIME": 30,
+            "GLOBAL_MIN_WEIGHT": 50,
+            "CN_URL": server.cn_url,
+            "GLOBAL_URL": server.global_url,
+            "CTFTIME_URL": server.ctftime_url,
+            "SOURCES": sources,
+        },
+    )
+    sys.path.insert(0, str(PLUGIN_DIR.parent))
+    plugin = nonebot.load_plugin(PLUGIN_DIR.name)
+    if plugin is None:
+        raise RuntimeError("加载CTF插件失败")
+    return plugin.module
+
+
+def isolate_state(ctf, workdir: Path, groups: int) -> None:
+    """推送记录、订阅和快照改为临时文件，避免污染插件目录中的数据"""
+    ctf.feed_differ = ctf.FeedDiffer(ctf.to_contest_view, workdir / "snapshot.json")
+    ctf.DB_PATH = workdir / "db.txt"
+    ctf.DB_PATH.write_text("", encoding="utf-8")
+    ctf.push_records = set()
+
+    scopes = ("all", "cn", "global")
+    formats = ([], ["jeopardy"], ["awd"])
+    ctf.subscriptions = ctf.SubscriptionStore(workdir / "subscriptions.json")
+    for gid in range(1, groups + 1):
+        ctf.subscriptions.set(ctf.Subscription(
+            gid,
+            min_weight=(gid * 7) % 100,
+            scope=scopes[gid % 3],
+            formats=formats[gid % 3],
+            lead_days=1 + gid % 7,
+        ))
+
+
+def bench(name: str, func: Callable[[], object], rounds: int, items: int,
+          setup: Optional[Callable[[], None]] = None) -> List[str]:
+    """运行 rounds 次并返回结果行"""
+    samples = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    mean = statistics.mean(samples)
+    p50 = statistics.median(samples)
+    p95 = sorted(samples)[max(0, int(len(samples) * 0.95) - 1)]
+    throughput = items / mean if mean else float("inf")
+    return [name, f"{mean * 1000:.3f}", f"{p50 * 1000:.3f}", f"{p95 * 1000:.3f}", f"{throughput:,.0f}"]
+
+
+def print_table(rows: List[List[str]]) -> None:
+    header = ["阶段", "平均(ms)", "P50(ms)", "P95(ms)", "吞吐(场/秒)"]
+    widths = [max(len(str(r[i])) for r in [header] + rows) + 2 for i in range(len(header))]
+    for row in [header] + rows:
+        print("".join(str(cell).ljust(w) for cell, w in zip(row, widths)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CTF插件离线基准测试")
+    parser.add_argument("--contests", type=int, default=0, help="每个数据源合成的比赛数量，0表示使用录制数据")
+    parser.add_argument("--groups", type=int, default=20, help="订阅推送的群数量")
+    parser.add_argument("--rounds", type=int, default=20, help="每个阶段运行的次数")
+    parser.add_argument("--weight", type=float, default=50, help="/查询赛事 使用的权重")
+    parser.add_argument("--latency", type=float, default=0.0, help="替身服务每个请求的模拟延迟(秒)")
+    parser.add_argument("--seed", type=int, default=0, help="合成数据的随机种子")
+    parser.add_argument("--ctftime", action="store_true", help="同时启用CTFtime数据源，测试跨数据源合并")
+    args = parser.parse_args()
+
+    if args.contests:
+        cn_body, global_body = make_synthetic_feeds(args.contests, seed=args.seed)
+    else:
+        cn_body, global_body = load_fixture_feeds()
+
+    with FixtureServer(cn_body, global_body, latency=args.latency) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        ctf = load_plugin(server, args.groups, ctftime=args.ctftime)
+        isolate_state(ctf, Path(tmp), args.groups)
+        loop = asyncio.new_event_loop()
+        run = loop.run_until_complete
+
+        run(ctf.feed_cache.refresh())
+        contests = ctf.feed_cache.peek()
+        cn_data = ctf.filter_contests(contests, is_global=False)
+        global_data = ctf.filter_contests(contests, is_global=True, min_weight=args.weight)
+        candidates = run(ctf.collect_push_candidates())
+        sources = ctf.aggregator.sources
+        merge_contests = importlib.import_module(f"{PLUGIN_DIR.name}.sources").merge_contests
+
+        def parse_all():
+            return [s.parse(json.loads(server.routes[urlsplit(s.url).path])) for s in sources]
+
+        parsed = parse_all()
+        total = sum(len(p) for p in parsed)
+        shown = sum(len(v) for v in cn_data.values()) + sum(len(v) for v in global_data.values())
+
+        def reset_records():
+            ctf.push_records = set()
+            ctf.pending_events.clear()
+            ctf.DB_PATH.write_text("", encoding="utf-8")
+
+        async def fetch_raw():
+            async with httpx.AsyncClient() as client:
+                await asyncio.gather(*(client.get(s.url) for s in sources))
+
+        # 变化检测: 在原始数据和约1%比赛报名时间或链接变化后的数据之间交替比较
+        changed = [c.copy() for c in contests]
+        for contest in changed[::100]:
+            if contest.reg_end:
+                contest.reg_end = datetime(2099, 1, 1)
+            else:
+                contest.link += "?changed"
+        differ = ctf.FeedDiffer(ctf.to_contest_view)
+        differ.update(contests)
+        feeds = [changed, contests]
+
+        def diff():
+            feeds.reverse()
+            return differ.update(feeds[0])
+
+        def dedup():
+            for contest in candidates:
+                for gid in range(1, args.groups + 1):
+                    ctf.is_ctf_has_push(contest.key, gid, contest.name)
+
+        def cached_render():
+            key = (ctf.feed_cache.version, args.weight, 0)
+            if key not in ctf.render_cache:
+                ctf.render_cache.set(key, ctf.build_query_messages(
+                    ctf.filter_contests(ctf.feed_cache.peek(), is_global=False),
+                    ctf.filter_contests(ctf.feed_cache.peek(), is_global=True, min_weight=args.weight),
+                    args.weight, 0))
+            return ctf.render_cache.get(key)
+
+        rows = [
+            bench("fetch", lambda: run(fetch_raw()), args.rounds, total),
+            bench("parse", parse_all, args.rounds, total),
+            bench("merge", lambda: merge_contests(parsed), args.rounds, total),
+            bench("aggregate", lambda: run(ctf.aggregator.fetch_all()), args.rounds, total),
+            bench("filter(查询)", lambda: (ctf.filter_contests(contests, is_global=False),
+                                         ctf.filter_contests(contests, is_global=True, min_weight=args.weight)),
+                  args.rounds, len(contests)),
+            bench("filter(订阅)", lambda: ctf.subscriptions.index.match(run(ctf.collect_push_candidates())),
+                  args.rounds, len(contests)),
+            bench("diff", diff, args.rounds, len(contests)),
+            bench("dedup", dedup, args.rounds, len(candidates) * args.groups, setup=reset_records),
+            bench("render", lambda: ctf.build_query_messages(cn_data, global_data, args.weight, 0),
+                  args.rounds, shown),
+            bench("render(缓存)", cached_render, args.rounds, shown),
+            bench("push_ctf", lambda: run(ctf.push_ctf()), args.rounds, len(contests), setup=reset_records),
+        ]
+        loop.close()
+
+        print(f"数据: {'合成' if args.contests else '录制'}，数据源 {', '.join(s.name for s in sources)}，"
+              f"共 {total} 场比赛，合并后 {len(contests)} 场，"
+              f"{len(candidates)} 场即将开始，查询展示 {shown} 场，{args.groups} 个订阅群，"
+              f"每阶段 {args.rounds} 次，替身请求 {server.requests} 次")
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+CTF数据快照与渲染结果缓存
+
+- FeedCache: 保存最近一次聚合的赛事数据，数据内容变化时递增版本号
+- RenderCache: 保存 /查询赛事 生成好的合并转发节点树，按 (版本号, 权重, 机器人QQ) 索引
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, List, Optional
+
+from nonebot.log import logger
+
+
+def _encode(obj: Any) -> Any:
+    """计算摘要时序列化自定义对象"""
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    return str(obj)
+
+
+class FeedCache:
+    """CTF赛事数据快照缓存"""
+
+    def __init__(self, fetcher: Callable[[], Awaitable[Optional[Any]]], ttl: float):
+        """
+        Args:
+            fetcher: 获取数据的异步函数，失败时返回None
+            ttl: 快照有效期，单位为秒
+        """
+        self._fetcher = fetcher
+        self._ttl = ttl
+        self._data: Optional[Any] = None
+        self._digest: Optional[str] = None
+        self._fetched_at: Optional[float] = None
+        self._listeners: List[Callable[[int], None]] = []
+        self._lock = asyncio.Lock()
+        self.version = 0
+
+    def on_refresh(self, func: Callable[[int], None]) -> Callable[[int], None]:
+        """注册数据变化回调，回调参数为新的版本号"""
+        self._listeners.append(func)
+        return func
+
+    async def refresh(self) -> bool:
+        """
+        重新获取数据
+
+        Returns:
+            数据内容是否发生变化
+        """
+        async with self._lock:
+            return await self._refresh()
+
+    async def _refresh(self) -> bool:
+        data = await self._fetcher()
+        if data is None:
+            # 获取失败时保留旧快照
+            return False
+        self._fetched_at = time.monotonic()
+
+        digest = hashlib.md5(
+            json.dumps(data, ensure_ascii=False, sort_keys=True, default=_encode).encode("utf-8")
+        ).hexdigest()
+        if digest == self._digest:
+            return False
+        self._data = data
+        self._digest = digest
+        self.version += 1
+        logger.debug(f"CTF数据已更新，快照版本: {self.version}")
+        for listener in self._listeners:
+            listener(self.version)
+        return True
+
+    def is_stale(self) -> bool:
+        return self._fetched_at is None or time.monotonic() - self._fetched_at > self._ttl
+
+    async def ensure_fresh(self) -> None:
+        """快照过期或从未获取时刷新，并发调用只会触发一次获取"""
+        if not self.is_stale():
+            return
+        async with self._lock:
+            # 等待锁期间其他调用可能已经刷新
+            if self.is_stale():
+                await self._refresh()
+
+    async def get(self) -> Optional[Any]:
+        """获取快照数据，必要时自动刷新"""
+        await self.ensure_fresh()
+        return self._data
+
+    def peek(self) -> Optional[Any]:
+        """获取当前快照数据，不触发刷新"""
+        return self._data
+
+
+class RenderCache:
+    """渲染结果缓存，超出容量时淘汰最久未使用的条目"""
+
+    def __init__(self, maxsize: int = 32):
+        self._maxsize = maxsize
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def get(self, key: Hashable) -> Any:
+        value = self._items[key]
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self._maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self, *_) -> None:
+        self._items.clear()
@@ -8,5 +8,10 @@ class Config(BaseModel):
         "SEND_LIST": [], # 推送的群号列表 测试
         "SEND_TIME": 3,  # 提前天数
         "LIMIT_TIME": 30,  # 检查是否推送的时间，单位为分钟
-        "GLOBAL_MIN_WEIGHT": 50  # 国际比赛的最小权重阈值
+        "GLOBAL_MIN_WEIGHT": 50,  # 国际比赛的最小权重阈值
+        "CN_URL": "https://raw.githubusercontent.com/ProbiusOfficial/Hello-CTFtime/main/CN.json",  # 国内赛事数据地址
+        "GLOBAL_URL": "https://raw.githubusercontent.com/ProbiusOfficial/Hello-CTFtime/main/Global.json",  # 国际赛事数据地址
+        "CTFTIME_URL": "https://ctftime.org/api/v1/events/",  # CTFtime API地址
+        "SOURCES": ["hello-ctftime-cn", "hello-ctftime-global"],  # 启用的数据源，排在前面的优先，可加入"ctftime"
+        "SOURCE_TIMEOUT": 10  # 每个数据源的超时时间，单位为秒
     }
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+赛事数据变化检测
+
+按稳定的比赛标识比较相邻两次聚合的数据，产生 新增/变更/移除 事件:
+- 国内赛事标识: cn:<id>，没有id时使用比赛名称
+- 国际赛事标识: global:<CTFtime比赛ID>，没有比赛ID时使用比赛名称
+- 多个数据源中的同一场比赛合并后使用优先级最高的数据源的标识
+
+只有报名/比赛时间、链接和非正常推进的状态变化才算作变更，
+权重等其他字段变化只会更新缓存的解析结果，不产生事件。
+上一次的数据保存在 snapshot.json 中，重启后仍能与之比较。
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from nonebot.log import logger
+
+from .sources import Contest, STATUS_ENDED, STATUS_RUNNING, STATUS_UPCOMING
+
+EVENT_ADDED = "added"
+EVENT_CHANGED = "changed"
+EVENT_REMOVED = "removed"
+
+# 需要通知的字段: 字段名 -> 显示名称
+TRACKED_FIELDS = {
+    "reg_start": "报名开始",
+    "reg_end": "报名截止",
+    "start": "比赛开始",
+    "end": "比赛结束",
+    "link": "比赛链接",
+    "status": "比赛状态",
+}
+
+# 正常的状态推进，不需要通知
+NATURAL_STATUS_CHANGES = {
+    (STATUS_UPCOMING, STATUS_RUNNING),
+    (STATUS_RUNNING, STATUS_ENDED),
+    (STATUS_UPCOMING, STATUS_ENDED),
+}
+
+
+class ContestEvent:
+    """比赛变化事件"""
+
+    __slots__ = ("kind", "key", "old", "new", "changes")
+
+    def __init__(self, kind: str, key: str, old: Optional[Contest], new: Optional[Contest],
+                 changes: Optional[Dict[str, Tuple[Any, Any]]] = None):
+        self.kind = kind
+        self.key = key
+        self.old = old
+        self.new = new
+        # {显示名称: (旧值, 新值)}
+        self.changes = changes or {}
+
+    @property
+    def contest(self) -> Contest:
+        return self.new if self.new is not None else self.old
+
+    @property
+    def is_global(self) -> bool:
+        return self.contest.is_global
+
+    @property
+    def name(self) -> str:
+        return self.contest.name
+
+    def __repr__(self) -> str:
+        return f"ContestEvent({self.kind}, {self.key}, {self.changes})"
+
+
+def tracked_changes(old: Contest, new: Contest) -> Dict[str, Tuple[Any, Any]]:
+    """比较需要通知的字段"""
+    changes = {}
+    for field, label in TRACKED_FIELDS.items():
+        before, after = getattr(old, field), getattr(new, field)
+        if before == after:
+            continue
+        if field == "status" and (before, after) in NATURAL_STATUS_CHANGES:
+            continue
+        changes[label] = (before, after)
+    return changes
+
+
+def _fingerprint(contest: Contest) -> str:
+    return json.dumps(contest.to_dict(), ensure_ascii=False, sort_keys=True)
+
+
+class FeedDiffer:
+    """相邻快照比较器，同时缓存每场比赛的解析结果"""
+
+    def __init__(self, parser: Callable[[Contest], Any], path: Optional[Path] = None):
+        """
+        Args:
+            parser: 将比赛转换为匹配用对象的函数，失败返回None
+            path: 快照持久化路径，为None时不持久化
+        """
+        self._parser = parser
+        self._path = Path(path) if path else None
+        # key -> (比赛, 指纹, 解析结果)
+        self._entries: Dict[str, Tuple[Contest, str, Any]] = {}
+        self._order: List[str] = []
+        self._baseline = False
+        self._load()
+
+    def _load(self) -> None:
+        if not self._path or not self._path.exists():
+            return
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            for key, item in saved.items():
+                contest = Contest.from_dict(item)
+                self._entries[key] = (contest, _fingerprint(contest), self._parser(contest))
+                self._order.append(key)
+            self._baseline = True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"读取赛事快照失败: {e}")
+            self._entries, self._order = {}, []
+
+    def _save(self) -> None:
+        if not self._path:
+            return
+        data = {key: self._entries[key][0].to_dict() for key in self._order}
+        tmp_path = self._path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.error(f"保存赛事快照失败: {e}")
+
+    def update(self, contests: Optional[List[Contest]]) -> List[ContestEvent]:
+        """
+        与上一次的数据比较并更新
+
+        本次没有任何数据来自的数据源视为获取失败，保留它的旧比赛，不会产生移除事件。
+        第一次比较(没有历史快照)只建立基线，不产生事件。
+
+        Returns:
+            变化事件列表
+        """
+        if contests is None:
+            return []
+        refreshed = {source for contest in contests for source in contest.sources}
+
+        events: List[ContestEvent] = []
+        entries: Dict[str, Tuple[Contest, str, Any]] = {}
+        order: List[str] = []
+
+        for contest in contests:
+            key = contest.key
+            if key in entries:
+                continue
+            fingerprint = _fingerprint(contest)
+            old = self._entries.get(key)
+            if old and old[1] == fingerprint:
+                entries[key] = old
+            else:
+                entries[key] = (contest, fingerprint, self._parser(contest))
+                if old is None:
+                    events.append(ContestEvent(EVENT_ADDED, key, None, contest))
+                else:
+                    changes = tracked_changes(old[0], contest)
+                    if changes:
+                        events.append(ContestEvent(EVENT_CHANGED, key, old[0], contest, changes))
+            order.append(key)
+
+        for key in self._order:
+            if key in entries:
+                continue
+            old_contest = self._entries[key][0]
+            if refreshed.isdisjoint(old_contest.sources):
+                # 数据源本次获取失败，沿用旧数据
+                entries[key] = self._entries[key]
+                order.append(key)
+            else:
+                events.append(ContestEvent(EVENT_REMOVED, key, old_contest, None))
+
+        # 国内比赛排在国际比赛之前，保持数据源中的顺序
+        order.sort(key=lambda k: entries[k][0].is_global)
+
+        baseline = self._baseline
+        self._entries, self._order, self._baseline = entries, order, True
+        self._save()
+
+        if not baseline:
+            logger.debug(f"赛事快照基线已建立，共 {len(order)} 场比赛")
+            return []
+        if events:
+            logger.debug(f"赛事数据变化: {events}")
+        return events
+
+    def views(self, upcoming_only: bool = False) -> List[Any]:
+        """按数据源顺序返回解析结果"""
+        result = []
+        for key in self._order:
+            contest, _, view = self._entries[key]
+            if view is None:
+                continue
+            if upcoming_only and contest.status != STATUS_UPCOMING:
+                continue
+            result.append(view)
+        return result
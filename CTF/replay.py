@@ -0,0 +1,216 @@
+"""
+离线回放工具
+
+- FixtureServer: 本地HTTP服务，替代GitHub raw地址提供 CN.json / Global.json，以及CTFtime API
+- make_synthetic_feeds: 生成任意规模的合成赛事数据，时间相对当前时间生成
+- make_ctftime_feed: 由 Global.json 生成CTFtime API格式的数据，用于测试多数据源合并
+
+只依赖标准库，不会被插件本身导入，供 benchmark.py 或调试时使用。
+"""
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+CN_STATUSES = ("即将开始", "正在进行", "已结束")
+GLOBAL_STATUSES = ("oncoming", "nowrunning", "past")
+CN_TYPES = ("团队赛", "个人赛", "团队赛 AWD")
+CN_TAGS = ("Web", "Pwn", "Reverse", "Crypto", "Misc", "数据安全")
+GLOBAL_FORMATS = ("Jeopardy", "Attack-Defense", "Hack quest", "Mixed")
+
+
+def load_fixture_feeds(fixtures_dir: Path = FIXTURES_DIR) -> Tuple[bytes, bytes]:
+    """读取录制好的 CN.json 和 Global.json"""
+    return (fixtures_dir / "CN.json").read_bytes(), (fixtures_dir / "Global.json").read_bytes()
+
+
+def make_synthetic_feeds(contests: int, seed: int = 0) -> Tuple[bytes, bytes]:
+    """
+    生成合成赛事数据，国内和国际各 contests 场
+
+    Args:
+        contests: 每个数据源的比赛数量
+        seed: 随机种子，相同种子生成相同数据
+
+    Returns:
+        (CN.json 内容, Global.json 内容)
+    """
+    rng = random.Random(seed)
+    now = datetime.now().replace(second=0, microsecond=0)
+    cn_fmt = "%Y年%m月%d日 %H:%M"
+    global_fmt = "%Y-%m-%d %H:%M:%S"
+
+    cn_result = []
+    for i in range(contests):
+        reg_start = now + timedelta(hours=rng.randint(-24 * 30, 24 * 30))
+        comp_start = reg_start + timedelta(days=rng.randint(1, 14))
+        cn_result.append({
+            "name": f"合成国内赛事 #{i}",
+            "link": f"https://example.com/cn/{i}",
+            "type": rng.choice(CN_TYPES),
+            "reg_time_start": reg_start.strftime(cn_fmt),
+            "reg_time_end": (reg_start + timedelta(days=3)).strftime(cn_fmt),
+            "comp_time_start": comp_start.strftime(cn_fmt),
+            "comp_time_end": (comp_start + timedelta(hours=rng.randint(4, 48))).strftime(cn_fmt),
+            "readmore": "",
+            "id": i,
+            "status": rng.choice(CN_STATUSES),
+            "tag": ",".join(rng.sample(CN_TAGS, rng.randint(1, 3))),
+            "organizer": f"主办方{i % 97}",
+            "contac": {"QQ群": str(100000000 + i)} if i % 3 == 0 else {},
+        })
+
+    global_result = []
+    for i in range(contests):
+        start = now + timedelta(hours=rng.randint(-24 * 30, 24 * 30))
+        end = start + timedelta(hours=rng.randint(8, 72))
+        global_result.append({
+            "比赛名称": f"Synthetic CTF #{i}",
+            "比赛时间": f"{start.strftime(global_fmt)} - {end.strftime(global_fmt)} UTC+8",
+            "添加日历": f"https://ctftime.org/event/{i}.ics",
+            "比赛形式": rng.choice(GLOBAL_FORMATS),
+            "比赛链接": f"https://example.com/global/{i}",
+            "比赛标志": "",
+            "比赛权重": f"{rng.uniform(0, 100):.2f}",
+            "赛事主办": f"Team {i % 211} (https://ctftime.org/team/{i % 211})",
+            "比赛ID": i,
+            "比赛状态": rng.choice(GLOBAL_STATUSES),
+        })
+
+    cn_feed = {"success": True, "data": {"result": cn_result, "total": contests, "page": 1, "size": contests}, "msg": ""}
+    return (
+        json.dumps(cn_feed, ensure_ascii=False).encode("utf-8"),
+        json.dumps(global_result, ensure_ascii=False).encode("utf-8"),
+    )
+
+
+def make_ctftime_feed(global_body: bytes, rename_every: int = 5) -> bytes:
+    """
+    将 Global.json 转换为CTFtime API (/api/v1/events/) 格式
+
+    每 rename_every 场比赛修改一次名称写法（大小写和标点），用于测试按名称的模糊合并。
+
+    Args:
+        global_body: Global.json 内容
+        rename_every: 修改名称的间隔，0表示不修改
+
+    Returns:
+        CTFtime API 返回的内容
+    """
+    tz = timezone(timedelta(hours=8))
+    events = []
+    for i, ctf in enumerate(json.loads(global_body)):
+        start_str, end_str = ctf["比赛时间"].split(" - ")
+        start = datetime.strptime(start_str.strip(), "%Y-%m-%d %H:%M:%S").replace(tzinfo=tz)
+        end = datetime.strptime(end_str.split(" UTC")[0].strip(), "%Y-%m-%d %H:%M:%S").replace(tzinfo=tz)
+        title = ctf["比赛名称"]
+        ident = ctf["比赛ID"]
+        if rename_every and i % rename_every == 0:
+            # 模拟两个数据源的标识不一致，只能按名称和时间合并
+            title = title.upper().replace(" ", "_")
+            ident = 1_000_000 + i
+        events.append({
+            "id": ident,
+            "title": title,
+            "url": ctf["比赛链接"],
+            "ctftime_url": f"https://ctftime.org/event/{ident}/",
+            "format": ctf["比赛形式"],
+            "weight": float(ctf["比赛权重"]),
+            "start": start.astimezone(timezone.utc).isoformat(),
+            "finish": end.astimezone(timezone.utc).isoformat(),
+            "organizers": [{"id": 0, "name": ctf["赛事主办"].split(" (")[0]}],
+        })
+    return json.dumps(events, ensure_ascii=False).encode("utf-8")
+
+
+class FixtureServer:
+    """
+    本地数据源替身
+
+    用法:
+        with FixtureServer(*load_fixture_feeds()) as server:
+            server.cn_url, server.global_url, server.ctftime_url
+    """
+
+    def __init__(self, cn_body: bytes, global_body: bytes, latency: float = 0.0,
+                 ctftime_body: Optional[bytes] = None):
+        """
+        Args:
+            cn_body: /CN.json 返回的内容
+            global_body: /Global.json 返回的内容
+            latency: 每个请求额外等待的秒数，用于模拟网络延迟
+            ctftime_body: /api/v1/events/ 返回的内容，默认由 global_body 转换
+        """
+        self.routes: Dict[str, bytes] = {
+            "/CN.json": cn_body,
+            "/Global.json": global_body,
+            "/api/v1/events/": ctftime_body if ctftime_body is not None else make_ctftime_feed(global_body),
+        }
+        self.latency = latency
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                body = server.routes.get(self.path.split("?")[0])
+                if server.latency:
+                    time.sleep(server.latency)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def cn_url(self) -> str:
+        return f"{self.base_url}/CN.json"
+
+    @property
+    def global_url(self) -> str:
+        return f"{self.base_url}/Global.json"
+
+    @property
+    def ctftime_url(self) -> str:
+        return f"{self.base_url}/api/v1/events/"
+
+    def start(self) -> "FixtureServer":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
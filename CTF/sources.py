@@ -0,0 +1,472 @@
+"""
+赛事数据源
+
+每个数据源负责获取并解析自己的格式，统一转换为 Contest。
+Aggregator 并发获取所有数据源，每个数据源有独立的超时和熔断，
+获取失败时沿用该数据源上一次的结果，最后按名称和时间合并重复的比赛。
+
+内置数据源:
+- hello-ctftime-cn: Hello-CTFtime 国内赛事 (CN.json)
+- hello-ctftime-global: Hello-CTFtime 国际赛事 (Global.json)
+- ctftime: CTFtime 官方API，默认不启用
+"""
+import asyncio
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+from nonebot.log import logger
+
+REGION_CN = "cn"
+REGION_GLOBAL = "global"
+
+STATUS_UPCOMING = "upcoming"
+STATUS_RUNNING = "running"
+STATUS_ENDED = "ended"
+
+STATUS_NAMES = {
+    STATUS_UPCOMING: "即将开始",
+    STATUS_RUNNING: "正在进行",
+    STATUS_ENDED: "已结束",
+}
+
+# 数据源中的时间统一转换为 UTC+8 的 naive datetime
+TZ_CN = timezone(timedelta(hours=8))
+
+CN_STATUS_MAP = {"即将开始": STATUS_UPCOMING, "正在进行": STATUS_RUNNING, "已结束": STATUS_ENDED}
+GLOBAL_STATUS_MAP = {"oncoming": STATUS_UPCOMING, "nowrunning": STATUS_RUNNING, "past": STATUS_ENDED}
+
+TIME_FIELDS = ("reg_start", "reg_end", "start", "end")
+
+
+class Contest:
+    """统一的比赛数据结构"""
+
+    __slots__ = ("key", "source", "region", "name", "link", "format", "tags", "organizer",
+                 "weight", "weight_text", "reg_start", "reg_end", "start", "end", "status",
+                 "contacts", "sources")
+
+    def __init__(self, key: str, source: str, region: str, name: str, link: str = "",
+                 format: str = "", tags: str = "", organizer: str = "", weight: float = 0.0,
+                 weight_text: str = "", reg_start: Optional[datetime] = None,
+                 reg_end: Optional[datetime] = None, start: Optional[datetime] = None,
+                 end: Optional[datetime] = None, status: str = STATUS_UPCOMING,
+                 contacts: Optional[Dict[str, str]] = None, sources: Optional[List[str]] = None):
+        self.key = key
+        self.source = source
+        self.region = region
+        self.name = name
+        self.link = link
+        self.format = format
+        self.tags = tags
+        self.organizer = organizer
+        self.weight = weight
+        self.weight_text = weight_text
+        self.reg_start = reg_start
+        self.reg_end = reg_end
+        self.start = start
+        self.end = end
+        # 已知状态为 upcoming/running/ended，其余保留数据源中的原文（如"已取消"）
+        self.status = status
+        self.contacts = contacts or {}
+        self.sources = sources or [source]
+
+    @property
+    def is_global(self) -> bool:
+        return self.region == REGION_GLOBAL
+
+    @property
+    def status_name(self) -> str:
+        return STATUS_NAMES.get(self.status, self.status)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in self.__slots__}
+        for name in TIME_FIELDS:
+            if data[name] is not None:
+                data[name] = data[name].isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Contest":
+        data = dict(data)
+        for name in TIME_FIELDS:
+            if data.get(name):
+                data[name] = datetime.fromisoformat(data[name])
+        return cls(**data)
+
+    def copy(self) -> "Contest":
+        contest = Contest.__new__(Contest)
+        for name in self.__slots__:
+            setattr(contest, name, getattr(self, name))
+        contest.sources = list(self.sources)
+        return contest
+
+    def __repr__(self) -> str:
+        return f"Contest({self.key}, {self.name!r}, {self.sources})"
+
+
+def status_by_time(start: Optional[datetime], end: Optional[datetime], now: Optional[datetime] = None) -> str:
+    """根据比赛时间推算状态"""
+    now = now or datetime.now()
+    if start and now < start:
+        return STATUS_UPCOMING
+    if end and now < end:
+        return STATUS_RUNNING
+    return STATUS_ENDED
+
+
+class Source:
+    """数据源基类"""
+
+    name = ""
+    label = ""
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    async def fetch(self, client: httpx.AsyncClient) -> List[Contest]:
+        response = await client.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return self.parse(response.json())
+
+    def parse(self, data: Any) -> List[Contest]:
+        raise NotImplementedError
+
+
+class HelloCTFtimeCN(Source):
+    """Hello-CTFtime 国内赛事"""
+
+    name = "hello-ctftime-cn"
+    label = "Hello-CTFtime"
+
+    def parse(self, data: Any) -> List[Contest]:
+        contests = []
+        for ctf in data["data"]["result"]:
+            try:
+                ident = ctf.get("id")
+                contests.append(Contest(
+                    key=f"cn:{ident}" if ident not in (None, "") else f"cn:{ctf['name'].strip()}",
+                    source=self.name,
+                    region=REGION_CN,
+                    name=ctf["name"],
+                    link=ctf.get("link", ""),
+                    format=str(ctf.get("type", "")),
+                    tags=str(ctf.get("tag", "")),
+                    organizer=str(ctf.get("organizer", "")),
+                    reg_start=datetime.strptime(ctf["reg_time_start"], "%Y年%m月%d日 %H:%M"),
+                    reg_end=datetime.strptime(ctf["reg_time_end"], "%Y年%m月%d日 %H:%M"),
+                    start=datetime.strptime(ctf["comp_time_start"], "%Y年%m月%d日 %H:%M"),
+                    end=datetime.strptime(ctf["comp_time_end"], "%Y年%m月%d日 %H:%M"),
+                    status=CN_STATUS_MAP.get(ctf.get("status"), ctf.get("status", "")),
+                    contacts=ctf["contac"] if isinstance(ctf.get("contac"), dict) else {},
+                ))
+            except (KeyError, ValueError, AttributeError) as e:
+                logger.debug(f"跳过无法解析的国内比赛数据: {e}")
+        return contests
+
+
+class HelloCTFtimeGlobal(Source):
+    """Hello-CTFtime 国际赛事"""
+
+    name = "hello-ctftime-global"
+    label = "Hello-CTFtime"
+
+    def parse(self, data: Any) -> List[Contest]:
+        contests = []
+        for ctf in data:
+            try:
+                start_str, end_str = ctf["比赛时间"].split(" - ")
+                ident = ctf.get("比赛ID")
+                weight_text = str(ctf.get("比赛权重", "0"))
+                try:
+                    weight = float(weight_text)
+                except ValueError:
+                    weight = 0.0
+                contests.append(Contest(
+                    key=f"global:{ident}" if ident not in (None, "") else f"global:{ctf['比赛名称'].strip()}",
+                    source=self.name,
+                    region=REGION_GLOBAL,
+                    name=ctf["比赛名称"],
+                    link=ctf.get("比赛链接", ""),
+                    format=ctf.get("比赛形式", ""),
+                    organizer=ctf.get("赛事主办", "").split(" (")[0],
+                    weight=weight,
+                    weight_text=weight_text,
+                    start=datetime.strptime(start_str.strip(), "%Y-%m-%d %H:%M:%S"),
+                    end=datetime.strptime(end_str.split(" UTC")[0].strip(), "%Y-%m-%d %H:%M:%S"),
+                    status=GLOBAL_STATUS_MAP.get(ctf.get("比赛状态"), ctf.get("比赛状态", "")),
+                ))
+            except (KeyError, ValueError, AttributeError) as e:
+                logger.debug(f"跳过无法解析的国际比赛数据: {e}")
+        return contests
+
+
+class CTFtimeEvents(Source):
+    """CTFtime 官方API，获取未来 days 天内的比赛"""
+
+    name = "ctftime"
+    label = "CTFtime"
+
+    def __init__(self, url: str = "https://ctftime.org/api/v1/events/", timeout: float = 10,
+                 days: int = 30, limit: int = 200):
+        super().__init__(url, timeout)
+        self.days = days
+        self.limit = limit
+
+    async def fetch(self, client: httpx.AsyncClient) -> List[Contest]:
+        now = int(time.time())
+        response = await client.get(
+            self.url,
+            params={"limit": self.limit, "start": now - 86400 * 7, "finish": now + 86400 * self.days},
+            headers={"User-Agent": "Mozilla/5.0"},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return self.parse(response.json())
+
+    @staticmethod
+    def _parse_time(value: str) -> datetime:
+        return datetime.fromisoformat(value).astimezone(TZ_CN).replace(tzinfo=None)
+
+    def parse(self, data: Any) -> List[Contest]:
+        contests = []
+        for event in data:
+            try:
+                start = self._parse_time(event["start"])
+                end = self._parse_time(event["finish"])
+                weight = float(event.get("weight") or 0)
+                organizers = event.get("organizers") or []
+                contests.append(Contest(
+                    key=f"global:{event['id']}",
+                    source=self.name,
+                    region=REGION_GLOBAL,
+                    name=event["title"],
+                    link=event.get("url") or event.get("ctftime_url", ""),
+                    format=event.get("format", ""),
+                    organizer=organizers[0]["name"] if organizers else "",
+                    weight=weight,
+                    weight_text=f"{weight:.2f}",
+                    start=start,
+                    end=end,
+                    status=status_by_time(start, end),
+                ))
+            except (KeyError, ValueError, TypeError) as e:
+                logger.debug(f"跳过无法解析的CTFtime比赛数据: {e}")
+        return contests
+
+
+SOURCE_TYPES = {cls.name: cls for cls in (HelloCTFtimeCN, HelloCTFtimeGlobal, CTFtimeEvents)}
+
+
+class CircuitBreaker:
+    """连续失败 threshold 次后熔断 cooldown 秒，期间不再请求该数据源"""
+
+    def __init__(self, threshold: int = 3, cooldown: float = 300):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        # 冷却结束后放行一次试探请求
+        return time.monotonic() - self.opened_at >= self.cooldown
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+_NAME_STRIP = re.compile(r"[^0-9a-z一-鿿]+")
+_DIGITS = re.compile(r"\d+")
+
+
+def normalize_name(name: str) -> str:
+    """比赛名称归一化，只保留小写字母、数字和汉字"""
+    return _NAME_STRIP.sub("", name.lower())
+
+
+def is_same_name(name_a: str, name_b: str, threshold: float = 0.85) -> bool:
+    """
+    按归一化后的名称判断是否为同一场比赛
+
+    名称中的数字（年份、届数）必须一致，其余部分按相似度判断。
+    """
+    if not name_a or not name_b:
+        return False
+    if name_a == name_b:
+        return True
+    if _DIGITS.findall(name_a) != _DIGITS.findall(name_b):
+        return False
+    # 长度相差过大时相似度不可能达到阈值
+    if 2 * min(len(name_a), len(name_b)) < threshold * (len(name_a) + len(name_b)):
+        return False
+    matcher = SequenceMatcher(None, name_a, name_b)
+    return matcher.quick_ratio() >= threshold and matcher.ratio() >= threshold
+
+
+def merge_contests(groups: Iterable[List[Contest]], window: timedelta = timedelta(hours=36)) -> List[Contest]:
+    """
+    合并多个数据源的比赛
+
+    先按比赛标识合并，再在开始时间相差不超过 window 的比赛之间按名称模糊匹配。
+    排在前面的数据源优先，合并后的比赛使用它的数据并补全缺失的字段。
+
+    Args:
+        groups: 按优先级排列的各数据源比赛列表
+
+    Returns:
+        合并后的比赛列表，保持优先级和数据源中的顺序
+    """
+    merged: Dict[str, Contest] = {}
+    for contests in groups:
+        for contest in contests:
+            if contest.key in merged:
+                _absorb(merged[contest.key], contest)
+            else:
+                merged[contest.key] = contest.copy()
+
+    result = list(merged.values())
+    order = {id(c): i for i, c in enumerate(result)}
+    names = {id(c): normalize_name(c.name) for c in result}
+
+    # 名称中的数字必须一致，按数字分块后只在块内按开始时间滑动比较
+    blocks: Dict[tuple, List[Contest]] = {}
+    for contest in result:
+        if contest.start:
+            blocks.setdefault(tuple(_DIGITS.findall(names[id(contest)])), []).append(contest)
+
+    # 并查集，root 始终为优先级最高（顺序最靠前）的比赛
+    parent = {id(c): c for c in result}
+
+    def find(c: Contest) -> Contest:
+        while parent[id(c)] is not c:
+            parent[id(c)] = parent[id(parent[id(c)])]
+            c = parent[id(c)]
+        return c
+
+    for block in blocks.values():
+        if len(block) < 2:
+            continue
+        block.sort(key=lambda c: c.start)
+        for i, a in enumerate(block):
+            for j in range(i + 1, len(block)):
+                b = block[j]
+                if b.start - a.start > window:
+                    break
+                if a.source == b.source:
+                    continue
+                root_a, root_b = find(a), find(b)
+                if root_a is root_b or not is_same_name(names[id(a)], names[id(b)]):
+                    continue
+                if order[id(root_b)] < order[id(root_a)]:
+                    root_a, root_b = root_b, root_a
+                parent[id(root_b)] = root_a
+
+    output = []
+    for contest in result:
+        root = find(contest)
+        if root is contest:
+            output.append(contest)
+        else:
+            _absorb(root, contest)
+    return output
+
+
+def _absorb(target: Contest, other: Contest) -> None:
+    """用另一数据源的数据补全缺失字段"""
+    for name in ("link", "format", "tags", "organizer", "weight_text", "reg_start", "reg_end", "start", "end"):
+        if not getattr(target, name) and getattr(other, name):
+            setattr(target, name, getattr(other, name))
+    if not target.weight and other.weight:
+        target.weight = other.weight
+    if not target.contacts and other.contacts:
+        target.contacts = other.contacts
+    for source in other.sources:
+        if source not in target.sources:
+            target.sources.append(source)
+
+
+class Aggregator:
+    """多数据源聚合"""
+
+    def __init__(self, sources: List[Source], breaker_threshold: int = 3, breaker_cooldown: float = 300):
+        self.sources = sources
+        self._breakers = {s.name: CircuitBreaker(breaker_threshold, breaker_cooldown) for s in sources}
+        self._last: Dict[str, List[Contest]] = {}
+
+    async def _fetch_source(self, client: httpx.AsyncClient, source: Source) -> Optional[List[Contest]]:
+        breaker = self._breakers[source.name]
+        if not breaker.allow():
+            logger.debug(f"数据源 {source.name} 已熔断，使用上一次的数据")
+            return self._last.get(source.name)
+        try:
+            contests = await asyncio.wait_for(source.fetch(client), timeout=source.timeout)
+        except Exception as e:
+            breaker.record_failure()
+            logger.debug(f"获取数据源 {source.name} 失败({breaker.failures}次): {e!r}")
+            return self._last.get(source.name)
+        breaker.record_success()
+        self._last[source.name] = contests
+        return contests
+
+    async def fetch_all(self) -> Optional[List[Contest]]:
+        """
+        并发获取所有数据源并合并
+
+        Returns:
+            合并后的比赛列表，所有数据源都没有可用数据时返回None
+        """
+        async with httpx.AsyncClient() as client:
+            results = await asyncio.gather(*(self._fetch_source(client, s) for s in self.sources))
+        available = [r for r in results if r is not None]
+        if not available:
+            return None
+        return merge_contests(available)
+
+    def status(self) -> Dict[str, str]:
+        """各数据源的状态说明"""
+        result = {}
+        for source in self.sources:
+            breaker = self._breakers[source.name]
+            if breaker.opened_at is not None and not breaker.allow():
+                result[source.name] = "熔断中"
+            elif breaker.failures:
+                result[source.name] = f"连续失败{breaker.failures}次"
+            else:
+                result[source.name] = "正常"
+        return result
+
+
+def build_sources(names: Iterable[str], urls: Dict[str, str], timeout: float = 10) -> List[Source]:
+    """
+    根据配置创建数据源
+
+    Args:
+        names: 按优先级排列的数据源名称
+        urls: 数据源名称到地址的映射，未提供时使用默认地址
+        timeout: 每个数据源的超时时间
+    """
+    sources = []
+    for name in names:
+        cls = SOURCE_TYPES.get(name)
+        if cls is None:
+            logger.warning(f"未知的CTF数据源: {name}")
+            continue
+        if name in urls:
+            sources.append(cls(url=urls[name], timeout=timeout))
+        elif cls is CTFtimeEvents:
+            sources.append(cls(timeout=timeout))
+        else:
+            logger.warning(f"CTF数据源 {name} 缺少地址配置")
+    return sources
@@ -0,0 +1,262 @@
+"""
+按群订阅赛事推送
+
+每个群可以单独设置:
+- 国际赛事最小权重
+- 推送范围 (国内/国际/全部)
+- 比赛形式 (Jeopardy/AWD 等)
+- 比赛标签 (仅对国内赛事生效)
+- 提前推送天数
+
+订阅保存在 subscriptions.json 中，修改后编译为 SubscriptionIndex，
+每次刷新赛事数据时一次遍历完成所有赛事与所有订阅的匹配。
+"""
+import json
+import os
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from nonebot.log import logger
+
+SCOPE_ALL = "all"
+SCOPE_CN = "cn"
+SCOPE_GLOBAL = "global"
+
+SCOPE_NAMES = {
+    SCOPE_ALL: "全部",
+    SCOPE_CN: "国内",
+    SCOPE_GLOBAL: "国际",
+}
+
+# 比赛形式关键字，数据源中的写法并不统一
+FORMAT_ALIASES = {
+    "jeopardy": ("jeopardy", "解题"),
+    "awd": ("awd", "attack-defense", "attack defense", "攻防"),
+}
+
+
+class ContestView:
+    """用于订阅匹配的比赛属性，每场比赛只在数据变化时解析一次"""
+
+    __slots__ = ("key", "name", "is_global", "weight", "format", "tags", "start", "raw")
+
+    def __init__(self, key: str, name: str, is_global: bool, weight: float,
+                 format: str, tags: str, start: datetime, raw: Any):
+        self.key = key
+        self.name = name
+        self.is_global = is_global
+        self.weight = weight
+        self.format = format.lower()
+        self.tags = tags.lower()
+        # 国内比赛为报名开始时间，国际比赛为比赛开始时间
+        self.start = start
+        # 原始比赛数据 (Contest)
+        self.raw = raw
+
+
+class Subscription:
+    """单个群的订阅设置"""
+
+    def __init__(self, group_id: int, min_weight: float = 50, scope: str = SCOPE_ALL,
+                 formats: Optional[Iterable[str]] = None, tags: Optional[Iterable[str]] = None,
+                 lead_days: int = 3, enabled: bool = True):
+        self.group_id = int(group_id)
+        self.min_weight = float(min_weight)
+        self.scope = scope if scope in SCOPE_NAMES else SCOPE_ALL
+        self.formats = sorted({f.lower() for f in formats or [] if f})
+        self.tags = sorted({t.lower() for t in tags or [] if t})
+        self.lead_days = int(lead_days)
+        self.enabled = enabled
+
+        # 预先展开匹配用的关键字
+        self._format_keywords = tuple(
+            keyword for f in self.formats for keyword in FORMAT_ALIASES.get(f, (f,))
+        )
+        self._lead = timedelta(days=self.lead_days)
+
+    def accepts(self, contest: ContestView, now: datetime) -> bool:
+        """判断比赛是否符合订阅条件（权重和范围已由索引筛选）"""
+        if contest.start - now > self._lead:
+            return False
+        if self._format_keywords and not any(k in contest.format for k in self._format_keywords):
+            return False
+        if self.tags and not contest.is_global and not any(t in contest.tags for t in self.tags):
+            return False
+        return True
+
+    def describe(self) -> str:
+        """订阅设置的文字说明"""
+        return (
+            f"推送范围: {SCOPE_NAMES[self.scope]}\n"
+            f"国际赛事权重: ≥ {self.min_weight:g}\n"
+            f"比赛形式: {', '.join(self.formats) or '不限'}\n"
+            f"比赛标签: {', '.join(self.tags) or '不限'}\n"
+            f"提前推送: {self.lead_days}天"
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "min_weight": self.min_weight,
+            "scope": self.scope,
+            "formats": self.formats,
+            "tags": self.tags,
+            "lead_days": self.lead_days,
+            "enabled": self.enabled,
+        }
+
+    @classmethod
+    def from_dict(cls, group_id: int, data: Dict[str, Any]) -> "Subscription":
+        return cls(group_id, **data)
+
+
+class SubscriptionIndex:
+    """编译后的订阅索引"""
+
+    def __init__(self, subscriptions: Iterable[Subscription]):
+        active = [s for s in subscriptions if s.enabled]
+        self._cn = [s for s in active if s.scope in (SCOPE_ALL, SCOPE_CN)]
+        # 国际订阅按权重升序排列，匹配时只需取权重不高于比赛权重的前缀
+        self._global = sorted(
+            (s for s in active if s.scope in (SCOPE_ALL, SCOPE_GLOBAL)),
+            key=lambda s: s.min_weight,
+        )
+        self._global_weights = [s.min_weight for s in self._global]
+
+    def match(self, contests: Iterable[ContestView], now: Optional[datetime] = None) -> Dict[int, List[ContestView]]:
+        """
+        一次遍历匹配所有比赛与所有订阅
+
+        Args:
+            contests: 待匹配的比赛
+            now: 计算提前推送时间使用的当前时间，默认为调用时的时间
+
+        Returns:
+            {群号: 按输入顺序排列的匹配比赛列表}
+        """
+        now = now or datetime.now()
+        result: Dict[int, List[ContestView]] = {}
+        for contest in contests:
+            if contest.is_global:
+                candidates = self._global[:bisect_right(self._global_weights, contest.weight)]
+            else:
+                candidates = self._cn
+            for sub in candidates:
+                if sub.accepts(contest, now):
+                    result.setdefault(sub.group_id, []).append(contest)
+        return result
+
+
+class SubscriptionStore:
+    """订阅持久化存储"""
+
+    def __init__(self, path: Path, default_groups: Iterable[int] = (),
+                 default_factory: Optional[Callable[[int], Subscription]] = None):
+        """
+        Args:
+            path: 订阅文件路径
+            default_groups: 未单独设置订阅时使用默认设置的群（即配置中的SEND_LIST）
+            default_factory: 生成默认订阅的函数
+        """
+        self._path = Path(path)
+        self._default_groups = [int(gid) for gid in default_groups]
+        self._default_factory = default_factory or (lambda gid: Subscription(gid))
+        self._subscriptions: Dict[int, Subscription] = {}
+        self._index: Optional[SubscriptionIndex] = None
+        self.load()
+
+    def load(self) -> None:
+        self._subscriptions = {}
+        if self._path.exists():
+            try:
+                with open(self._path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+                for gid, data in raw.items():
+                    self._subscriptions[int(gid)] = Subscription.from_dict(int(gid), data)
+            except (OSError, ValueError, TypeError) as e:
+                logger.error(f"读取赛事订阅失败: {e}")
+        self._index = None
+
+    def save(self) -> None:
+        data = {str(gid): sub.to_dict() for gid, sub in self._subscriptions.items()}
+        tmp_path = self._path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.error(f"保存赛事订阅失败: {e}")
+
+    def get(self, group_id: int) -> Optional[Subscription]:
+        """获取群的生效订阅，没有订阅时返回None"""
+        sub = self._subscriptions.get(int(group_id))
+        if sub is None and int(group_id) in self._default_groups:
+            sub = self._default_factory(int(group_id))
+        return sub if sub and sub.enabled else None
+
+    def set(self, sub: Subscription) -> None:
+        self._subscriptions[sub.group_id] = sub
+        self._index = None
+        self.save()
+
+    def remove(self, group_id: int) -> bool:
+        """取消订阅，返回原先是否处于订阅状态"""
+        if self.get(group_id) is None:
+            return False
+        group_id = int(group_id)
+        if group_id in self._default_groups:
+            # 默认推送的群需要记录为禁用，否则会回退到默认订阅
+            self._subscriptions[group_id] = Subscription(group_id, enabled=False)
+        else:
+            self._subscriptions.pop(group_id, None)
+        self._index = None
+        self.save()
+        return True
+
+    def all(self) -> List[Subscription]:
+        subs = dict(self._subscriptions)
+        for gid in self._default_groups:
+            if gid not in subs:
+                subs[gid] = self._default_factory(gid)
+        return list(subs.values())
+
+    @property
+    def index(self) -> SubscriptionIndex:
+        if self._index is None:
+            self._index = SubscriptionIndex(self.all())
+        return self._index
+
+
+def parse_subscription_args(text: str, base: Subscription) -> Subscription:
+    """
+    解析订阅命令参数，未提供的字段沿用base中的设置
+
+    格式: 权重=50 范围=国内|国际|全部 形式=jeopardy,awd 标签=Web,Pwn 提前=3
+
+    Raises:
+        ValueError: 参数格式错误
+    """
+    scope_map = {v: k for k, v in SCOPE_NAMES.items()}
+    fields = base.to_dict()
+    for item in text.split():
+        if "=" not in item:
+            raise ValueError(f"无法识别的参数: {item}")
+        key, value = item.split("=", 1)
+        values = [v.strip() for v in value.replace("，", ",").split(",") if v.strip()]
+        if key == "权重":
+            fields["min_weight"] = float(value)
+        elif key == "范围":
+            if value not in scope_map:
+                raise ValueError("范围只能是 国内/国际/全部")
+            fields["scope"] = scope_map[value]
+        elif key == "形式":
+            fields["formats"] = [] if value in ("", "不限") else values
+        elif key == "标签":
+            fields["tags"] = [] if value in ("", "不限") else values
+        elif key == "提前":
+            fields["lead_days"] = int(value)
+        else:
+            raise ValueError(f"未知的参数: {key}")
+    fields["enabled"] = True
+    return Subscription.from_dict(base.group_id, fields)
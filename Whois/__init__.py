@@ -1,15 +1,23 @@
-import httpx
 import re
 import os
+import time
 from nonebot.permission import SUPERUSER
 
-from nonebot import on_command, on_message, on_regex
+from nonebot import on_command, on_message, on_regex, logger, get_bot, require
 from nonebot.adapters.onebot.v11 import Message, Bot, Event, GroupMessageEvent, MessageSegment
+from nonebot.adapters.onebot.v11.permission import GROUP_ADMIN, GROUP_OWNER
 from nonebot.params import CommandArg
 from nonebot.plugin import PluginMetadata
-from nonebot import get_plugin_config
+from nonebot import get_plugin_config, get_driver
+from pathlib import Path
 from typing import Optional, Tuple, List, Set
 from .rule import is_group_allowed, add_abled_group, remove_abled_group
+from .cache import WhoisCache
+from .config import Config
+from .resolver import build_resolver
+from .suffix import suffix_trie
+from .bulk import bulk_lookup, parse_bulk_args, render_blocks, render_csv, render_summary
+from .watchlist import WatchEngine, WatchStore, render_watchlist
 
 __plugin_meta__ = PluginMetadata(
     name="whois查询",
@@ -21,6 +29,13 @@ __plugin_meta__ = PluginMetadata(
     指令查询:
     - /whois <域名>: 查询指定域名的whois信息
     - /whois <域名> -all: 查询完整的原始whois信息
+    - /批量whois <多个域名>: 批量查询，结果按到期时间排序，加 -csv 输出CSV格式
+      也可以回复包含域名的消息或文本文件发送 /批量whois
+    
+    域名监控:
+    - /whois监控 <多个域名>: 监控域名的到期时间、状态和DNS变化，有变化时在本群提醒(群管理)
+    - /whois取消监控 <多个域名>: 取消监控(群管理)
+    - /whois监控列表: 查看本群监控的域名
     
     管理命令(仅超级用户):
     - /启用whois: 在当前群启用whois功能
@@ -42,63 +57,72 @@ enable_whois = on_regex(r"^/启用\s*whois$", priority=5, permission=SUPERUSER)
 # 原有的whois命令，添加权限检查rule
 whois_search = on_command('/whois', aliases={'/whois查询'}, priority=5, rule=is_group_allowed)
 
+# 批量查询命令
+bulk_whois = on_command('/批量whois', aliases={'/whois批量'}, priority=5, rule=is_group_allowed)
+
+# 域名监控命令
+watch_add = on_command('/whois监控', priority=5, rule=is_group_allowed,
+                       permission=SUPERUSER | GROUP_ADMIN | GROUP_OWNER)
+watch_remove = on_command('/whois取消监控', priority=5, rule=is_group_allowed,
+                          permission=SUPERUSER | GROUP_ADMIN | GROUP_OWNER)
+watch_list = on_command('/whois监控列表', priority=5, rule=is_group_allowed)
+
 # 域名匹配处理器，添加权限检查rule
 domain_matcher = on_message(rule=is_group_allowed, priority=10)
 
-# 定义常见的顶级域名(TLDs)
-COMMON_TLDS = {
-    # 通用顶级域名
-    "com", "org", "net", "edu", "gov", "mil", "int", "info", "biz", "name", 
-    "pro", "museum", "aero", "coop", "jobs", "travel", "mobi", "asia", "tel",
-    "xxx", "app", "blog", "dev", "online", "site", "store", "tech", "xyz",
-    
-    # 国家和地区顶级域名
-    "cn", "us", "uk", "jp", "fr", "de", "ru", "au", "ca", "br", "in", 
-    "it", "nl", "es", "se", "no", "fi", "dk", "ch", "at", "be", "hk", 
-    "tw", "sg", "kr", "nz", "mx", "ar", "co", "eu", "io", "me", "tv",
-    
-    # 常见多级域名
-    "co.uk", "co.jp", "com.cn", "org.cn", "net.cn", "gov.cn", "ac.cn",
-    "com.hk", "com.tw", "co.nz", "co.kr", "or.jp", "ac.jp", "ne.jp"
-
-    # 补充
-    "ci"
-}
-
-# 判断是否为有效的常见域名
-def is_common_domain(text: str) -> bool:
-    # 先执行简单的格式检查
-    if not "." in text:
-        return False
-        
-    # 检查是否只包含有效字符
-    if not all(c.isalnum() or c in ".-" for c in text):
-        return False
-        
-    # 验证顶级域名是否在常见列表中
-    parts = text.lower().split('.')
-    
-    # 限制只匹配两段式域名格式 (如example.com)，不匹配三段或更多段的域名
-    if len(parts) != 2:
-        return False
-    
-    # 检查是否为常见的顶级域名
-    tld = parts[-1]
-    return tld in COMMON_TLDS
+# 每条消息最多自动查询的域名数量
+MAX_AUTO_DOMAINS = 3
+
+# 批量查询时读取的文件大小上限
+MAX_BULK_FILE_SIZE = 1024 * 1024
+
+config = get_plugin_config(Config).WHOIS_CONFIG
+
+# 多后端查询，顶级域名对照表保存在插件目录下的 whois_bootstrap.json
+resolver = build_resolver(config, Path(__file__).parent / "whois_bootstrap.json")
+
+async def fetch_whois_info(domain: str) -> Optional[dict]:
+    """直接查询各后端，不经过缓存"""
+    return await resolver.lookup(domain)
+
+# 查询结果缓存，重启后从插件目录下的 whois_cache.db 恢复
+whois_cache = WhoisCache(fetch_whois_info, Path(__file__).parent / "whois_cache.db")
 
 async def get_whois_info(domain: str) -> Optional[dict]:
-    url = f"http://whois.4.cn/api/main?domain={domain}"
+    """查询域名的whois信息，相同域名在缓存有效期内不会重复请求接口"""
+    return await whois_cache.get(domain)
+
+async def send_watch_alert(group_id: int, message: str):
+    await get_bot().send_group_msg(group_id=group_id, message=message)
+
+# 域名监控，监控列表和快照保存在插件目录下的 whois_watch.db
+watch_store = WatchStore(Path(__file__).parent / "whois_watch.db")
+watch_engine = WatchEngine(watch_store, get_whois_info, send_watch_alert,
+                           batch=config.get("WATCH_BATCH", 100))
+
+scheduler = require("nonebot_plugin_apscheduler").scheduler
+
+@scheduler.scheduled_job("interval", minutes=config.get("WATCH_INTERVAL", 10))
+async def check_watchlist():
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, timeout=10)
-            if response.status_code != 200:
-                return None
-            data = response.json()
-            if data.get("retcode") != 0:
-                return None
-            return data.get("data")
-    except Exception:
-        return None
+        checked = await watch_engine.run_once()
+        if checked:
+            logger.info(f"已检查 {checked} 个监控的域名")
+    except Exception as e:
+        logger.error(f"检查监控的域名失败: {e}")
+
+driver = get_driver()
+
+@driver.on_startup
+async def prune_whois_cache():
+    # 清理上次运行留下的过期记录
+    whois_cache.prune()
+
+@driver.on_shutdown
+async def close_whois_cache():
+    whois_cache.close()
+    watch_store.close()
+    await resolver.close()
 
 def parse_domain(input: str) -> Tuple[str, bool]:
     parts = input.split()
@@ -203,6 +227,8 @@ async def handle_whois_search(bot: Bot, event: Event, args: Message = CommandArg
                                 + MessageSegment.text("请输入要查询的域名，例如：/whois example.com"))
     
     domain, show_all = parse_domain(input_str)
+    # 子域名按可注册域名查询，无法识别的后缀原样查询
+    domain = suffix_trie.registrable_domain(domain) or domain
     if not domain:
         await whois_search.finish(MessageSegment.reply(event.message_id) 
                                 + MessageSegment.at(int(event.user_id))
@@ -231,6 +257,138 @@ async def handle_whois_search(bot: Bot, event: Event, args: Message = CommandArg
                                 + MessageSegment.at(int(event.user_id))
                                 + MessageSegment.text(result))
 
+async def read_replied_file(bot: Bot, event: GroupMessageEvent) -> str:
+    """读取被回复消息中的文本文件，没有文件或读取失败时返回空字符串"""
+    for seg in event.reply.message:
+        if seg.type != "file":
+            continue
+        url = seg.data.get("url")
+        if not url and seg.data.get("file_id"):
+            try:
+                info = await bot.call_api("get_group_file_url", group_id=event.group_id,
+                                          file_id=seg.data["file_id"], busid=seg.data.get("busid", 102))
+                url = info.get("url")
+            except Exception as e:
+                logger.warning(f"获取群文件地址失败: {e}")
+        if not url:
+            continue
+        try:
+            async with resolver.client.stream("GET", url, follow_redirects=True) as response:
+                response.raise_for_status()
+                content = b""
+                async for chunk in response.aiter_bytes():
+                    content += chunk
+                    if len(content) >= MAX_BULK_FILE_SIZE:
+                        break
+            return content[:MAX_BULK_FILE_SIZE].decode("utf-8", errors="ignore")
+        except Exception as e:
+            logger.warning(f"下载群文件失败: {e}")
+    return ""
+
+@bulk_whois.handle()
+async def handle_bulk_whois(bot: Bot, event: Event, args: Message = CommandArg()):
+    if not isinstance(event, GroupMessageEvent):
+        await bulk_whois.finish(MessageSegment.reply(event.message_id) 
+                              + MessageSegment.at(int(event.user_id))
+                              + MessageSegment.text("whois查询功能仅在群聊中可用"))
+    
+    text, as_csv = parse_bulk_args(args.extract_plain_text())
+    # 也可以回复包含域名的消息或文本文件
+    if event.reply:
+        text += "\n" + event.reply.message.extract_plain_text()
+        text += "\n" + await read_replied_file(bot, event)
+    
+    domains = suffix_trie.find_domains(text)
+    if not domains:
+        await bulk_whois.finish(MessageSegment.reply(event.message_id) 
+                              + MessageSegment.at(int(event.user_id))
+                              + MessageSegment.text("没有找到域名，例如：/批量whois example.com example.org，"
+                                                    "或回复包含域名的消息或文本文件"))
+    
+    limit = config.get("BULK_LIMIT", 200)
+    note = ""
+    if len(domains) > limit:
+        note = f"\n域名过多，只查询前 {limit} 个（共 {len(domains)} 个）"
+        domains = domains[:limit]
+    await bot.send(event, MessageSegment.reply(event.message_id) 
+                        + MessageSegment.text(f"正在查询 {len(domains)} 个域名的whois信息...{note}"))
+    
+    start = time.monotonic()
+    results = await bulk_lookup(domains, get_whois_info, concurrency=config.get("BULK_CONCURRENCY", 20))
+    summary = render_summary(results, time.monotonic() - start)
+    
+    if as_csv:
+        await bulk_whois.finish(MessageSegment.reply(event.message_id) 
+                              + MessageSegment.text(f"{summary}\n\n{render_csv(results)}"))
+    
+    def node(content: str) -> dict:
+        return {"type": "node", "data": {"name": "whois查询", "uin": event.self_id, "content": content}}
+    
+    forward_msgs = [node(summary)]
+    forward_msgs.extend(node(block) for block in render_blocks(results))
+    await bot.send_group_forward_msg(group_id=event.group_id, messages=forward_msgs)
+
+@watch_add.handle()
+async def handle_watch_add(bot: Bot, event: GroupMessageEvent, args: Message = CommandArg()):
+    domains = suffix_trie.find_domains(args.extract_plain_text())
+    if not domains:
+        await watch_add.finish(MessageSegment.reply(event.message_id) 
+                             + MessageSegment.text("请输入要监控的域名，例如：/whois监控 example.com example.org"))
+    
+    limit = config.get("WATCH_LIMIT", 500)
+    room = limit - watch_store.count(event.group_id)
+    if room <= 0:
+        await watch_add.finish(MessageSegment.reply(event.message_id) 
+                             + MessageSegment.text(f"本群监控的域名已达到上限 {limit} 个"))
+    
+    added = watch_store.add(event.group_id, domains[:room], event.user_id)
+    if not added:
+        await watch_add.finish(MessageSegment.reply(event.message_id) 
+                             + MessageSegment.text("这些域名已经在监控中"))
+    
+    # 只检查新添加的域名，记录初始快照
+    snapshots = [s for s in watch_store.snapshots_of(event.group_id) if s.domain in added]
+    if await watch_engine.check_now(snapshots):
+        snapshots = [s for s in watch_store.snapshots_of(event.group_id) if s.domain in added]
+    msg = f"已添加 {len(added)} 个监控的域名"
+    if len(domains) > room:
+        msg += f"，超出上限的 {len(domains) - room} 个未添加"
+    await watch_add.finish(MessageSegment.reply(event.message_id) 
+                         + MessageSegment.text(msg + "\n" + render_watchlist(snapshots).split("\n", 1)[-1]))
+
+@watch_remove.handle()
+async def handle_watch_remove(bot: Bot, event: GroupMessageEvent, args: Message = CommandArg()):
+    domains = suffix_trie.find_domains(args.extract_plain_text())
+    if not domains:
+        await watch_remove.finish(MessageSegment.reply(event.message_id) 
+                                + MessageSegment.text("请输入要取消监控的域名，例如：/whois取消监控 example.com"))
+    
+    removed = watch_store.remove(event.group_id, domains)
+    if not removed:
+        await watch_remove.finish(MessageSegment.reply(event.message_id) 
+                                + MessageSegment.text("这些域名不在本群的监控列表中"))
+    await watch_remove.finish(MessageSegment.reply(event.message_id) 
+                            + MessageSegment.text(f"已取消监控: {', '.join(removed)}"))
+
+@watch_list.handle()
+async def handle_watch_list(bot: Bot, event: GroupMessageEvent):
+    snapshots = watch_store.snapshots_of(event.group_id)
+    if not snapshots:
+        await watch_list.finish(MessageSegment.reply(event.message_id) 
+                              + MessageSegment.text("本群没有监控的域名，使用 /whois监控 <域名> 添加"))
+    
+    text = render_watchlist(snapshots)
+    if len(snapshots) <= 30:
+        await watch_list.finish(MessageSegment.reply(event.message_id) + MessageSegment.text(text))
+    
+    # 域名较多时合并转发，每段 30 个
+    header, *lines = text.split("\n")
+    def node(content: str) -> dict:
+        return {"type": "node", "data": {"name": "whois监控", "uin": event.self_id, "content": content}}
+    forward_msgs = [node(header)]
+    forward_msgs.extend(node("\n".join(lines[i:i + 30])) for i in range(0, len(lines), 30))
+    await bot.send_group_forward_msg(group_id=event.group_id, messages=forward_msgs)
+
 @domain_matcher.handle()
 async def handle_domain_message(bot: Bot, event: Event):
     # 获取消息文本
@@ -248,9 +406,8 @@ async def handle_domain_message(bot: Bot, event: Event):
     if not isinstance(event, GroupMessageEvent):
         return
 
-    # 检查消息是否就是一个域名（无需正则匹配）
-    if is_common_domain(msg):
-        domain = msg
+    # 一次扫描找出消息中所有后缀在列表中的域名
+    for domain in suffix_trie.find_domains(msg, limit=MAX_AUTO_DOMAINS):
         await bot.send(event, MessageSegment.reply(event.message_id) 
                             + MessageSegment.at(int(event.user_id))
                             + MessageSegment.text(f"检测到域名: {domain} 正在查询whois信息..."))
@@ -260,10 +417,9 @@ async def handle_domain_message(bot: Bot, event: Event):
             await bot.send(event, MessageSegment.reply(event.message_id) 
                                 + MessageSegment.at(int(event.user_id))
                                 + MessageSegment.text("whois查询失败，请检查域名格式或稍后再试"))
-            return
+            continue
         
         result = format_whois_result(data)
         await bot.send(event, MessageSegment.reply(event.message_id) 
                             + MessageSegment.at(int(event.user_id))
-                            + MessageSegment.text(result))
-        return
\ No newline at end of file
+                            + MessageSegment.text(result))
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+whois插件离线基准测试
+
+通过本地替身服务模拟 whois.4.cn、RDAP 和 WHOIS 服务器，
+分别测量文本解析、单个后端查询、后端不可用时的切换、后端较慢时的并行查询以及缓存命中的耗时，无需访问外网。
+
+用法（在插件所在目录的上一级执行，需要安装 nonebot2、onebot v11 适配器和 nonebot_plugin_apscheduler）:
+    python Whois/benchmark.py                          # 默认200个域名
+    python Whois/benchmark.py --domains 2000 --concurrency 100
+    python Whois/benchmark.py --latency 0.05 --slow 2 --hedge 0.3
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, List
+
+from replay import FakeRegistry, make_records, to_rdap, to_whois_text
+
+PLUGIN_DIR = Path(__file__).resolve().parent
+
+
+def load_plugin(config: dict, workdir: Path):
+    """以none驱动初始化NoneBot并加载whois插件，查询地址指向本地替身服务"""
+    import nonebot
+
+    nonebot.init(driver="~none", WHOIS_CONFIG=config)
+    sys.path.insert(0, str(PLUGIN_DIR.parent))
+    plugin = nonebot.load_plugin(PLUGIN_DIR.name)
+    if plugin is None:
+        raise RuntimeError("加载whois插件失败")
+    whois = plugin.module
+    # 缓存和对照表改为临时文件，避免污染插件目录中的数据
+    whois.whois_cache.close()
+    whois.whois_cache = whois.WhoisCache(whois.fetch_whois_info, workdir / "whois_cache.db")
+    whois.watch_store.close()
+    whois.watch_store = whois.WatchStore(workdir / "whois_watch.db")
+    whois.watch_engine.store = whois.watch_store
+    return whois
+
+
+def bench(name: str, func: Callable[[], object], rounds: int, items: int) -> List[str]:
+    """运行 rounds 次并返回结果行"""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    mean = statistics.mean(samples)
+    p50 = statistics.median(samples)
+    p95 = sorted(samples)[max(0, int(len(samples) * 0.95) - 1)]
+    throughput = items / mean if mean else float("inf")
+    return [name, f"{mean * 1000:.3f}", f"{p50 * 1000:.3f}", f"{p95 * 1000:.3f}", f"{throughput:,.0f}"]
+
+
+def print_table(rows: List[List[str]]) -> None:
+    header = ["阶段", "平均(ms)", "P50(ms)", "P95(ms)", "吞吐(个/秒)"]
+    widths = [max(len(str(r[i])) for r in [header] + rows) + 2 for i in range(len(header))]
+    for row in [header] + rows:
+        print("".join(str(cell).ljust(w) for cell, w in zip(row, widths)))
+
+
+async def lookup_all(lookup: Callable[[str], Awaitable], domains: List[str], concurrency: int) -> int:
+    """并发查询所有域名，返回有结果的数量"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(domain: str):
+        async with semaphore:
+            return await lookup(domain)
+
+    results = await asyncio.gather(*(one(d) for d in domains))
+    return sum(1 for r in results if r)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="whois插件离线基准测试")
+    parser.add_argument("--domains", type=int, default=200, help="合成的域名数量")
+    parser.add_argument("--rounds", type=int, default=5, help="每个阶段运行的次数")
+    parser.add_argument("--concurrency", type=int, default=50, help="同时进行的查询数量")
+    parser.add_argument("--latency", type=float, default=0.0, help="替身服务每个请求的模拟延迟(秒)")
+    parser.add_argument("--slow", type=float, default=1.0, help="测试并行查询时 4.cn 的延迟(秒)")
+    parser.add_argument("--hedge", type=float, default=0.2, help="启动下一个后端前等待的秒数")
+    parser.add_argument("--seed", type=int, default=0, help="合成数据的随机种子")
+    args = parser.parse_args()
+
+    records = make_records(args.domains, seed=args.seed)
+    domains = list(records)
+    latency = {name: args.latency for name in ("4.cn", "rdap", "whois")}
+
+    with FakeRegistry(records, latency=latency) as registry, tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        whois = load_plugin({**registry.config, "HEDGE_DELAY": args.hedge}, workdir)
+        resolver_module = sys.modules[f"{PLUGIN_DIR.name}.resolver"]
+        loop = asyncio.new_event_loop()
+        run = loop.run_until_complete
+
+        texts = [to_whois_text(r) for r in records.values()]
+        rdaps = [to_rdap(r) for r in records.values()]
+        rows = [
+            bench("解析WHOIS文本", lambda: [resolver_module.parse_whois_text(t) for t in texts], args.rounds, len(texts)),
+            bench("解析RDAP", lambda: [resolver_module.parse_rdap(d) for d in rdaps], args.rounds, len(rdaps)),
+        ]
+
+        def resolver_for(backends: List[str]):
+            config = {**registry.config, "BACKENDS": backends, "HEDGE_DELAY": args.hedge}
+            return resolver_module.build_resolver(config, workdir / f"bootstrap-{'-'.join(backends)}.json")
+
+        def run_resolver(name: str, backends: List[str]):
+            resolver = resolver_for(backends)
+            # 先查询一次，对照表的获取不计入耗时
+            run(resolver.lookup(domains[0]))
+            rows.append(bench(name, lambda: run(lookup_all(resolver.lookup, domains, args.concurrency)),
+                              args.rounds, len(domains)))
+            run(resolver.close())
+
+        for backend in ("4.cn", "rdap", "whois"):
+            run_resolver(f"单后端 {backend}", [backend])
+
+        registry.down.add("4.cn")
+        run_resolver("4.cn不可用，切换后端", ["4.cn", "rdap", "whois"])
+        registry.down.clear()
+
+        registry.latency["4.cn"] = args.slow
+        run_resolver(f"4.cn延迟{args.slow:g}秒，并行查询", ["4.cn", "rdap", "whois"])
+        registry.latency["4.cn"] = args.latency
+
+        whois.resolver = resolver_for(["rdap"])
+        run(lookup_all(whois.get_whois_info, domains, args.concurrency))
+        rows.append(bench("缓存命中", lambda: run(lookup_all(whois.get_whois_info, domains, args.concurrency)),
+                          args.rounds, len(domains)))
+        run(whois.resolver.close())
+        whois.whois_cache.close()
+
+        print(f"域名数: {len(domains)}  并发: {args.concurrency}  模拟延迟: {args.latency}s  "
+              f"并行查询等待: {args.hedge}s")
+        print(f"替身服务请求数: {registry.requests}")
+        print_table(rows)
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
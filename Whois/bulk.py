@@ -0,0 +1,126 @@
+"""
+批量 whois 查询
+
+并发查询多个域名（经过查询缓存，每个后端的请求数由 Resolver 限制），结果按到期时间排序，
+可以生成合并转发的分段内容或 CSV 格式的汇总。
+"""
+import asyncio
+import datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from .cache import parse_date
+
+# 剩余天数少于该值时标记为即将到期
+EXPIRING_DAYS = 30
+CSV_HEADER = "域名,注册商,创建时间,到期时间,剩余天数,状态,DNS,数据来源"
+
+
+class BulkResult:
+    """单个域名的查询结果"""
+
+    __slots__ = ('domain', 'data', 'expire')
+
+    def __init__(self, domain: str, data: Optional[dict]):
+        self.domain = domain
+        self.data = data
+        self.expire: Optional[datetime.datetime] = parse_date(data.get("expire_date")) if data else None
+
+    def days_left(self, now: datetime.datetime) -> Optional[int]:
+        if self.expire is None:
+            return None
+        return (self.expire - now).days
+
+    def sort_key(self) -> Tuple[int, datetime.datetime, str]:
+        # 到期时间早的在前，没有到期时间和查询失败的排在最后
+        if self.expire is not None:
+            return 0, self.expire, self.domain
+        return (1 if self.data else 2), datetime.datetime.max, self.domain
+
+
+def parse_bulk_args(text: str) -> Tuple[str, bool]:
+    """去掉参数中的 -csv，返回 (剩余文本, 是否输出CSV)"""
+    parts = text.split()
+    as_csv = any(p.lower() == "-csv" for p in parts)
+    return " ".join(p for p in parts if p.lower() != "-csv"), as_csv
+
+
+async def bulk_lookup(domains: List[str], lookup: Callable[[str], Awaitable[Optional[dict]]],
+                      concurrency: int = 20) -> List[BulkResult]:
+    """并发查询所有域名，返回按到期时间排序的结果"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(domain: str) -> BulkResult:
+        async with semaphore:
+            try:
+                return BulkResult(domain, await lookup(domain))
+            except Exception:
+                return BulkResult(domain, None)
+
+    results = await asyncio.gather(*(one(d) for d in domains))
+    return sorted(results, key=BulkResult.sort_key)
+
+
+def render_summary(results: List[BulkResult], elapsed: float, now: Optional[datetime.datetime] = None) -> str:
+    now = now or datetime.datetime.now()
+    ok = [r for r in results if r.data]
+    expired = [r for r in ok if r.expire is not None and r.expire <= now]
+    expiring = [r for r in ok if r.expire is not None and r.expire > now and r.days_left(now) < EXPIRING_DAYS]
+    lines = [
+        f"📋 批量whois查询: {len(results)} 个域名，用时 {elapsed:.1f} 秒",
+        f"├ 成功：{len(ok)}",
+        f"├ 失败：{len(results) - len(ok)}",
+        f"├ {EXPIRING_DAYS}天内到期：{len(expiring)}",
+        f"└ 已过期：{len(expired)}",
+    ]
+    return "\n".join(lines)
+
+
+def render_line(result: BulkResult, now: datetime.datetime) -> str:
+    if not result.data:
+        return f"❌ {result.domain}  查询失败"
+    days = result.days_left(now)
+    if days is None:
+        mark, left = "❔", "到期时间未知"
+    elif days < 0:
+        mark, left = "⛔", f"已过期 {-days} 天"
+    elif days < EXPIRING_DAYS:
+        mark, left = "⚠️", f"剩余 {days} 天"
+    else:
+        mark, left = "✅", f"剩余 {days} 天"
+    registrar = result.data.get("registrars") or "未知注册商"
+    expire = result.data.get("expire_date") or "暂无信息"
+    return f"{mark} {result.domain}\n  到期：{expire}（{left}）\n  注册商：{registrar}"
+
+
+def render_blocks(results: List[BulkResult], size: int = 10, now: Optional[datetime.datetime] = None) -> List[str]:
+    """按到期时间排列的结果，每 size 个域名一段，用于合并转发"""
+    now = now or datetime.datetime.now()
+    lines = [render_line(r, now) for r in results]
+    return ["\n".join(lines[i:i + size]) for i in range(0, len(lines), size)]
+
+
+def _csv_field(value) -> str:
+    text = "" if value is None else str(value)
+    if any(c in text for c in ',"\n'):
+        text = '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def render_csv(results: List[BulkResult], now: Optional[datetime.datetime] = None) -> str:
+    """CSV 格式的结果，按到期时间排序"""
+    now = now or datetime.datetime.now()
+    rows = [CSV_HEADER]
+    for r in results:
+        data = r.data or {}
+        days = r.days_left(now)
+        rows.append(",".join(_csv_field(v) for v in (
+            r.domain,
+            data.get("registrars"),
+            data.get("create_date"),
+            data.get("expire_date"),
+            days if days is not None else "",
+            " ".join(data.get("status") or []) if r.data else "查询失败",
+            " ".join(data.get("nameserver") or []),
+            data.get("source"),
+        )))
+    return "\n".join(rows)
@@ -0,0 +1,174 @@
+'''
+whois 查询结果缓存
+
+- 以规范化后的域名为键，内存中保留最近使用的结果，同时写入插件目录下的 whois_cache.db，重启后仍然有效
+- 缓存时间根据结果决定：临近到期或最近更新过的域名信息变化较快，缓存时间较短
+- 查询失败的结果只在内存中缓存几分钟，避免反复查询不存在的域名
+- 同一个域名同时有多个查询时只请求一次，其余查询等待同一个结果
+'''
+import asyncio
+import datetime
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from nonebot import logger
+
+# 缓存时间，单位秒
+DEFAULT_TTL = 12 * 3600
+SHORT_TTL = 3600
+MIN_TTL = 10 * 60
+NEGATIVE_TTL = 5 * 60
+
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%SZ", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d")
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS whois_cache (
+    domain  TEXT PRIMARY KEY,
+    data    TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+'''
+
+
+def normalize_domain(domain: str) -> str:
+    '''小写、去掉首尾空白和末尾的点，国际化域名转为 punycode'''
+    domain = domain.strip().lower().rstrip(".")
+    try:
+        return domain.encode("idna").decode("ascii")
+    except UnicodeError:
+        return domain
+
+
+def parse_date(value) -> Optional[datetime.datetime]:
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip()
+    # 去掉时区、毫秒等后缀后再尝试
+    for text in (value, value[:19], value[:10]):
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+    return None
+
+
+def ttl_for(data: dict, now: Optional[datetime.datetime] = None) -> float:
+    '''根据到期时间和更新时间决定缓存时间'''
+    now = now or datetime.datetime.now()
+    ttl = DEFAULT_TTL
+    expire = parse_date(data.get("expire_date"))
+    if expire is not None:
+        remaining = (expire - now).total_seconds()
+        if remaining < 7 * 86400:
+            # 临近到期或已过期，续费、删除等状态随时可能变化
+            ttl = min(ttl, SHORT_TTL)
+        else:
+            ttl = min(ttl, remaining / 2)
+    update = parse_date(data.get("update_date"))
+    if update is not None and (now - update).total_seconds() < 2 * 86400:
+        ttl = min(ttl, SHORT_TTL)
+    return max(ttl, MIN_TTL)
+
+
+class WhoisCache:
+    '''内存 + SQLite 两级缓存'''
+
+    def __init__(self, fetch: Callable[[str], Awaitable[Optional[dict]]], path: Path, size: int = 512):
+        '''
+        参数：
+
+        fetch: 实际查询函数，失败时返回 None
+
+        path: SQLite 文件路径
+
+        size: 内存中最多保留的域名数量
+        '''
+        self.fetch = fetch
+        self.size = size
+        self._memory: "OrderedDict[str, Tuple[float, Optional[dict]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._conn = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.hits = self.misses = 0
+
+    def close(self):
+        self._conn.close()
+
+    def _remember(self, domain: str, expires: float, data: Optional[dict]):
+        self._memory[domain] = (expires, data)
+        self._memory.move_to_end(domain)
+        while len(self._memory) > self.size:
+            self._memory.popitem(last=False)
+
+    def peek(self, domain: str) -> Tuple[bool, Optional[dict]]:
+        '''
+        只查询缓存
+
+        返回值：
+
+        (是否命中, 结果)，命中的失败结果为 (True, None)
+        '''
+        now = time.time()
+        item = self._memory.get(domain)
+        if item is not None:
+            if item[0] > now:
+                self._memory.move_to_end(domain)
+                return True, item[1]
+            del self._memory[domain]
+        row = self._conn.execute("SELECT data, expires FROM whois_cache WHERE domain = ?", (domain,)).fetchone()
+        if row is not None and row[1] > now:
+            data = json.loads(row[0])
+            self._remember(domain, row[1], data)
+            return True, data
+        return False, None
+
+    def put(self, domain: str, data: Optional[dict]):
+        if data is None:
+            # 失败的结果只保留在内存中
+            self._remember(domain, time.time() + NEGATIVE_TTL, None)
+            return
+        expires = time.time() + ttl_for(data)
+        self._remember(domain, expires, data)
+        try:
+            self._conn.execute("INSERT OR REPLACE INTO whois_cache (domain, data, expires) VALUES (?, ?, ?)",
+                               (domain, json.dumps(data, ensure_ascii=False), expires))
+        except Exception as e:
+            logger.warning(f"写入whois缓存失败: {e}")
+
+    async def get(self, domain: str) -> Optional[dict]:
+        '''获取域名的whois信息，优先使用缓存'''
+        domain = normalize_domain(domain)
+        hit, data = self.peek(domain)
+        if hit:
+            self.hits += 1
+            return data
+        task = self._inflight.get(domain)
+        if task is not None:
+            # 同一个域名正在查询，等待同一个结果
+            self.hits += 1
+        else:
+            self.misses += 1
+            # 查询在单独的任务中进行，某个等待者（包括发起者）被取消不影响其他等待者
+            task = asyncio.ensure_future(self._load(domain))
+            self._inflight[domain] = task
+            task.add_done_callback(lambda _: self._inflight.pop(domain, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, domain: str) -> Optional[dict]:
+        try:
+            data = await self.fetch(domain)
+        except Exception as e:
+            logger.warning(f"whois查询 {domain} 失败: {e}")
+            data = None
+        self.put(domain, data)
+        return data
+
+    def prune(self) -> int:
+        '''删除磁盘中已过期的记录，返回删除的数量'''
+        return self._conn.execute("DELETE FROM whois_cache WHERE expires <= ?", (time.time(),)).rowcount
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+
+class Config(BaseModel):
+    """whois查询插件设置"""
+
+    WHOIS_CONFIG: dict = {
+        "BACKENDS": ["4.cn", "rdap", "whois"],  # 启用的查询后端，排在前面的优先
+        "HEDGE_DELAY": 1.5,  # 前一个后端超过该秒数没有结果时，同时启动下一个后端
+        "TIMEOUT": 10,  # 每个后端的超时时间，单位为秒
+        "API_URL": "http://whois.4.cn/api/main",  # whois.4.cn 查询接口
+        "RDAP_BOOTSTRAP_URL": "https://data.iana.org/rdap/dns.json",  # IANA RDAP 顶级域名对照表
+        "IANA_WHOIS": "whois.iana.org",  # 查询顶级域名 WHOIS 服务器的地址
+        "WHOIS_PORT": 43,  # WHOIS 服务端口
+        "RATE_LIMIT": {"4.cn": 10, "rdap": 10, "whois": 5},  # 每个后端每秒最多请求数，0表示不限制
+        "BULK_CONCURRENCY": 20,  # 批量查询时同时进行的查询数量
+        "BULK_LIMIT": 200,  # 批量查询最多的域名数量
+        "WATCH_INTERVAL": 10,  # 检查监控域名的间隔，单位为分钟
+        "WATCH_BATCH": 100,  # 每次最多检查的监控域名数量
+        "WATCH_LIMIT": 500,  # 每个群最多监控的域名数量
+    }
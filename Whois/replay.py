@@ -0,0 +1,272 @@
+"""
+离线替身服务
+
+- make_records: 生成任意数量的合成域名记录
+- FakeRegistry: 本地 HTTP + WHOIS 服务，同时替代 whois.4.cn 接口、IANA RDAP 对照表、RDAP 服务和 WHOIS 服务器，
+  可以为每个后端单独设置延迟或让其不可用，用于测试解析和多后端切换
+
+只依赖标准库，不会被插件本身导入，供 benchmark.py 或调试时使用。
+"""
+import json
+import random
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional, Set
+from urllib.parse import parse_qs, urlsplit
+
+TLDS = ("com", "net", "org", "cn", "io", "xyz")
+STATUSES = ("clientTransferProhibited", "clientDeleteProhibited", "serverHold", "ok")
+BACKENDS = ("4.cn", "rdap", "whois")
+
+
+def make_records(count: int, seed: int = 0) -> Dict[str, dict]:
+    """
+    生成合成域名记录，时间相对当前时间生成
+
+    Args:
+        count: 域名数量
+        seed: 随机种子，相同种子生成相同数据
+
+    Returns:
+        {域名: 记录}
+    """
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    records = {}
+    for i in range(count):
+        domain = f"example{i}.{TLDS[i % len(TLDS)]}"
+        created = now - timedelta(days=rng.randint(30, 3650))
+        records[domain] = {
+            "domain": domain,
+            "registrar": f"Registrar {i % 17}, Inc.",
+            "created": created,
+            "expires": now + timedelta(days=rng.randint(1, 730)),
+            "updated": now - timedelta(days=rng.randint(0, 29)),
+            "status": rng.sample(STATUSES, rng.randint(1, 2)),
+            "nameservers": [f"ns{n}.dns{i % 5}.example.net" for n in (1, 2)],
+            "registrant": f"Owner {i}",
+            "org": f"Org {i % 23}",
+            "email": f"owner{i}@example.net",
+            "phone": f"+86.1380000{i % 10000:04d}",
+        }
+    return records
+
+
+def to_4cn(record: dict) -> dict:
+    fmt = "%Y-%m-%d %H:%M:%S"
+    return {
+        "domain_name": record["domain"],
+        "registrars": record["registrar"],
+        "create_date": record["created"].strftime(fmt),
+        "expire_date": record["expires"].strftime(fmt),
+        "update_date": record["updated"].strftime(fmt),
+        "status": record["status"],
+        "nameserver": record["nameservers"],
+        "owner_name": record["registrant"],
+        "owner_org": record["org"],
+        "owner_email": record["email"],
+        "owner_phone": record["phone"],
+        "meta_data": to_whois_text(record),
+    }
+
+
+def to_rdap(record: dict) -> dict:
+    fmt = "%Y-%m-%dT%H:%M:%SZ"
+    return {
+        "objectClassName": "domain",
+        "ldhName": record["domain"].upper(),
+        "status": record["status"],
+        "events": [
+            {"eventAction": "registration", "eventDate": record["created"].strftime(fmt)},
+            {"eventAction": "expiration", "eventDate": record["expires"].strftime(fmt)},
+            {"eventAction": "last changed", "eventDate": record["updated"].strftime(fmt)},
+        ],
+        "nameservers": [{"objectClassName": "nameserver", "ldhName": ns.upper()} for ns in record["nameservers"]],
+        "entities": [
+            {"objectClassName": "entity", "roles": ["registrar"],
+             "vcardArray": ["vcard", [["version", {}, "text", "4.0"], ["fn", {}, "text", record["registrar"]]]]},
+            {"objectClassName": "entity", "roles": ["registrant"],
+             "vcardArray": ["vcard", [
+                 ["version", {}, "text", "4.0"],
+                 ["fn", {}, "text", record["registrant"]],
+                 ["org", {}, "text", record["org"]],
+                 ["email", {}, "text", record["email"]],
+                 ["tel", {"type": "voice"}, "uri", f"tel:{record['phone']}"],
+             ]]},
+        ],
+    }
+
+
+def to_whois_text(record: dict) -> str:
+    fmt = "%Y-%m-%dT%H:%M:%SZ"
+    lines = [
+        f"   Domain Name: {record['domain'].upper()}",
+        f"   Registrar: {record['registrar']}",
+        f"   Updated Date: {record['updated'].strftime(fmt)}",
+        f"   Creation Date: {record['created'].strftime(fmt)}",
+        f"   Registry Expiry Date: {record['expires'].strftime(fmt)}",
+    ]
+    lines += [f"   Domain Status: {s} https://icann.org/epp#{s}" for s in record["status"]]
+    lines += [f"   Name Server: {ns.upper()}" for ns in record["nameservers"]]
+    lines += [
+        f"   Registrant Name: {record['registrant']}",
+        f"   Registrant Organization: {record['org']}",
+        f"   Registrant Email: {record['email']}",
+        f"   Registrant Phone: {record['phone']}",
+        ">>> Last update of whois database: 2024-01-01T00:00:00Z <<<",
+    ]
+    return "\r\n".join(lines) + "\r\n"
+
+
+class _QuietMixin:
+    # 默认的监听队列只有5，并发查询时会因重传SYN多等待1秒
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # 多后端切换时较慢的查询会被取消，客户端提前断开是正常情况
+        pass
+
+
+class _HTTPServer(_QuietMixin, ThreadingHTTPServer):
+    pass
+
+
+class _WhoisServer(_QuietMixin, socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+
+class FakeRegistry:
+    """
+    本地 whois 服务替身
+
+    用法:
+        with FakeRegistry(make_records(100)) as registry:
+            registry.config  # 指向替身服务的 WHOIS_CONFIG
+    """
+
+    def __init__(self, records: Dict[str, dict], latency: Optional[Dict[str, float]] = None,
+                 down: Iterable[str] = ()):
+        """
+        Args:
+            records: {域名: 记录}，见 make_records
+            latency: 后端名称 -> 每个请求额外等待的秒数，用于模拟网络延迟
+            down: 不可用的后端名称，HTTP 后端返回 500，WHOIS 直接断开连接
+        """
+        self.records = records
+        self.latency: Dict[str, float] = dict(latency or {})
+        self.down: Set[str] = set(down)
+        self.requests: Dict[str, int] = {name: 0 for name in BACKENDS}
+        self._http: Optional[_HTTPServer] = None
+        self._whois: Optional[_WhoisServer] = None
+
+    def _hit(self, backend: str) -> bool:
+        """记录请求并模拟延迟，返回后端是否可用"""
+        self.requests[backend] += 1
+        if self.latency.get(backend):
+            time.sleep(self.latency[backend])
+        return backend not in self.down
+
+    def _make_http_handler(self):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status: int, body: dict):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == "/api/main":
+                    if not registry._hit("4.cn"):
+                        return self._reply(500, {})
+                    domain = parse_qs(url.query).get("domain", [""])[0].lower()
+                    record = registry.records.get(domain)
+                    if record is None:
+                        return self._reply(200, {"retcode": 1, "msg": "not found"})
+                    return self._reply(200, {"retcode": 0, "data": to_4cn(record)})
+                if url.path == "/rdap/dns.json":
+                    tlds = sorted({d.rsplit(".", 1)[-1] for d in registry.records})
+                    return self._reply(200, {"services": [[tlds, [f"{registry.base_url}/rdap/"]]]})
+                if url.path.startswith("/rdap/domain/"):
+                    if not registry._hit("rdap"):
+                        return self._reply(500, {})
+                    record = registry.records.get(url.path.rsplit("/", 1)[-1].lower())
+                    if record is None:
+                        return self._reply(404, {"errorCode": 404})
+                    return self._reply(200, to_rdap(record))
+                self._reply(404, {})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _make_whois_handler(self):
+        registry = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                query = self.rfile.readline().decode("utf-8", errors="replace").strip().lower()
+                if "." not in query:
+                    # 向 IANA 查询顶级域名，不计入 WHOIS 后端的请求
+                    host = registry.whois_host
+                    self.wfile.write(f"domain:       {query.upper()}\r\nwhois:        {host}\r\n".encode())
+                    return
+                if not registry._hit("whois"):
+                    return
+                record = registry.records.get(query)
+                text = to_whois_text(record) if record else f'No match for "{query.upper()}".\r\n'
+                self.wfile.write(text.encode())
+
+        return Handler
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._http.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def whois_host(self) -> str:
+        return self._whois.server_address[0]
+
+    @property
+    def whois_port(self) -> int:
+        return self._whois.server_address[1]
+
+    @property
+    def config(self) -> dict:
+        """指向替身服务的 WHOIS_CONFIG"""
+        return {
+            "BACKENDS": list(BACKENDS),
+            "API_URL": f"{self.base_url}/api/main",
+            "RDAP_BOOTSTRAP_URL": f"{self.base_url}/rdap/dns.json",
+            "IANA_WHOIS": self.whois_host,
+            "WHOIS_PORT": self.whois_port,
+        }
+
+    def start(self) -> "FakeRegistry":
+        self._http = _HTTPServer(("127.0.0.1", 0), self._make_http_handler())
+        self._whois = _WhoisServer(("127.0.0.1", 0), self._make_whois_handler())
+        for server in (self._http, self._whois):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        for server in (self._http, self._whois):
+            if server:
+                server.shutdown()
+                server.server_close()
+        self._http = self._whois = None
+
+    def __enter__(self) -> "FakeRegistry":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,530 @@
+"""
+whois 查询后端
+
+每个后端负责查询并解析自己的格式，统一转换为与 whois.4.cn 接口相同的字段：
+domain_name, registrars, create_date, expire_date, update_date, status, nameserver,
+owner_name, owner_org, owner_email, owner_phone, meta_data(原始信息), source(后端名称)
+
+内置后端:
+- 4.cn: whois.4.cn 公开接口
+- rdap: RDAP 协议，按 IANA 对照表找到顶级域名的 RDAP 服务
+- whois: 直接连接 WHOIS 服务器的 43 端口，服务器地址向 IANA 查询，薄注册局会再跟随一次注册商的 WHOIS 服务器
+
+Resolver 按优先级启动后端：前一个后端失败，或超过 hedge_delay 秒还没有结果时启动下一个，
+返回最先得到的结果并取消其余查询。连续失败的后端会暂时熔断。
+每个后端可以单独限制每秒请求数，排队超过 hedge_delay 的后端会先跳过，请求分给其他后端。
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from nonebot.log import logger
+
+from .cache import parse_date
+
+# 单次 WHOIS 响应的最大长度，防止异常服务器无限输出
+MAX_WHOIS_RESPONSE = 1024 * 1024
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def format_date(value) -> Optional[str]:
+    """各后端的时间统一为 "%Y-%m-%d %H:%M:%S"，无法解析时保留原文"""
+    if not value:
+        return None
+    date = parse_date(value)
+    return date.strftime(DATE_FORMAT) if date else str(value)
+
+
+# WHOIS 文本中的字段名（小写）-> 统一字段，列表字段会收集所有值，其余字段取第一个值
+WHOIS_FIELDS = {
+    "domain name": "domain_name", "domain": "domain_name",
+    "registrar": "registrars", "sponsoring registrar": "registrars", "registrar name": "registrars",
+    "creation date": "create_date", "created": "create_date", "created on": "create_date",
+    "registration time": "create_date", "registration date": "create_date", "registered on": "create_date",
+    "registry expiry date": "expire_date", "registrar registration expiration date": "expire_date",
+    "expiration date": "expire_date", "expiration time": "expire_date", "expiry date": "expire_date",
+    "expires": "expire_date", "expires on": "expire_date", "paid-till": "expire_date",
+    "updated date": "update_date", "last updated": "update_date", "last modified": "update_date",
+    "updated": "update_date", "changed": "update_date",
+    "domain status": "status", "status": "status", "state": "status",
+    "name server": "nameserver", "nameserver": "nameserver", "nserver": "nameserver", "name servers": "nameserver",
+    "registrant name": "owner_name", "registrant": "owner_name",
+    "registrant organization": "owner_org", "registrant organisation": "owner_org", "org": "owner_org",
+    "registrant email": "owner_email", "registrant contact email": "owner_email",
+    "registrant phone": "owner_phone",
+    "registrar whois server": "referral", "whois server": "referral",
+}
+LIST_FIELDS = ("status", "nameserver")
+DATE_FIELDS = ("create_date", "expire_date", "update_date")
+
+_WHOIS_LINE = re.compile(r"^\s*([^:\r\n%#>]{1,60}?)\s*:\s*(.*?)\s*$", re.M)
+
+
+def parse_whois_text(text: str) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    解析 WHOIS 文本
+
+    返回值：
+    (统一字段的结果, 注册商 WHOIS 服务器)，没有找到域名信息时结果为 None
+    """
+    result: dict = {field: [] for field in LIST_FIELDS}
+    for key, value in _WHOIS_LINE.findall(text):
+        field = WHOIS_FIELDS.get(key.lower())
+        if field is None or not value:
+            continue
+        if field in LIST_FIELDS:
+            # 状态后面常带说明链接，DNS 服务器后面可能带 IP
+            item = value.split()[0]
+            item = item.lower().rstrip(".") if field == "nameserver" else item
+            if item not in result[field]:
+                result[field].append(item)
+        elif field not in result:
+            result[field] = value
+    referral = result.pop("referral", None)
+    if not result.get("domain_name") or not (result.get("create_date") or result.get("expire_date")):
+        return None, referral
+    result["domain_name"] = result["domain_name"].lower()
+    for field in DATE_FIELDS:
+        if field in result:
+            result[field] = format_date(result[field])
+    result["meta_data"] = text.strip()
+    return result, referral
+
+
+def _vcard(entity: dict) -> Dict[str, str]:
+    """取出 RDAP 实体 vCard 中的姓名、机构、邮箱和电话"""
+    card = {}
+    vcard = entity.get("vcardArray") or []
+    for item in (vcard[1] if len(vcard) > 1 else []):
+        if len(item) < 4 or item[0] in card:
+            continue
+        value = item[3]
+        if isinstance(value, list):
+            value = " ".join(str(v) for v in value if v)
+        if item[0] == "tel" and isinstance(value, str) and value.startswith("tel:"):
+            value = value[4:]
+        card[item[0]] = value
+    return card
+
+
+def parse_rdap(data: dict) -> Optional[dict]:
+    """解析 RDAP 域名查询结果"""
+    if not isinstance(data, dict) or data.get("objectClassName") != "domain":
+        return None
+    events = {e.get("eventAction"): e.get("eventDate") for e in data.get("events", [])}
+    result = {
+        "domain_name": (data.get("ldhName") or "").lower(),
+        "create_date": format_date(events.get("registration")),
+        "expire_date": format_date(events.get("expiration")),
+        "update_date": format_date(events.get("last changed")),
+        "status": list(data.get("status", [])),
+        "nameserver": [ns["ldhName"].lower().rstrip(".") for ns in data.get("nameservers", []) if ns.get("ldhName")],
+    }
+    for entity in data.get("entities", []):
+        roles = entity.get("roles", [])
+        card = _vcard(entity)
+        if "registrar" in roles:
+            result["registrars"] = card.get("fn")
+        if "registrant" in roles:
+            result["owner_name"] = card.get("fn")
+            result["owner_org"] = card.get("org")
+            result["owner_email"] = card.get("email")
+            result["owner_phone"] = card.get("tel")
+    result["meta_data"] = json.dumps(data, ensure_ascii=False, indent=2)
+    return result
+
+
+async def query_whois(host: str, port: int, query: str) -> str:
+    """向 WHOIS 服务器发送一次查询，读取到连接关闭为止，超时由调用方控制"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"{query}\r\n".encode())
+        await writer.drain()
+        chunks = []
+        size = 0
+        while size < MAX_WHOIS_RESPONSE:
+            chunk = await reader.read(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+    finally:
+        writer.close()
+    return b"".join(chunks).decode("utf-8", errors="replace")
+
+
+class Bootstrap:
+    """
+    顶级域名 -> RDAP 服务 / WHOIS 服务器 对照表
+
+    RDAP 对照表整份从 IANA 下载，WHOIS 服务器按需向 IANA 查询，都保存在本地文件中，过期后重新获取。
+    """
+
+    def __init__(self, path: Path, rdap_url: str, iana_whois: str, port: int = 43, ttl: float = 7 * 86400):
+        self.path = path
+        self.rdap_url = rdap_url
+        self.iana_whois = iana_whois
+        self.port = port
+        self.ttl = ttl
+        self._rdap: Dict[str, str] = {}
+        self._rdap_updated = 0.0
+        # 顶级域名 -> (WHOIS 服务器, 查询时间)，服务器为空表示该顶级域名没有 WHOIS 服务
+        self._whois: Dict[str, Tuple[str, float]] = {}
+        self._rdap_lock = asyncio.Lock()
+        self._whois_inflight: Dict[str, asyncio.Task] = {}
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self._rdap = data.get("rdap", {})
+            self._rdap_updated = data.get("rdap_updated", 0.0)
+            self._whois = {tld: tuple(item) for tld, item in data.get("whois", {}).items()}
+        except Exception as e:
+            logger.warning(f"读取whois对照表失败: {e}")
+
+    def _save(self):
+        tmp_file = self.path.with_suffix(".tmp")
+        try:
+            tmp_file.write_text(json.dumps({
+                "rdap_updated": self._rdap_updated,
+                "rdap": self._rdap,
+                "whois": self._whois,
+            }), encoding="utf-8")
+            os.replace(tmp_file, self.path)
+        except Exception as e:
+            logger.warning(f"保存whois对照表失败: {e}")
+
+    async def rdap_base(self, client: httpx.AsyncClient, tld: str) -> Optional[str]:
+        """顶级域名的 RDAP 服务地址，以 / 结尾"""
+        if time.time() - self._rdap_updated > self.ttl:
+            async with self._rdap_lock:
+                # 等待锁期间可能已经由其他查询更新
+                if time.time() - self._rdap_updated > self.ttl:
+                    await self._refresh_rdap(client)
+        return self._rdap.get(tld)
+
+    async def _refresh_rdap(self, client: httpx.AsyncClient):
+        try:
+            response = await client.get(self.rdap_url)
+            response.raise_for_status()
+            services = response.json().get("services", [])
+        except Exception as e:
+            # 获取失败时沿用旧表，稍后再试
+            logger.warning(f"获取RDAP对照表失败: {e!r}")
+            self._rdap_updated = time.time() - self.ttl + 600
+            return
+        table = {}
+        for tlds, urls in services:
+            # 优先使用 https 地址
+            urls = sorted(urls, key=lambda u: not u.startswith("https://"))
+            if not urls:
+                continue
+            base = urls[0] if urls[0].endswith("/") else urls[0] + "/"
+            for tld in tlds:
+                table[tld.lower()] = base
+        self._rdap = table
+        self._rdap_updated = time.time()
+        self._save()
+
+    async def whois_server(self, tld: str) -> Optional[str]:
+        """顶级域名的 WHOIS 服务器"""
+        item = self._whois.get(tld)
+        if item is not None and time.time() - item[1] <= self.ttl:
+            return item[0] or None
+        task = self._whois_inflight.get(tld)
+        if task is None:
+            # 同一个顶级域名只查询一次；查询在单独的任务中进行，发起的查询被取消时不影响其他等待者
+            task = self._whois_inflight[tld] = asyncio.create_task(self._refresh_whois(tld))
+        return await asyncio.shield(task)
+
+    async def _refresh_whois(self, tld: str) -> Optional[str]:
+        item = self._whois.get(tld)
+        try:
+            text = await asyncio.wait_for(query_whois(self.iana_whois, self.port, tld), timeout=10)
+            match = re.search(r"^(?:whois|refer):\s*(\S+)", text, re.M | re.I)
+            server = match.group(1) if match else ""
+            self._whois[tld] = (server, time.time())
+            self._save()
+        except Exception as e:
+            logger.debug(f"查询 {tld} 的WHOIS服务器失败: {e!r}")
+            # 查询失败时沿用旧记录
+            server = item[0] if item is not None else None
+        finally:
+            self._whois_inflight.pop(tld, None)
+        return server or None
+
+
+class RateLimiter:
+    """限制每秒调用次数"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+        # 排队时被取消的名额，结束时间 -> 开始时间，只能从队尾归还
+        self._cancelled: Dict[float, float] = {}
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            wait = start - now
+            self._next = start + self.interval
+            if self._cancelled:
+                # 已经过去的名额无法归还
+                self._cancelled = {end: s for end, s in self._cancelled.items() if end > now}
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # 排队时被取消（如并行查询中其他后端先返回），请求没有发出，归还名额
+                self._release(start, start + self.interval)
+                raise
+
+    def _release(self, start: float, end: float):
+        self._cancelled[end] = start
+        # 队尾连续被取消的名额都可以重新使用，中间的名额归还会使后面的请求间隔过短
+        while self._next in self._cancelled:
+            self._next = self._cancelled.pop(self._next)
+
+    def delay(self) -> float:
+        """现在请求需要排队的秒数"""
+        return max(0.0, self._next - time.monotonic())
+
+
+class Backend:
+    """查询后端基类"""
+
+    name = ""
+
+    def __init__(self, timeout: float = 10, rate: float = 0):
+        """
+        Args:
+            timeout: 单次查询的超时时间
+            rate: 每秒最多请求数，0表示不限制
+        """
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+
+    async def lookup(self, client: httpx.AsyncClient, domain: str) -> Optional[dict]:
+        """查询域名，没有结果时返回 None，请求出错时抛出异常"""
+        raise NotImplementedError
+
+
+class FourCnBackend(Backend):
+    """whois.4.cn 公开接口"""
+
+    name = "4.cn"
+
+    def __init__(self, url: str = "http://whois.4.cn/api/main", timeout: float = 10, rate: float = 0):
+        super().__init__(timeout, rate)
+        self.url = url
+
+    async def lookup(self, client: httpx.AsyncClient, domain: str) -> Optional[dict]:
+        response = await client.get(self.url, params={"domain": domain})
+        response.raise_for_status()
+        data = response.json()
+        if data.get("retcode") != 0 or not data.get("data"):
+            return None
+        return data["data"]
+
+
+class RdapBackend(Backend):
+    """RDAP 协议查询"""
+
+    name = "rdap"
+
+    def __init__(self, bootstrap: Bootstrap, timeout: float = 10, rate: float = 0):
+        super().__init__(timeout, rate)
+        self.bootstrap = bootstrap
+
+    async def lookup(self, client: httpx.AsyncClient, domain: str) -> Optional[dict]:
+        base = await self.bootstrap.rdap_base(client, domain.rsplit(".", 1)[-1])
+        if base is None:
+            return None
+        response = await client.get(f"{base}domain/{domain}", headers={"Accept": "application/rdap+json"},
+                                    follow_redirects=True)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return parse_rdap(response.json())
+
+
+class WhoisBackend(Backend):
+    """WHOIS 协议查询"""
+
+    name = "whois"
+
+    def __init__(self, bootstrap: Bootstrap, timeout: float = 10, rate: float = 0):
+        super().__init__(timeout, rate)
+        self.bootstrap = bootstrap
+
+    async def lookup(self, client: httpx.AsyncClient, domain: str) -> Optional[dict]:
+        server = await self.bootstrap.whois_server(domain.rsplit(".", 1)[-1])
+        if server is None:
+            return None
+        text = await query_whois(server, self.bootstrap.port, domain)
+        result, referral = parse_whois_text(text)
+        if referral and referral.lower() != server.lower():
+            # 薄注册局只有基本信息，持有人等信息在注册商的 WHOIS 服务器上
+            try:
+                detail, _ = parse_whois_text(await query_whois(referral, self.bootstrap.port, domain))
+            except Exception as e:
+                logger.debug(f"查询注册商WHOIS服务器 {referral} 失败: {e!r}")
+                detail = None
+            if detail is not None:
+                if result is not None:
+                    detail = {**result, **{k: v for k, v in detail.items() if v}}
+                result = detail
+        return result
+
+
+BACKEND_TYPES = {cls.name: cls for cls in (FourCnBackend, RdapBackend, WhoisBackend)}
+
+
+class CircuitBreaker:
+    """连续失败 threshold 次后熔断 cooldown 秒，期间不再使用该后端"""
+
+    def __init__(self, threshold: int = 3, cooldown: float = 300):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        # 冷却结束后放行一次试探请求
+        return time.monotonic() - self.opened_at >= self.cooldown
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class Resolver:
+    """多后端查询"""
+
+    def __init__(self, backends: List[Backend], hedge_delay: float = 1.5,
+                 breaker_threshold: int = 3, breaker_cooldown: float = 300):
+        self.backends = backends
+        self.hedge_delay = hedge_delay
+        self._breakers = {b.name: CircuitBreaker(breaker_threshold, breaker_cooldown) for b in backends}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # 所有后端共用一个连接池
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=max(b.timeout for b in self.backends))
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _query(self, backend: Backend, domain: str) -> Optional[dict]:
+        breaker = self._breakers[backend.name]
+        # 排队时间不计入超时
+        await backend.limiter.acquire()
+        try:
+            result = await asyncio.wait_for(backend.lookup(self.client, domain), timeout=backend.timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            logger.debug(f"whois后端 {backend.name} 查询 {domain} 失败({breaker.failures}次): {e!r}")
+            return None
+        # 没有结果也说明后端可用
+        breaker.record_success()
+        if result is not None:
+            result["source"] = backend.name
+        return result
+
+    async def lookup(self, domain: str) -> Optional[dict]:
+        """查询域名，所有后端都没有结果时返回 None"""
+        remaining = [b for b in self.backends if self._breakers[b.name].allow()] or list(self.backends)
+        pending: Dict[asyncio.Task, Backend] = {}
+
+        def start_next() -> bool:
+            if not remaining:
+                return False
+            # 按优先级选择排队不超过 hedge_delay 的后端，都在排队时选择等待最短的
+            backend = next((b for b in remaining if b.limiter.delay() <= self.hedge_delay), None)
+            if backend is None:
+                backend = min(remaining, key=lambda b: b.limiter.delay())
+            remaining.remove(backend)
+            pending[asyncio.create_task(self._query(backend, domain))] = backend
+            return True
+
+        start_next()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_delay,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 当前后端较慢，同时启动下一个
+                    start_next()
+                    continue
+                for task in done:
+                    pending.pop(task)
+                    result = None if task.cancelled() else task.result()
+                    if result is not None:
+                        return result
+                    start_next()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def status(self) -> Dict[str, str]:
+        """各后端的状态说明"""
+        result = {}
+        for backend in self.backends:
+            breaker = self._breakers[backend.name]
+            if breaker.opened_at is not None and not breaker.allow():
+                result[backend.name] = "熔断中"
+            elif breaker.failures:
+                result[backend.name] = f"连续失败{breaker.failures}次"
+            else:
+                result[backend.name] = "正常"
+        return result
+
+
+def build_resolver(config: dict, bootstrap_path: Path) -> Resolver:
+    """根据配置创建查询后端"""
+    timeout = config.get("TIMEOUT", 10)
+    rates = config.get("RATE_LIMIT", {})
+    bootstrap = Bootstrap(
+        bootstrap_path,
+        config.get("RDAP_BOOTSTRAP_URL", "https://data.iana.org/rdap/dns.json"),
+        config.get("IANA_WHOIS", "whois.iana.org"),
+        port=config.get("WHOIS_PORT", 43),
+    )
+    backends: List[Backend] = []
+    for name in config.get("BACKENDS", ["4.cn"]):
+        cls = BACKEND_TYPES.get(name)
+        if cls is None:
+            logger.warning(f"未知的whois查询后端: {name}")
+        elif cls is FourCnBackend:
+            backends.append(cls(config.get("API_URL", "http://whois.4.cn/api/main"), timeout=timeout,
+                                rate=rates.get(name, 0)))
+        else:
+            backends.append(cls(bootstrap, timeout=timeout, rate=rates.get(name, 0)))
+    if not backends:
+        backends.append(FourCnBackend(timeout=timeout))
+    return Resolver(backends, hedge_delay=config.get("HEDGE_DELAY", 1.5))
@@ -1,6 +1,7 @@
 import os
 from nonebot.adapters.onebot.v11 import Event, GroupMessageEvent
 from pathlib import Path
+from typing import Set
 
 # 存储启用群号的文件路径
 ABLED_GROUPS_FILE = Path(__file__).parent / "abled_groups.txt"
@@ -10,11 +11,11 @@ if not ABLED_GROUPS_FILE.exists():
     with open(ABLED_GROUPS_FILE, "w") as f:
         pass
 
-def get_abled_groups() -> set:
-    """获取启用Whois的群组ID列表"""
+def _load_abled_groups() -> Set[int]:
+    """从文件读取启用Whois的群组ID，只在启动时调用一次"""
     if not ABLED_GROUPS_FILE.exists():
         return set()
-        
+
     with open(ABLED_GROUPS_FILE, "r") as f:
         groups = set()
         for line in f.readlines():
@@ -23,36 +24,50 @@ def get_abled_groups() -> set:
                 groups.add(int(line))
         return groups
 
+# 启用Whois的群组ID，每条群消息都会检查，只在内存中查询
+_abled_groups: Set[int] = _load_abled_groups()
+
+def _save_abled_groups():
+    """先写入临时文件再替换，写入中断时原文件保持完整"""
+    tmp_file = ABLED_GROUPS_FILE.with_suffix(".tmp")
+    with open(tmp_file, "w") as f:
+        for gid in sorted(_abled_groups):
+            f.write(f"{gid}\n")
+    os.replace(tmp_file, ABLED_GROUPS_FILE)
+
+def get_abled_groups() -> set:
+    """获取启用Whois的群组ID列表"""
+    return set(_abled_groups)
+
 def add_abled_group(group_id: int) -> bool:
     """添加一个群到启用列表"""
-    abled_groups = get_abled_groups()
-    
     # 如果已经在列表中，不需要添加
-    if group_id in abled_groups:
+    if group_id in _abled_groups:
         return False
-    
-    abled_groups.add(group_id)
-    
-    with open(ABLED_GROUPS_FILE, "w") as f:
-        for gid in abled_groups:
-            f.write(f"{gid}\n")
-    
+
+    _abled_groups.add(group_id)
+    try:
+        _save_abled_groups()
+    except Exception:
+        # 保存失败时撤销，内存与文件保持一致
+        _abled_groups.discard(group_id)
+        raise
+
     return True
 
 def remove_abled_group(group_id: int) -> bool:
     """从启用列表中移除一个群"""
-    abled_groups = get_abled_groups()
-    
     # 如果不在列表中，不需要移除
-    if group_id not in abled_groups:
+    if group_id not in _abled_groups:
         return False
-    
-    abled_groups.remove(group_id)
-    
-    with open(ABLED_GROUPS_FILE, "w") as f:
-        for gid in abled_groups:
-            f.write(f"{gid}\n")
-    
+
+    _abled_groups.remove(group_id)
+    try:
+        _save_abled_groups()
+    except Exception:
+        _abled_groups.add(group_id)
+        raise
+
     return True
 
 async def is_group_allowed(event: Event) -> bool:
@@ -60,10 +75,6 @@ async def is_group_allowed(event: Event) -> bool:
     # 私聊消息总是允许
     if not isinstance(event, GroupMessageEvent):
         return True
-    
-    # 检查群号是否在启用列表中
-    group_id = event.group_id
-    abled_groups = get_abled_groups()
-    
-    # 返回True表示允许，False表示禁用
-    return group_id in abled_groups
+
+    # 检查群号是否在启用列表中，返回True表示允许，False表示禁用
+    return event.group_id in _abled_groups
@@ -0,0 +1,152 @@
+"""
+公共后缀识别
+
+启动时把 public_suffix_list.dat 编译成按标签倒序的字典树，之后：
+- registrable_domain: 由主机名得到可注册域名，如 www.example.com.cn -> example.com.cn
+- find_domains: 用一次正则扫描找出消息中所有候选主机名，逐个在字典树中匹配最长后缀
+
+规则格式与 publicsuffix.org 的列表相同，支持 * 通配和 ! 例外。
+不在列表中的顶级域名不视为域名，避免误触发。
+
+国际化域名（如 百度.com、例子.中国）的标签转为 punycode 后再在字典树中匹配，返回原来的写法。
+中文紧贴英文域名时（如 看example.com）优先识别英文域名。
+"""
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SUFFIX_LIST_FILE = Path(__file__).parent / "public_suffix_list.dat"
+
+# 候选主机名：至少两段，每段为字母、数字和连字符，前面不能紧跟 @（邮箱）或其他域名字符
+_HOST = re.compile(r"(?<![@\w.-])((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z][a-z0-9-]{0,62})(?![\w-])",
+                   re.I | re.A)
+# 含非 ASCII 字符的候选主机名，标签可以是任意文字
+_IDN_HOST = re.compile(r"(?<![@\w.-])((?:[\w-]++\.)+[\w-]++)(?![\w-])")
+
+
+@lru_cache(maxsize=4096)
+def _to_ascii(label: str) -> Optional[str]:
+    """标签转为 punycode，无法转换时返回 None"""
+    if label.isascii():
+        return label
+    try:
+        return label.encode("idna").decode("ascii")
+    except UnicodeError:
+        return None
+
+
+class _Node:
+    __slots__ = ('children', 'rule', 'exception')
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # 到此节点为止是一条规则
+        self.rule = False
+        # 到此节点为止是一条例外规则
+        self.exception = False
+
+
+class SuffixTrie:
+    """公共后缀字典树"""
+
+    def __init__(self, rules: List[str] = ()):
+        self.root = _Node()
+        self.size = 0
+        for rule in rules:
+            self.add(rule)
+
+    @classmethod
+    def load(cls, path: Path = SUFFIX_LIST_FILE) -> "SuffixTrie":
+        rules = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.split("//", 1)[0].strip()
+                if line:
+                    rules.append(line.split()[0])
+        return cls(rules)
+
+    def add(self, rule: str):
+        exception = rule.startswith("!")
+        node = self.root
+        for label in reversed(rule.lstrip("!").lower().split(".")):
+            node = node.children.setdefault(label.encode("idna").decode("ascii") if label != "*" else label, _Node())
+        if exception:
+            node.exception = True
+        else:
+            node.rule = True
+        self.size += 1
+
+    def suffix_length(self, labels: List[str]) -> int:
+        """
+        最长公共后缀占用的标签数量
+
+        参数：
+
+        labels: 小写的域名标签，如 ["www", "example", "com"]
+
+        返回值：
+
+        没有匹配的规则时返回 0
+        """
+        node = self.root
+        length = 0
+        for depth, label in enumerate(reversed(labels), 1):
+            child = node.children.get(label)
+            if child is not None and child.exception:
+                # 例外规则本身可以注册，后缀是它的上一级
+                return depth - 1
+            wildcard = node.children.get("*")
+            if child is None:
+                if wildcard is not None and wildcard.rule:
+                    length = depth
+                break
+            if child.rule or (wildcard is not None and wildcard.rule):
+                length = depth
+            node = child
+        return length
+
+    def registrable_domain(self, host: str) -> Optional[str]:
+        """主机名对应的可注册域名，后缀不在列表中或主机名本身就是公共后缀时返回 None"""
+        labels = host.strip().lower().rstrip(".").split(".")
+        if len(labels) < 2 or not all(labels):
+            return None
+        ascii_labels = [_to_ascii(label) for label in labels]
+        if None in ascii_labels:
+            return None
+        length = self.suffix_length(ascii_labels)
+        if not length or length >= len(labels):
+            return None
+        return ".".join(labels[-length - 1:])
+
+    def find_domains(self, text: str, limit: int = 0) -> List[str]:
+        """
+        找出文本中的所有可注册域名，按出现顺序去重
+
+        参数：
+
+        limit: 最多返回的数量，0 表示不限制
+        """
+        if "." not in text:
+            return []
+        matches = [(m.start(1), m.end(1), m.group(1)) for m in _HOST.finditer(text)]
+        if not text.isascii():
+            # 与英文域名重叠的候选（如 看example.com）不作为国际化域名
+            spans = [(start, end) for start, end, _ in matches]
+            idn = [(m.start(1), m.end(1), m.group(1)) for m in _IDN_HOST.finditer(text)
+                   if not m.group(1).isascii()
+                   and not any(start < m.end(1) and m.start(1) < end for start, end in spans)]
+            if idn:
+                matches = sorted(matches + idn)
+        found: Dict[str, None] = {}
+        for _, _, host in matches:
+            domain = self.registrable_domain(host)
+            if domain is not None and domain not in found:
+                found[domain] = None
+                if limit and len(found) >= limit:
+                    break
+        return list(found)
+
+
+# 启动时加载一次
+suffix_trie = SuffixTrie.load()
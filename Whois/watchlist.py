@@ -0,0 +1,374 @@
+"""
+域名到期监控
+
+每个群可以监控多个域名，同一个域名被多个群监控时只查询一次。
+每个域名保存一份快照（到期时间、状态、DNS、注册商），定时任务每次取出一批到期需要检查的域名，
+按到期时间从近到远查询，与快照比较后把变化合并成一条消息发送到监控的群。
+
+检查间隔随到期时间变化：
+- 过期超过 30 天: 7 天
+- 过期超过 1 天: 1 天
+- 过期 1 天内或 1 天内到期: 1 小时
+- 7 天内: 6 小时
+- 30 天内: 1 天
+- 90 天内: 3 天
+- 更远: 7 天
+查询失败时按失败次数退避，最长 1 天。
+"""
+import asyncio
+import datetime
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from nonebot.log import logger
+
+from .cache import parse_date
+
+# (剩余天数上限, 检查间隔秒数)，过期很久的域名很少再变化
+CHECK_INTERVALS = ((-30, 7 * 86400), (-1, 86400), (1, 3600), (7, 6 * 3600), (30, 86400), (90, 3 * 86400))
+MAX_INTERVAL = 7 * 86400
+UNKNOWN_INTERVAL = 86400
+# 到期提醒的剩余天数，0 表示已过期
+EXPIRY_THRESHOLDS = (30, 7, 1, 0)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS watch (
+    group_id INTEGER NOT NULL,
+    domain   TEXT NOT NULL,
+    added_by INTEGER,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (group_id, domain)
+);
+CREATE INDEX IF NOT EXISTS watch_domain ON watch (domain);
+CREATE TABLE IF NOT EXISTS snapshot (
+    domain      TEXT PRIMARY KEY,
+    expire_ts   REAL,
+    expire_date TEXT,
+    status      TEXT NOT NULL DEFAULT '[]',
+    nameserver  TEXT NOT NULL DEFAULT '[]',
+    registrar   TEXT,
+    checked_at  REAL,
+    next_check  REAL NOT NULL,
+    failures    INTEGER NOT NULL DEFAULT 0,
+    alerted     INTEGER
+);
+CREATE INDEX IF NOT EXISTS snapshot_due ON snapshot (next_check);
+'''
+
+
+def check_interval(expire_ts: Optional[float], now: float) -> float:
+    """根据剩余时间决定下次检查的间隔"""
+    if expire_ts is None:
+        return UNKNOWN_INTERVAL
+    days = (expire_ts - now) / 86400
+    for limit, interval in CHECK_INTERVALS:
+        if days <= limit:
+            return interval
+    # 不晚于进入 90 天提醒区间的时间
+    return min(MAX_INTERVAL, max(3 * 86400, (days - 90) * 86400))
+
+
+def expiry_threshold(expire_ts: Optional[float], now: float) -> Optional[int]:
+    """已经进入的最小提醒区间，还没有进入任何区间时返回 None"""
+    if expire_ts is None:
+        return None
+    days = (expire_ts - now) / 86400
+    crossed = None
+    for threshold in EXPIRY_THRESHOLDS:
+        if days <= threshold:
+            crossed = threshold
+    return crossed
+
+
+class Snapshot:
+    """单个域名的快照"""
+
+    __slots__ = ('domain', 'expire_ts', 'expire_date', 'status', 'nameserver', 'registrar',
+                 'checked_at', 'next_check', 'failures', 'alerted')
+
+    def __init__(self, domain: str, expire_ts: Optional[float] = None, expire_date: Optional[str] = None,
+                 status: Tuple[str, ...] = (), nameserver: Tuple[str, ...] = (), registrar: Optional[str] = None,
+                 checked_at: Optional[float] = None, next_check: float = 0.0, failures: int = 0,
+                 alerted: Optional[int] = None):
+        self.domain = domain
+        self.expire_ts = expire_ts
+        self.expire_date = expire_date
+        self.status = tuple(status)
+        self.nameserver = tuple(nameserver)
+        self.registrar = registrar
+        self.checked_at = checked_at
+        self.next_check = next_check
+        self.failures = failures
+        self.alerted = alerted
+
+    @classmethod
+    def from_row(cls, row) -> "Snapshot":
+        return cls(row[0], row[1], row[2], json.loads(row[3]), json.loads(row[4]), *row[5:])
+
+    @classmethod
+    def from_data(cls, domain: str, data: dict) -> "Snapshot":
+        expire = parse_date(data.get("expire_date"))
+        return cls(
+            domain,
+            expire_ts=expire.timestamp() if expire else None,
+            expire_date=data.get("expire_date"),
+            status=sorted({s for s in data.get("status") or [] if s}),
+            nameserver=sorted({ns.lower().rstrip(".") for ns in data.get("nameserver") or [] if ns}),
+            registrar=data.get("registrars"),
+        )
+
+    def days_left(self, now: Optional[float] = None) -> Optional[int]:
+        if self.expire_ts is None:
+            return None
+        return int((self.expire_ts - (now or time.time())) // 86400)
+
+
+class WatchStore:
+    """监控列表和快照，保存在 SQLite 中"""
+
+    def __init__(self, path: Path):
+        self._conn = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def add(self, gid: int, domains: List[str], user_id: Optional[int] = None) -> List[str]:
+        """添加监控，返回新添加的域名"""
+        now = time.time()
+        added = []
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for domain in domains:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO watch (group_id, domain, added_by, added_at) VALUES (?, ?, ?, ?)",
+                    (gid, domain, user_id, now))
+                if cursor.rowcount:
+                    added.append(domain)
+                # 新域名下一轮立即检查
+                self._conn.execute("INSERT OR IGNORE INTO snapshot (domain, next_check) VALUES (?, ?)", (domain, now))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def remove(self, gid: int, domains: List[str]) -> List[str]:
+        """取消监控，返回实际取消的域名，没有群监控的域名同时删除快照"""
+        removed = []
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for domain in domains:
+                if self._conn.execute("DELETE FROM watch WHERE group_id = ? AND domain = ?", (gid, domain)).rowcount:
+                    removed.append(domain)
+            self._conn.execute("DELETE FROM snapshot WHERE domain NOT IN (SELECT domain FROM watch)")
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def count(self, gid: Optional[int] = None) -> int:
+        if gid is None:
+            return self._conn.execute("SELECT COUNT(*) FROM snapshot").fetchone()[0]
+        return self._conn.execute("SELECT COUNT(*) FROM watch WHERE group_id = ?", (gid,)).fetchone()[0]
+
+    def snapshots_of(self, gid: int) -> List[Snapshot]:
+        """群监控的域名快照，按到期时间排序"""
+        rows = self._conn.execute(
+            "SELECT s.domain, s.expire_ts, s.expire_date, s.status, s.nameserver, s.registrar, s.checked_at, "
+            "s.next_check, s.failures, s.alerted FROM watch w JOIN snapshot s ON s.domain = w.domain "
+            "WHERE w.group_id = ? ORDER BY s.expire_ts IS NULL, s.expire_ts, s.domain", (gid,)).fetchall()
+        return [Snapshot.from_row(row) for row in rows]
+
+    def groups_of(self, domain: str) -> List[int]:
+        return [row[0] for row in self._conn.execute("SELECT group_id FROM watch WHERE domain = ?", (domain,))]
+
+    def due(self, now: float, limit: int) -> List[Snapshot]:
+        """到期需要检查的域名，新添加的优先，其余到期时间近的优先"""
+        rows = self._conn.execute(
+            "SELECT domain, expire_ts, expire_date, status, nameserver, registrar, checked_at, next_check, "
+            "failures, alerted FROM snapshot WHERE next_check <= ? "
+            "ORDER BY checked_at IS NOT NULL, expire_ts IS NULL, expire_ts, next_check LIMIT ?", (now, limit)).fetchall()
+        return [Snapshot.from_row(row) for row in rows]
+
+    def save(self, snapshots: List[Snapshot]):
+        """批量保存快照，已取消监控的域名不会重新写入"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "UPDATE snapshot SET expire_ts = ?, expire_date = ?, status = ?, nameserver = ?, registrar = ?, "
+                "checked_at = ?, next_check = ?, failures = ?, alerted = ? WHERE domain = ?",
+                [(s.expire_ts, s.expire_date, json.dumps(s.status), json.dumps(s.nameserver), s.registrar,
+                  s.checked_at, s.next_check, s.failures, s.alerted, s.domain) for s in snapshots])
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+
+def diff_snapshot(old: Snapshot, new: Snapshot, now: float) -> List[str]:
+    """
+    比较新旧快照，更新 new.alerted，返回需要提醒的变化
+
+    第一次检查只记录快照，不提醒
+    """
+    changes = []
+    first = old.checked_at is None
+    renewed = (old.expire_ts is not None and new.expire_ts is not None
+               and new.expire_ts - old.expire_ts > 86400)
+    # 续费后重新计算提醒区间
+    new.alerted = None if renewed else old.alerted
+    threshold = expiry_threshold(new.expire_ts, now)
+    if first or renewed:
+        new.alerted = threshold
+    elif threshold is not None and (new.alerted is None or threshold < new.alerted):
+        new.alerted = threshold
+        days = new.days_left(now)
+        if days < 0:
+            changes.append(f"⛔ 已过期（到期时间 {new.expire_date}）")
+        else:
+            changes.append(f"⚠️ 将在 {days} 天后到期（{new.expire_date}）")
+    if first:
+        return changes
+    if renewed:
+        changes.append(f"🔄 已续费: {old.expire_date} -> {new.expire_date}")
+    elif new.expire_ts is not None and old.expire_ts is not None and new.expire_ts < old.expire_ts - 86400:
+        changes.append(f"❗ 到期时间提前: {old.expire_date} -> {new.expire_date}")
+    if new.status != old.status:
+        added = [s for s in new.status if s not in old.status]
+        removed = [s for s in old.status if s not in new.status]
+        parts = ([f"+{s}" for s in added] + [f"-{s}" for s in removed])
+        changes.append("📊 状态变化: " + ", ".join(parts))
+    if new.nameserver != old.nameserver:
+        changes.append(f"🌐 DNS变化: {', '.join(old.nameserver) or '无'} -> {', '.join(new.nameserver) or '无'}")
+    if new.registrar and old.registrar and new.registrar != old.registrar:
+        changes.append(f"🏢 注册商变化: {old.registrar} -> {new.registrar}")
+    return changes
+
+
+class WatchEngine:
+    """定时检查监控的域名"""
+
+    def __init__(self, store: WatchStore, lookup: Callable[[str], Awaitable[Optional[dict]]],
+                 send: Callable[[int, str], Awaitable], batch: int = 100, concurrency: int = 10):
+        """
+        参数：
+
+        lookup: 查询函数，失败时返回 None
+
+        send: 发送函数，参数为 (群号, 消息)
+
+        batch: 每次检查的最多域名数量
+
+        concurrency: 同时进行的查询数量
+        """
+        self.store = store
+        self.lookup = lookup
+        self.send = send
+        self.batch = batch
+        self.concurrency = concurrency
+        self._lock = asyncio.Lock()
+        # 正在检查的域名，定时检查和新添加域名的检查不会同时查询同一个域名
+        self._checking: Set[str] = set()
+
+    async def _check(self, old: Snapshot, now: float) -> Tuple[Snapshot, List[str]]:
+        try:
+            data = await self.lookup(old.domain)
+        except Exception as e:
+            logger.debug(f"监控域名 {old.domain} 查询失败: {e!r}")
+            data = None
+        if not data:
+            # 保留旧快照，按失败次数退避
+            old.failures += 1
+            old.next_check = now + min(3600 * 2 ** (old.failures - 1), UNKNOWN_INTERVAL)
+            return old, []
+        new = Snapshot.from_data(old.domain, data)
+        changes = diff_snapshot(old, new, now)
+        new.checked_at = now
+        new.next_check = now + check_interval(new.expire_ts, now)
+        return new, changes
+
+    async def _check_all(self, snapshots: List[Snapshot], now: float) -> List[Tuple[Snapshot, List[str]]]:
+        """并发检查并保存快照，跳过正在检查的域名"""
+        snapshots = [s for s in snapshots if s.domain not in self._checking]
+        if not snapshots:
+            return []
+        domains = {s.domain for s in snapshots}
+        self._checking |= domains
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(snapshot: Snapshot):
+            async with semaphore:
+                return await self._check(snapshot, now)
+
+        try:
+            results = await asyncio.gather(*(one(s) for s in snapshots))
+            self.store.save([snapshot for snapshot, _ in results])
+        finally:
+            self._checking -= domains
+        return results
+
+    async def check_now(self, snapshots: List[Snapshot], now: Optional[float] = None) -> List[Snapshot]:
+        """
+        立即检查新添加的域名，只记录初始快照，不发送提醒
+
+        已经检查过的域名（其他群也在监控）和定时检查正在查询的域名会被跳过，返回检查后的快照
+        """
+        pending = [s for s in snapshots if s.checked_at is None]
+        if not pending:
+            return []
+        results = await self._check_all(pending, now or time.time())
+        return [snapshot for snapshot, _ in results]
+
+    async def run_once(self, now: Optional[float] = None) -> int:
+        """检查一批到期的域名并发送提醒，返回检查的数量"""
+        if self._lock.locked():
+            # 上一批还没有完成
+            return 0
+        async with self._lock:
+            now = now or time.time()
+            due = self.store.due(now, self.batch)
+            if not due:
+                return 0
+            results = await self._check_all(due, now)
+
+            # 按群合并提醒
+            alerts: Dict[int, List[str]] = {}
+            for snapshot, changes in results:
+                if not changes:
+                    continue
+                text = f"【{snapshot.domain}】\n" + "\n".join(changes)
+                for gid in self.store.groups_of(snapshot.domain):
+                    alerts.setdefault(gid, []).append(text)
+            for gid, texts in alerts.items():
+                try:
+                    await self.send(gid, "🔔 域名监控提醒\n\n" + "\n\n".join(texts))
+                except Exception as e:
+                    logger.error(f"发送群 {gid} 域名监控提醒失败: {e}")
+            return len(results)
+
+
+def render_watchlist(snapshots: List[Snapshot], now: Optional[float] = None) -> str:
+    """群监控列表，按到期时间排序"""
+    now = now or time.time()
+    lines = [f"📋 本群监控的域名: {len(snapshots)} 个"]
+    for s in snapshots:
+        days = s.days_left(now)
+        if s.checked_at is None:
+            state = "等待检查"
+        elif days is None:
+            state = "到期时间未知"
+        elif days < 0:
+            state = f"⛔ 已过期 {-days} 天"
+        else:
+            state = f"{'⚠️ ' if days < EXPIRY_THRESHOLDS[0] else ''}剩余 {days} 天"
+        if s.failures:
+            state += f"，最近 {s.failures} 次查询失败"
+        next_check = datetime.datetime.fromtimestamp(s.next_check).strftime("%m-%d %H:%M")
+        lines.append(f"• {s.domain}  {state}  下次检查 {next_check}")
+    return "\n".join(lines)
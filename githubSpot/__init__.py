@@ -1,8 +1,9 @@
 from nonebot.rule import T_State
 from nonebot.log import logger
 from nonebot.adapters.onebot.v11 import Bot, GroupMessageEvent, MessageSegment
-from .data_source import get_github_reposity_information
+from .data_source import get_github_reposity_information, close_session
 from nonebot.plugin import on_regex, PluginMetadata
+from nonebot import get_driver
 
 import re
 
@@ -48,6 +49,11 @@ class GitHubUrlProxy:
 
 # 创建URL代理实例
 github_url_proxy = GitHubUrlProxy()
+
+@get_driver().on_shutdown
+async def close_github_session():
+    # 关闭共用的HTTP连接池
+    await close_session()
     
 @github.handle()
 async def github_handle(bot: Bot, event: GroupMessageEvent, state: T_State):
@@ -1,19 +1,126 @@
-
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
 
 import aiohttp
 
 
 headers = {"user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36"}
 
-async def get_github_reposity_information(url: str) -> str:
-    try:
-        UserName, RepoName = url.replace("https://github.com/", "").split("/")
-    except:
-        UserName, RepoName = url.replace("github.com/", "").split("/")
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"https://api.github.com/users/{UserName}", headers=headers, timeout=5) as response:
+# 头像地址很少变化，卡片地址由头像地址拼出，缓存时间可以长一些
+AVATAR_TTL = 24 * 3600
+CARD_TTL = 6 * 3600
+CACHE_SIZE = 1024
+# 同一时间最多的连接数
+MAX_CONNECTIONS = 20
+
+
+class TTLCache:
+    """带过期时间的LRU缓存"""
+
+    def __init__(self, ttl: float, size: int = CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: str):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.size:
+            self._data.popitem(last=False)
+
+
+avatar_cache = TTLCache(AVATAR_TTL)
+card_cache = TTLCache(CARD_TTL)
+# 正在进行的请求，同一个键的并发请求共用一个
+_inflight: Dict[str, asyncio.Task] = {}
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """长期使用的连接池，第一次使用时创建"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=5),
+            connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS, ttl_dns_cache=300),
+        )
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def _request_done(key: str, task: asyncio.Task):
+    _inflight.pop(key, None)
+    # 所有等待者都被取消时也取出异常，避免 "exception was never retrieved" 警告
+    if not task.cancelled():
+        task.exception()
+
+
+async def _single_flight(key: str, fetch: Callable[[], Awaitable[str]]) -> str:
+    """同一个键同时只请求一次，其他请求等待结果；某个等待者被取消不影响其他等待者"""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch())
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _request_done(key, t))
+    return await asyncio.shield(task)
+
+
+def parse_repository(url: str) -> Tuple[str, str]:
+    """从链接中取出 (用户名, 仓库名)"""
+    path = url.split("github.com/", 1)[-1]
+    UserName, RepoName = path.strip("/").split("/")[:2]
+    if RepoName.endswith(".git"):
+        RepoName = RepoName[:-4]
+    return UserName, RepoName
+
+
+async def get_avatar_url(UserName: str) -> str:
+    key = UserName.lower()
+    AvatarUrl = avatar_cache.get(key)
+    if AvatarUrl is not None:
+        return AvatarUrl
+
+    async def fetch() -> str:
+        async with get_session().get(f"https://api.github.com/users/{UserName}") as response:
+            response.raise_for_status()
             RawData = await response.json()
-            AvatarUrl = RawData["avatar_url"]
-            ImageUrl = f"https://socialify.git.ci/{UserName}/{RepoName}/png?description=1&font=Rokkitt&forks=1&issues=1&language=1&name=1&owner=1&pattern=Circuit%20Board&pulls=1&stargazers=1&theme=Light&logo={AvatarUrl}"
+        avatar_cache.put(key, RawData["avatar_url"])
+        return RawData["avatar_url"]
+
+    return await _single_flight(f"user:{key}", fetch)
+
+
+async def get_github_reposity_information(url: str) -> str:
+    UserName, RepoName = parse_repository(url)
+    key = f"{UserName}/{RepoName}".lower()
+    ImageUrl = card_cache.get(key)
+    if ImageUrl is not None:
+        return ImageUrl
+
+    async def fetch() -> str:
+        AvatarUrl = await get_avatar_url(UserName)
+        ImageUrl = f"https://socialify.git.ci/{UserName}/{RepoName}/png?description=1&font=Rokkitt&forks=1&issues=1&language=1&name=1&owner=1&pattern=Circuit%20Board&pulls=1&stargazers=1&theme=Light&logo={AvatarUrl}"
+        card_cache.put(key, ImageUrl)
+        return ImageUrl
 
-            return ImageUrl
\ No newline at end of file
+    return await _single_flight(f"repo:{key}", fetch)
@@ -7,9 +7,9 @@
 5. 设置群头衔功能
 '''
 from .function.groupOperation import *
-from nonebot import on_command, on_request, on_fullmatch, on_regex, on_notice, logger, get_driver
+from nonebot import on_command, on_request, on_fullmatch, on_regex, on_notice, logger, get_driver, require, get_plugin_config
 from nonebot.adapters.onebot.v11 import Bot, GroupMessageEvent, GroupRequestEvent, FriendRequestEvent, MessageEvent, Message, MessageSegment
-from nonebot.adapters.onebot.v11 import GroupIncreaseNoticeEvent, GroupDecreaseNoticeEvent, GroupBanNoticeEvent
+from nonebot.adapters.onebot.v11 import GroupIncreaseNoticeEvent, GroupDecreaseNoticeEvent, GroupBanNoticeEvent, GroupAdminNoticeEvent
 from nonebot.adapters.onebot.v11.permission import GROUP_ADMIN, GROUP_OWNER
 from nonebot.adapters.onebot.v11.event import Reply
 from nonebot.adapters.onebot.v11.message import MessageSegment as MS
@@ -18,15 +18,25 @@ from nonebot.permission import SUPERUSER
 from nonebot.typing import T_State
 from nonebot.plugin import PluginMetadata
 import re
+import nonebot
 from nonebot.params import CommandArg
 from nonebot.rule import to_me
 import logging
 from typing import Dict, Optional, List, Tuple
 import time
-import json
 import os
 import pathlib
 from .rule import *
+from .store import RequestStore
+from .config import Config
+from .function.inviteGraph import invite_graph
+from .function.kickExecutor import kick_executor
+from .function.roleCache import role_cache
+from .function.requestIndex import ListQuery, request_type, SORTS, TYPE_ADD, TYPE_INVITE, TYPE_FRIEND
+from .function.auditRouter import AuditRouter, AuditQueue, RECEIVED, APPROVED, REJECTED, AUTO_APPROVED, AUTO_REJECTED, EXPIRED
+from .function.bulkReview import BulkFilter, BulkReport, bulk_reviewer
+from .function.autoReview import auto_reviewer, APPROVE, REJECT
+from .function.noticeDigest import NoticeDigest, JOIN_APPROVE, JOIN_INVITE, LEAVE, KICK
 
 __plugin_meta__ = PluginMetadata(
     name="群组与好友管理",
@@ -56,101 +66,240 @@ __plugin_meta__ = PluginMetadata(
 
 # 数据文件路径
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
-REQUESTS_FILE = os.path.join(DATA_DIR, "pending_requests.json")
-FRIEND_REQUESTS_FILE = os.path.join(DATA_DIR, "pending_friend_requests.json")
-MESSAGE_MAP_FILE = os.path.join(DATA_DIR, "message_to_flag.json")
-FLAG_TYPE_FILE = os.path.join(DATA_DIR, "flag_type.json")
+DB_FILE = os.path.join(DATA_DIR, "requests.db")
 
 # 确保数据目录存在
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
+# 以下字典是数据库的内存视图，只能通过 add_request / remove_request 修改
 # 存储待审核的入群请求
 # 格式: {flag: {'user_id': user_id, 'group_id': group_id, 'comment': comment, 'time': timestamp, 'message_id': message_id}}
 pending_requests: Dict[str, Dict] = {}
 # 存储待审核的好友请求
 # 格式: {flag: {'user_id': user_id, 'comment': comment, 'time': timestamp, 'message_id': message_id, 'type': 'friend'}}
 pending_friend_requests: Dict[str, Dict] = {}
-# 消息ID到flag的映射，用于快速查找回复的消息对应的请求
-message_to_flag: Dict[int, str] = {}
 # 消息类型映射，用于区分不同类型的请求 (group 或 friend)
 flag_type: Dict[str, str] = {}
 
+# 获取配置
+config = get_plugin_config(Config)
+DEFAULT_AUDIT_GROUP_ID = 629590326  # 默认审核群
+
 # 配置审核群组ID，管理员在这个群中进行审核
-AUDIT_GROUP_ID = 629590326  # 请替换为实际的审核群组ID
+AUDIT_GROUP_ID = int(config.GROUPM_CONFIG.get("AUDIT_GROUP_ID") or DEFAULT_AUDIT_GROUP_ID)
+# 按来源群选择审核群和审核员，每个审核群有自己的待审核队列、消息映射和统计
+audit_router = AuditRouter(
+    AUDIT_GROUP_ID,
+    config.GROUPM_CONFIG.get("FRIEND_AUDIT_GROUP_ID"),
+    config.GROUPM_CONFIG.get("ROUTES", {}),
+)
+
+# 待审核请求的保留时间（秒），超过后视为已在QQ侧过期或已在别处处理，由定时任务清理
+REQUEST_TTL = {
+    TYPE_ADD: 7 * 24 * 3600,
+    TYPE_INVITE: 7 * 24 * 3600,
+    TYPE_FRIEND: 7 * 24 * 3600,
+}
+
+store = RequestStore(DB_FILE)
+# 每个会话当前的列表查询条件和翻页位置
+list_sessions: Dict[str, ListQuery] = {}
 
 # 加载持久化数据
 def load_data():
-    global pending_requests, pending_friend_requests, message_to_flag, flag_type
+    global pending_requests, pending_friend_requests, flag_type
     
     try:
-        if os.path.exists(REQUESTS_FILE):
-            with open(REQUESTS_FILE, "r", encoding="utf-8") as f:
-                pending_requests = json.load(f)
-                # 将字符串键的消息ID转换回整数
-                for flag, data in pending_requests.items():
-                    if "message_id" in data:
-                        data["message_id"] = int(data["message_id"])
+        # 旧版本的JSON文件只在第一次启动时导入
+        store.migrate_json(DATA_DIR)
+        pending_requests, pending_friend_requests, message_map, flag_type = store.load()
+        # 按审核群分配到各自的队列
+        items: Dict[int, list] = {}
+        for requests in (pending_requests, pending_friend_requests):
+            for flag, info in requests.items():
+                queue = audit_router.queue_for(info)
+                items.setdefault(queue.audit_group, []).append((flag, info, request_type(info, flag_type.get(flag))))
+        for audit_group, queue_items in items.items():
+            audit_router.queue(audit_group).index.rebuild(queue_items)
+        for message_id, flag in message_map.items():
+            info = get_request(flag)
+            if info is not None:
+                audit_router.queue_for(info).messages[message_id] = flag
     except Exception as e:
-        logger.error(f"加载入群请求数据失败: {e}")
-        pending_requests = {}
+        logger.error(f"加载审核请求数据失败: {e}")
+
+def get_request(flag: str) -> Optional[Dict]:
+    """获取待审核请求的信息，不存在时返回 None"""
+    return pending_requests.get(flag) or pending_friend_requests.get(flag)
+
+def add_request(flag: str, info: Dict, type_: str):
+    """
+    记录新的待审核请求
     
-    try:
-        if os.path.exists(FRIEND_REQUESTS_FILE):
-            with open(FRIEND_REQUESTS_FILE, "r", encoding="utf-8") as f:
-                pending_friend_requests = json.load(f)
-                # 将字符串键的消息ID转换回整数
-                for flag, data in pending_friend_requests.items():
-                    if "message_id" in data:
-                        data["message_id"] = int(data["message_id"])
-    except Exception as e:
-        logger.error(f"加载好友请求数据失败: {e}")
-        pending_friend_requests = {}
+    :参数: flag: 请求标识
+    :参数: info: 请求信息，audit_group 为审核消息所在的群
+    :参数: type_: 请求类型 group_add / group_invite / friend
+    """
+    # 先写数据库，写入失败时内存中的数据保持不变
+    store.add(flag, 'friend' if type_ == 'friend' else 'group', info, type_)
+    if type_ == 'friend':
+        pending_friend_requests[flag] = info
+    else:
+        pending_requests[flag] = info
+    flag_type[flag] = type_
+    queue = audit_router.queue_for(info)
+    queue.add(flag, info, type_)
+    queue.record(RECEIVED)
+
+def _forget_request(flag: str, stat: Optional[str]):
+    info = pending_requests.pop(flag, None) or pending_friend_requests.pop(flag, None)
+    flag_type.pop(flag, None)
+    if info is not None:
+        queue = audit_router.queue_for(info)
+        queue.remove(flag, info)
+        if stat:
+            queue.record(stat, info)
+
+def remove_request(flag: str, stat: Optional[str] = None):
+    """
+    移除已处理的请求及其消息映射、请求类型
     
-    try:
-        if os.path.exists(MESSAGE_MAP_FILE):
-            with open(MESSAGE_MAP_FILE, "r", encoding="utf-8") as f:
-                # 将所有的字符串键转换为整数
-                message_to_flag = {int(k): v for k, v in json.load(f).items()}
-    except Exception as e:
-        logger.error(f"加载消息映射数据失败: {e}")
-        message_to_flag = {}
+    :参数: flag: 请求标识
+    :参数: stat: 计入所在审核群的统计项，如 同意、拒绝
+    """
+    store.remove(flag)
+    _forget_request(flag, stat)
+
+def remove_requests(flags: List[str], stat: Optional[str] = None):
+    """
+    批量移除已处理的请求，数据库中只提交一次
     
-    try:
-        if os.path.exists(FLAG_TYPE_FILE):
-            with open(FLAG_TYPE_FILE, "r", encoding="utf-8") as f:
-                flag_type = json.load(f)
-    except Exception as e:
-        logger.error(f"加载请求类型数据失败: {e}")
-        flag_type = {}
+    :参数: flags: 请求标识列表
+    :参数: stat: 计入所在审核群的统计项
+    """
+    if not flags:
+        return
+    store.remove_many(flags)
+    for flag in flags:
+        _forget_request(flag, stat)
 
-# 保存持久化数据
-def save_data():
-    try:
-        with open(REQUESTS_FILE, "w", encoding="utf-8") as f:
-            json.dump(pending_requests, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        logger.error(f"保存入群请求数据失败: {e}")
+def queue_of_chat(event: MessageEvent) -> AuditQueue:
+    """命令所在审核群的队列，不在审核群中时使用默认审核群的队列"""
+    if isinstance(event, GroupMessageEvent) and audit_router.is_audit_group(event.group_id):
+        return audit_router.queue(event.group_id)
+    return audit_router.queue(AUDIT_GROUP_ID)
+
+def is_reviewer(user_id: int, info: Dict) -> bool:
+    """来源群没有配置审核员，或者用户是该群的审核员"""
+    reviewers = audit_router.reviewers(info.get('group_id'))
+    return not reviewers or user_id in reviewers
+
+async def can_review(bot: Bot, event: MessageEvent, info: Dict) -> bool:
+    """
+    是否可以处理该请求：来源群配置了审核员时只有审核员和超级管理员可以处理
+    """
+    return is_reviewer(event.user_id, info) or await SUPERUSER(bot, event)
+
+def parse_list_args(text: str, query: Optional[ListQuery]) -> Tuple[ListQuery, Optional[int], int]:
+    """
+    解析查看审核命令的参数
+
+    :参数: text: 命令参数，如「2」「下一页」「类型 好友」「群 123456」
+    :参数: query: 当前会话的查询条件，翻页时沿用
+    :结果: (查询条件, 页码, 翻页方向)
+    """
+    words = text.split()
+    if words and words[0] in ("下一页", "下页"):
+        return query or ListQuery(), None, 1 if query else 0
+    if words and words[0] in ("上一页", "上页"):
+        return query or ListQuery(), None, -1 if query else 0
+
+    new_query, page_no = ListQuery(), None
+    types = set()
+    for word in words:
+        if word in SORTS:
+            new_query.sort = word
+        elif word in ("按群", "群号"):
+            new_query.sort = "群"
+        elif word in ("入群", "申请"):
+            types.add(TYPE_ADD)
+        elif word == "邀请":
+            types.add(TYPE_INVITE)
+        elif word == "好友":
+            types.add(TYPE_FRIEND)
+        elif word.isdigit():
+            # 页码不会太大，五位以上的数字视为群号
+            if len(word) >= 5:
+                new_query.group_id = word
+            else:
+                page_no = int(word)
+    if types:
+        new_query.types = types
+    return new_query, page_no or 1, 0
+
+def page_footer(query: ListQuery, total: int, has_more: bool, cmd: str, cursor: bool = True) -> str:
+    """
+    列表末尾的页码和翻页提示
+
+    :参数: cursor: 命令是否支持「下一页」「上一页」，否则只提示页码
+    """
+    pages = max((total + query.size - 1) // query.size, 1)
+    footer = f"第 {query.page_no}/{pages} 页，共 {total} 条（{query.describe()}）"
+    if has_more or query.page_no > 1:
+        if cursor:
+            footer += f"\n发送「{cmd} 下一页」「{cmd} 上一页」或「{cmd} 页码」翻页"
+        else:
+            footer += f"\n发送「{cmd} 页码」翻页"
+    return footer
+
+def sweep_requests(now: Optional[float] = None) -> Tuple[int, int]:
+    """
+    清理过期请求和没有对应请求的消息映射、请求类型
     
-    try:
-        with open(FRIEND_REQUESTS_FILE, "w", encoding="utf-8") as f:
-            json.dump(pending_friend_requests, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        logger.error(f"保存好友请求数据失败: {e}")
+    :结果: (清理的请求数量, 清理的孤立记录数量)
+    """
+    now = now or time.time()
+    expired = []
+    for queue in audit_router.all_queues():
+        for type_, ttl in REQUEST_TTL.items():
+            expired.extend(queue.index.older_than(now - ttl, {type_}))
+    remove_requests(expired, EXPIRED)
+    
+    pending = lambda flag: flag in pending_requests or flag in pending_friend_requests
+    orphans = []
+    for queue in audit_router.all_queues():
+        stale = [message_id for message_id, flag in queue.messages.items() if not pending(flag)]
+        for message_id in stale:
+            queue.messages.pop(message_id)
+        orphans.extend(stale)
+    orphan_types = [flag for flag in flag_type if not pending(flag)]
+    for flag in orphan_types:
+        flag_type.pop(flag)
+    db_messages, db_types = store.prune_orphans()
     
+    orphan_count = max(len(orphans), db_messages) + max(len(orphan_types), db_types)
+    if expired or orphan_count:
+        logger.info(f"已清理 {len(expired)} 个过期请求、{orphan_count} 条孤立记录")
+    return len(expired), orphan_count
+
+scheduler = require("nonebot_plugin_apscheduler").scheduler
+
+@scheduler.scheduled_job("interval", hours=1)
+async def sweep_requests_job():
     try:
-        # 将整数键转换为字符串，以符合JSON规范
-        message_map_str_keys = {str(k): v for k, v in message_to_flag.items()}
-        with open(MESSAGE_MAP_FILE, "w", encoding="utf-8") as f:
-            json.dump(message_map_str_keys, f, ensure_ascii=False, indent=2)
+        sweep_requests()
     except Exception as e:
-        logger.error(f"保存消息映射数据失败: {e}")
-    
+        logger.error(f"清理过期审核请求失败: {e}")
+
+@scheduler.scheduled_job("cron", hour=4, minute=30)
+async def compact_store_job():
+    # 合并 WAL 日志，空闲页较多时整理数据库文件
     try:
-        with open(FLAG_TYPE_FILE, "w", encoding="utf-8") as f:
-            json.dump(flag_type, f, ensure_ascii=False, indent=2)
+        if store.compact():
+            logger.info("已整理审核请求数据库")
     except Exception as e:
-        logger.error(f"保存请求类型数据失败: {e}")
+        logger.error(f"整理审核请求数据库失败: {e}")
 
 # 在启动时加载数据
 driver = get_driver()
@@ -159,14 +308,38 @@ driver = get_driver()
 async def _():
     load_data()
     logger.info("已加载审核请求持久化数据")
+    await sweep_requests_job()
+    auto_reviewer.load()
+
+@driver.on_shutdown
+async def _():
+    # 发送还在合并窗口中的成员变动通知
+    await notice_digest.close()
+    # 邀请链日志合并为快照，下次启动无需重放
+    invite_graph.close()
+    store.close()
 
-def 判断是否入群() -> bool:
+async def 判断是否入群(bot: Bot, flag: str, gid: str, uid: int, word: str) -> bool:
     """
-    根据自定义的逻辑判断是否入群
+    根据 data/review_rules.json 中的规则自动审核入群申请，见 function/autoReview.py
     
-    :结果: 返回是否入群
+    :结果: 是否已经自动处理，False 表示需要转人工审核
     """
-    # 这个函数将不再使用，改为人工审核
+    decision = await auto_reviewer.review(bot, gid, uid, word)
+    if decision.action not in (APPROVE, REJECT):
+        logger.debug(f"入群申请转人工审核: 群 {gid}, 用户 {uid}, 原因: {decision.reason}")
+        return False
+    
+    approve = decision.action == APPROVE
+    try:
+        await bot.set_group_add_request(flag=flag, sub_type="add", approve=approve,
+                                        reason=' ' if approve else decision.reason)
+    except Exception as e:
+        logger.error(f"自动审核处理入群申请失败，转人工审核: {e}")
+        auto_reviewer.release(gid, decision)
+        return False
+    audit_router.queue(audit_router.route(gid).audit_group).record(AUTO_APPROVED if approve else AUTO_REJECTED)
+    logger.info(f"自动{'同意' if approve else '拒绝'}入群申请: 群 {gid}, 用户 {uid}, 原因: {decision.reason}")
     return True
 
 # 入群请求处理
@@ -185,6 +358,9 @@ async def gr_(bot: Bot, matcher: Matcher, event: GroupRequestEvent):
         logger.warning(f"收到未知类型的群组请求: {sub_type}, flag: {flag}")
         return
     
+    # 按来源群选择审核群
+    audit_group = audit_router.route(gid).audit_group
+    
     # 处理被邀请进群的情况
     if sub_type == 'invite':
         # 发送给审核群
@@ -198,24 +374,20 @@ async def gr_(bot: Bot, matcher: Matcher, event: GroupRequestEvent):
         
         try:
             # 尝试发送到审核群
-            msg_result = await bot.send_group_msg(group_id=AUDIT_GROUP_ID, message=audit_msg)
+            msg_result = await bot.send_group_msg(group_id=audit_group, message=audit_msg)
             # 存储消息ID和请求信息的映射关系
             message_id = msg_result['message_id']
             
-            # 存储请求信息
-            pending_requests[flag] = {
+            # 存储请求信息，同时建立消息ID到flag的映射并标记请求类型
+            add_request(flag, {
                 'user_id': uid,
                 'group_id': gid,
                 'comment': "机器人被邀请进群",
                 'time': int(time.time()),
                 'message_id': message_id,
-                'sub_type': 'invite'  # 标记为邀请类型
-            }
-            # 建立消息ID到flag的映射
-            message_to_flag[message_id] = flag
-            # 标记请求类型
-            flag_type[flag] = 'group_invite'
-            save_data()
+                'sub_type': 'invite',  # 标记为邀请类型
+                'audit_group': audit_group
+            }, 'group_invite')
             
         except Exception as e:
             # 发送失败，记录日志
@@ -229,6 +401,10 @@ async def gr_(bot: Bot, matcher: Matcher, event: GroupRequestEvent):
         word = re.findall(re.compile('答案：(.*)'), comment)
         word = word[0] if word else comment
         
+        # 明确的情况由自动审核直接处理，其余转人工审核
+        if await 判断是否入群(bot, flag, gid, uid, word):
+            return
+        
         # 发送给审核群
         audit_msg = (
             f"【收到新的入群申请】\n"
@@ -241,24 +417,20 @@ async def gr_(bot: Bot, matcher: Matcher, event: GroupRequestEvent):
         
         try:
             # 尝试发送到审核群
-            msg_result = await bot.send_group_msg(group_id=AUDIT_GROUP_ID, message=audit_msg)
+            msg_result = await bot.send_group_msg(group_id=audit_group, message=audit_msg)
             # 存储消息ID和请求信息的映射关系
             message_id = msg_result['message_id']
             
-            # 存储请求信息
-            pending_requests[flag] = {
+            # 存储请求信息，同时建立消息ID到flag的映射并标记请求类型
+            add_request(flag, {
                 'user_id': uid,
                 'group_id': gid,
                 'comment': word,
                 'time': int(time.time()),
                 'message_id': message_id,
-                'sub_type': 'add'  # 标记为普通入群申请
-            }
-            # 建立消息ID到flag的映射
-            message_to_flag[message_id] = flag
-            # 标记请求类型
-            flag_type[flag] = 'group_add'
-            save_data()
+                'sub_type': 'add',  # 标记为普通入群申请
+                'audit_group': audit_group
+            }, 'group_add')
             
         except Exception as e:
             # 发送失败，记录日志
@@ -271,7 +443,7 @@ reply_handler = on_fullmatch("同意",rule=check_if_group_is_admin,permission=SU
 @reply_handler.handle()
 async def handle_reply(bot: Bot, event: GroupMessageEvent, matcher: Matcher):
     # 只处理审核群中的消息
-    if event.group_id != AUDIT_GROUP_ID:
+    if not audit_router.is_audit_group(event.group_id):
         return
     
     # 检查是否为回复消息
@@ -282,8 +454,8 @@ async def handle_reply(bot: Bot, event: GroupMessageEvent, matcher: Matcher):
     # 获取被回复的消息ID
     source_message_id = reply.message_id
     
-    # 检查是否是对请求消息的回复
-    flag = message_to_flag.get(source_message_id)
+    # 检查是否是对本审核群中请求消息的回复
+    flag = audit_router.queue(event.group_id).messages.get(source_message_id)
     if not flag:
         return
     
@@ -306,6 +478,11 @@ async def handle_reply(bot: Bot, event: GroupMessageEvent, matcher: Matcher):
     else:
         return
     
+    # 来源群配置了审核员时只有审核员可以处理
+    if not await can_review(bot, event, request_info):
+        await matcher.send("你不是该群的审核员，不能处理这个请求")
+        return
+    
     if content.startswith("同意"):
         try:
             if request_type == 'group':
@@ -317,20 +494,13 @@ async def handle_reply(bot: Bot, event: GroupMessageEvent, matcher: Matcher):
                     # 同意普通入群申请
                     await bot.set_group_add_request(flag=flag, sub_type="add", approve=True, reason=' ')
                     await matcher.send(f"已同意用户 {request_info['user_id']} 加入群 {request_info['group_id']}")
-                # 移除已处理的请求
-                pending_requests.pop(flag)
             else:  # friend
                 # 同意好友申请
                 await bot.set_friend_add_request(flag=flag, approve=True)
                 await matcher.send(f"已同意用户 {request_info['user_id']} 的好友申请")
-                # 移除已处理的请求
-                pending_friend_requests.pop(flag)
             
-            # 移除消息映射
-            message_to_flag.pop(source_message_id)
-            if flag in flag_type:
-                flag_type.pop(flag)
-            save_data()
+            # 移除已处理的请求及消息映射
+            remove_request(flag, APPROVED)
                 
         except Exception as e:
             logger.error(f"处理请求失败: {e}")
@@ -348,20 +518,13 @@ async def handle_reply(bot: Bot, event: GroupMessageEvent, matcher: Matcher):
                     # 拒绝普通入群申请
                     await bot.set_group_add_request(flag=flag, sub_type="add", approve=False, reason=reason)
                     await matcher.send(f"已拒绝用户 {request_info['user_id']} 加入群 {request_info['group_id']}，理由: {reason}")
-                # 移除已处理的请求
-                pending_requests.pop(flag)
             else:  # friend
                 # 拒绝好友申请
                 await bot.set_friend_add_request(flag=flag, approve=False)
                 await matcher.send(f"已拒绝用户 {request_info['user_id']} 的好友申请，理由: {reason}")
-                # 移除已处理的请求
-                pending_friend_requests.pop(flag)
             
-            # 移除消息映射
-            message_to_flag.pop(source_message_id)
-            if flag in flag_type:
-                flag_type.pop(flag)
-            save_data()
+            # 移除已处理的请求及消息映射
+            remove_request(flag, REJECTED)
                 
         except Exception as e:
             logger.error(f"处理请求失败: {e}")
@@ -371,7 +534,7 @@ async def handle_reply(bot: Bot, event: GroupMessageEvent, matcher: Matcher):
 list_requests = on_command("查看入群审核", rule=check_if_group_is_admin,permission=SUPERUSER | GROUP_ADMIN | GROUP_OWNER, priority=2, block=True)
 
 @list_requests.handle()
-async def handle_list_requests(bot: Bot, event: MessageEvent, matcher: Matcher):
+async def handle_list_requests(bot: Bot, event: MessageEvent, matcher: Matcher, args: Message = CommandArg()):
     # 如果是群聊，检查是否在审核群
     # if isinstance(event, GroupMessageEvent) and event.group_id != AUDIT_GROUP_ID:
     #     await matcher.send("此命令只能在指定的审核群中使用")
@@ -380,19 +543,18 @@ async def handle_list_requests(bot: Bot, event: MessageEvent, matcher: Matcher):
     if not pending_requests:
         await matcher.finish("当前没有待处理的入群请求")
         
+    text = args.extract_plain_text().strip()
+    page_no = int(text) if text.isdigit() else 1
+    query = ListQuery(types={TYPE_ADD, TYPE_INVITE}, size=20)
+    index = queue_of_chat(event).index
+    entries, has_more = index.show(query, page_no=page_no)
+    if not entries:
+        await matcher.finish(f"第 {page_no} 页没有待处理的入群请求")
     
     msg = "待处理的入群请求列表：\n\n"
-    
-    for flag, request in pending_requests.items():
-        time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(request['time']))
-        msg += (
-            f"请求标识: {flag}\n"
-            f"申请人: {request['user_id']}\n"
-            f"目标群组: {request['group_id']}\n"
-            f"验证信息: {request['comment']}\n"
-            f"申请时间: {time_str}\n"
-            f"---------------------\n"
-        )
+    msg += "".join(f"{entry.line}---------------------\n" for entry in entries)
+    if has_more or page_no > 1:
+        msg += page_footer(query, index.count(query), has_more, "查看入群审核", cursor=False)
     
     await matcher.send(msg)
 
@@ -400,7 +562,7 @@ async def handle_list_requests(bot: Bot, event: MessageEvent, matcher: Matcher):
 list_friend_requests = on_command("查看好友审核", rule=check_if_group_is_admin, permission=SUPERUSER, priority=2, block=True)
 
 @list_friend_requests.handle()
-async def handle_list_friend_requests(bot: Bot, event: MessageEvent, matcher: Matcher):
+async def handle_list_friend_requests(bot: Bot, event: MessageEvent, matcher: Matcher, args: Message = CommandArg()):
     # 如果是群聊，检查是否在审核群
     # if isinstance(event, GroupMessageEvent) and event.group_id != AUDIT_GROUP_ID:
     #     await matcher.send("此命令只能在指定的审核群中使用")
@@ -410,17 +572,18 @@ async def handle_list_friend_requests(bot: Bot, event: MessageEvent, matcher: Ma
         await matcher.send("当前没有待处理的好友请求")
         return
     
-    msg = "待处理的好友请求列表：\n\n"
+    text = args.extract_plain_text().strip()
+    page_no = int(text) if text.isdigit() else 1
+    query = ListQuery(types={TYPE_FRIEND}, size=20)
+    index = queue_of_chat(event).index
+    entries, has_more = index.show(query, page_no=page_no)
+    if not entries:
+        await matcher.finish(f"第 {page_no} 页没有待处理的好友请求")
     
-    for flag, request in pending_friend_requests.items():
-        time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(request['time']))
-        msg += (
-            f"请求标识: {flag}\n"
-            f"申请人: {request['user_id']}\n"
-            f"验证信息: {request['comment']}\n"
-            f"申请时间: {time_str}\n"
-            f"---------------------\n"
-        )
+    msg = "待处理的好友请求列表：\n\n"
+    msg += "".join(f"{entry.line}---------------------\n" for entry in entries)
+    if has_more or page_no > 1:
+        msg += page_footer(query, index.count(query), has_more, "查看好友审核", cursor=False)
     
     await matcher.send(msg)
 
@@ -428,9 +591,13 @@ async def handle_list_friend_requests(bot: Bot, event: MessageEvent, matcher: Ma
 list_all_requests = on_command("查看所有审核", rule=check_if_group_is_admin, permission=SUPERUSER | GROUP_ADMIN | GROUP_OWNER, priority=2, block=True)
 
 @list_all_requests.handle()
-async def handle_list_all_requests(bot: Bot, event: MessageEvent, matcher: Matcher):
+async def handle_list_all_requests(bot: Bot, event: MessageEvent, matcher: Matcher, args: Message = CommandArg()):
+    '''
+    查看所有审核 [页码] [时间|类型|群] [入群|邀请|好友] [群号]
+    查看所有审核 下一页 / 上一页
+    '''
     # 如果是群聊，检查是否在审核群
-    if isinstance(event, GroupMessageEvent) and event.group_id != AUDIT_GROUP_ID:
+    if isinstance(event, GroupMessageEvent) and not audit_router.is_audit_group(event.group_id):
         await matcher.send("此命令只能在指定的审核群中使用")
         return
     
@@ -438,124 +605,48 @@ async def handle_list_all_requests(bot: Bot, event: MessageEvent, matcher: Match
         await matcher.send("当前没有任何待处理的请求")
         return
     
-    forward_msgs: List[dict] = []
-    bot_id = event.self_id  # 获取机器人QQ号
-    
-    # 添加标题消息
-    forward_msgs.append({
-        "type": "node",
-        "data": {
-            "name": "审核系统",
-            "uin": bot_id,
-            "content": "📋 待处理的审核请求列表"
-        }
-    })
-    
-    # 处理入群请求
-    if pending_requests:
-        # 添加入群请求标题
-        forward_msgs.append({
-            "type": "node",
-            "data": {
-                "name": "审核系统",
-                "uin": bot_id,
-                "content": "🔹 入群请求列表"
-            }
-        })
-        
-        # 为每个入群请求创建一条消息
-        for flag, request in pending_requests.items():
-            time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(request['time']))
-            sub_type = request.get('sub_type', 'add')  # 获取子类型，默认为add
-            
-            # 根据请求类型创建不同的消息
-            if sub_type == 'invite':
-                req_type_text = "【群聊邀请】"
-                info_text = f"邀请人: {request['user_id']}\n目标群组: {request['group_id']}"
-            else:  # 'add'
-                req_type_text = "【入群申请】"
-                info_text = f"申请人: {request['user_id']}\n目标群组: {request['group_id']}\n验证信息: {request['comment']}"
-            
-            msg_content = (
-                f"{req_type_text}\n"
-                f"{info_text}\n"
-                f"请求标识: {flag}\n"
-                f"申请时间: {time_str}\n\n"
-                f"回复「同意 {flag}」或「拒绝 {flag} 原因」处理"
-            )
-            
-            forward_msgs.append({
-                "type": "node",
-                "data": {
-                    "name": "入群申请",
-                    "uin": bot_id,
-                    "content": msg_content
-                }
-            })
-    
-    # 处理好友请求
-    if pending_friend_requests:
-        # 添加好友请求标题
-        forward_msgs.append({
-            "type": "node",
-            "data": {
-                "name": "审核系统",
-                "uin": bot_id,
-                "content": "🔸 好友请求列表"
-            }
-        })
-        
-        # 为每个好友请求创建一条消息
-        for flag, request in pending_friend_requests.items():
-            time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(request['time']))
-            msg_content = (
-                f"【好友申请】\n"
-                f"申请人: {request['user_id']}\n"
-                f"验证信息: {request['comment']}\n"
-                f"请求标识: {flag}\n"
-                f"申请时间: {time_str}\n\n"
-                f"回复「同意 {flag}」或「拒绝 {flag} 原因」处理"
-            )
-            
-            forward_msgs.append({
-                "type": "node",
-                "data": {
-                    "name": "好友申请",
-                    "uin": bot_id,
-                    "content": msg_content
-                }
-            })
-    
-    # 添加使用说明
-    forward_msgs.append({
-        "type": "node",
-        "data": {
-            "name": "审核系统",
-            "uin": bot_id,
-            "content": "✅ 使用说明：\n1. 回复消息「同意」或「拒绝 原因」\n2. 直接发送「/同意 请求标识」\n3. 直接发送「/拒绝 请求标识 原因」"
-        }
-    })
-    
-    # 发送合并转发消息
-    if isinstance(event, GroupMessageEvent):
-        # 群聊使用合并转发
-        await bot.send_group_forward_msg(group_id=event.group_id, messages=forward_msgs)
-    else:
-        # 私聊使用普通消息
+    if not isinstance(event, GroupMessageEvent):
+        # 私聊只显示数量
+        counts = {TYPE_ADD: 0, TYPE_INVITE: 0, TYPE_FRIEND: 0}
+        for queue in audit_router.all_queues():
+            for type_, count in queue.index.counts().items():
+                counts[type_] = counts.get(type_, 0) + count
         simple_msg = "当前待处理的请求如下，请在审核群中处理：\n\n"
-        
-        # 区分入群请求类型
-        add_requests = sum(1 for req in pending_requests.values() if req.get('sub_type', 'add') == 'add')
-        invite_requests = sum(1 for req in pending_requests.values() if req.get('sub_type') == 'invite')
-        
-        if add_requests > 0:
-            simple_msg += f"入群申请: {add_requests}个\n"
-        if invite_requests > 0:
-            simple_msg += f"群聊邀请: {invite_requests}个\n"
-        if pending_friend_requests:
-            simple_msg += f"好友申请: {len(pending_friend_requests)}个\n"
-            
+        if counts[TYPE_ADD]:
+            simple_msg += f"入群申请: {counts[TYPE_ADD]}个\n"
+        if counts[TYPE_INVITE]:
+            simple_msg += f"群聊邀请: {counts[TYPE_INVITE]}个\n"
+        if counts[TYPE_FRIEND]:
+            simple_msg += f"好友申请: {counts[TYPE_FRIEND]}个\n"
         await matcher.send(simple_msg)
+        return
+    
+    session_id = event.get_session_id()
+    query, page_no, step = parse_list_args(args.extract_plain_text(), list_sessions.get(session_id))
+    list_sessions[session_id] = query
+    # 只显示本审核群的请求
+    index = audit_router.queue(event.group_id).index
+    entries, has_more = index.show(query, page_no=page_no, step=step)
+    if not entries:
+        await matcher.send("没有符合条件的请求" if query.page_no == 1 else "已经是最后一页了")
+        return
+    
+    bot_id = event.self_id  # 获取机器人QQ号
+    total = index.count(query)
+    
+    def node(name: str, content: str) -> dict:
+        return {"type": "node", "data": {"name": name, "uin": bot_id, "content": content}}
+    
+    # 只发送当前页，每个请求的内容在收到请求时已经格式化
+    forward_msgs: List[dict] = [node("审核系统", "📋 待处理的审核请求列表")]
+    forward_msgs.extend(node(entry.name, entry.block) for entry in entries)
+    forward_msgs.append(node(
+        "审核系统",
+        "✅ 使用说明：\n1. 回复消息「同意」或「拒绝 原因」\n2. 直接发送「/同意 请求标识」\n3. 直接发送「/拒绝 请求标识 原因」\n\n"
+        + page_footer(query, total, has_more, "查看所有审核")
+    ))
+    
+    await bot.send_group_forward_msg(group_id=event.group_id, messages=forward_msgs)
 
 # 定期清理过期的入群请求（可选功能）
 # 可以添加定时任务，清理长时间未处理的请求
@@ -581,23 +672,20 @@ async def fr_(bot: Bot, matcher: Matcher, event: FriendRequestEvent):
 
     try:
         # 尝试发送到审核群
-        msg_result = await bot.send_group_msg(group_id=AUDIT_GROUP_ID, message=audit_msg)
+        audit_group = audit_router.route().audit_group
+        msg_result = await bot.send_group_msg(group_id=audit_group, message=audit_msg)
         # 存储消息ID和请求信息的映射关系
         message_id = msg_result['message_id']
         
-        # 存储请求信息
-        pending_friend_requests[flag] = {
+        # 存储请求信息，同时建立消息ID到flag的映射并标记请求类型为好友请求
+        add_request(flag, {
             'user_id': uid,
             'comment': comment,
             'time': int(time.time()),
             'message_id': message_id,
-            'type': 'friend'
-        }
-        # 建立消息ID到flag的映射
-        message_to_flag[message_id] = flag
-        # 标记请求类型为好友请求
-        flag_type[flag] = 'friend'
-        save_data()
+            'type': 'friend',
+            'audit_group': audit_group
+        }, 'friend')
         
     except Exception as e:
         # 发送失败，记录日志
@@ -638,6 +726,11 @@ async def handle_manual_approve(bot: Bot, event: MessageEvent, matcher: Matcher,
         await matcher.send(f"未找到请求标识为 {flag} 的申请")
         return
     
+    # 来源群配置了审核员时只有审核员可以处理
+    if not await can_review(bot, event, request_info):
+        await matcher.send("你不是该群的审核员，不能处理这个请求")
+        return
+    
     try:
         if request_type == 'group':
             if sub_type == 'invite':
@@ -648,35 +741,13 @@ async def handle_manual_approve(bot: Bot, event: MessageEvent, matcher: Matcher,
                 # 同意普通入群申请
                 await bot.set_group_add_request(flag=flag, sub_type="add", approve=True, reason=' ')
                 await matcher.send(f"已同意用户 {request_info['user_id']} 加入群 {request_info['group_id']}")
-            
-            # 如果该请求有关联的消息ID，也从映射中删除
-            if 'message_id' in request_info:
-                message_id = request_info['message_id']
-                if message_id in message_to_flag:
-                    message_to_flag.pop(message_id)
-            
-            # 移除已处理的请求
-            pending_requests.pop(flag)
         else:  # friend
             # 同意好友申请
             await bot.set_friend_add_request(flag=flag, approve=True)
             await matcher.send(f"已同意用户 {request_info['user_id']} 的好友申请")
-            
-            # 如果该请求有关联的消息ID，也从映射中删除
-            if 'message_id' in request_info:
-                message_id = request_info['message_id']
-                if message_id in message_to_flag:
-                    message_to_flag.pop(message_id)
-            
-            # 移除已处理的请求
-            pending_friend_requests.pop(flag)
-        
-        # 从请求类型映射中删除
-        if flag in flag_type:
-            flag_type.pop(flag)
         
-        # 保存更新后的数据
-        save_data()
+        # 移除已处理的请求，同时删除关联的消息映射和请求类型
+        remove_request(flag, APPROVED)
         
     except Exception as e:
         logger.error(f"手动处理请求失败: {e}")
@@ -718,6 +789,11 @@ async def handle_manual_reject(bot: Bot, event: MessageEvent, matcher: Matcher,
         await matcher.send(f"未找到请求标识为 {flag} 的申请")
         return
     
+    # 来源群配置了审核员时只有审核员可以处理
+    if not await can_review(bot, event, request_info):
+        await matcher.send("你不是该群的审核员，不能处理这个请求")
+        return
+    
     try:
         if request_type == 'group':
             if sub_type == 'invite':
@@ -728,40 +804,95 @@ async def handle_manual_reject(bot: Bot, event: MessageEvent, matcher: Matcher,
                 # 拒绝普通入群申请
                 await bot.set_group_add_request(flag=flag, sub_type="add", approve=False, reason=reason)
                 await matcher.send(f"已拒绝用户 {request_info['user_id']} 加入群 {request_info['group_id']}，理由: {reason}")
-            
-            # 如果该请求有关联的消息ID，也从映射中删除
-            if 'message_id' in request_info:
-                message_id = request_info['message_id']
-                if message_id in message_to_flag:
-                    message_to_flag.pop(message_id)
-            
-            # 移除已处理的请求
-            pending_requests.pop(flag)
         else:  # friend
             # 拒绝好友申请
             await bot.set_friend_add_request(flag=flag, approve=False)
             await matcher.send(f"已拒绝用户 {request_info['user_id']} 的好友申请，理由: {reason}")
-            
-            # 如果该请求有关联的消息ID，也从映射中删除
-            if 'message_id' in request_info:
-                message_id = request_info['message_id']
-                if message_id in message_to_flag:
-                    message_to_flag.pop(message_id)
-            
-            # 移除已处理的请求
-            pending_friend_requests.pop(flag)
-        
-        # 从请求类型映射中删除
-        if flag in flag_type:
-            flag_type.pop(flag)
         
-        # 保存更新后的数据
-        save_data()
+        # 移除已处理的请求，同时删除关联的消息映射和请求类型
+        remove_request(flag, REJECTED)
         
     except Exception as e:
         logger.error(f"手动处理请求失败: {e}")
         await matcher.send(f"处理请求失败: {e}")
 
+# 批量处理请求（按条件筛选）
+bulk_approve = on_command("/批量同意", rule=check_if_group_is_admin, permission=SUPERUSER | GROUP_ADMIN | GROUP_OWNER, priority=2, block=True)
+bulk_reject = on_command("/批量拒绝", rule=check_if_group_is_admin, permission=SUPERUSER | GROUP_ADMIN | GROUP_OWNER, priority=2, block=True)
+
+@bulk_approve.handle()
+async def handle_bulk_approve(bot: Bot, event: MessageEvent, matcher: Matcher, args: Message = CommandArg()):
+    await handle_bulk_decision(bot, event, matcher, args.extract_plain_text(), approve=True)
+
+@bulk_reject.handle()
+async def handle_bulk_reject(bot: Bot, event: MessageEvent, matcher: Matcher, args: Message = CommandArg()):
+    await handle_bulk_decision(bot, event, matcher, args.extract_plain_text(), approve=False)
+
+async def handle_bulk_decision(bot: Bot, event: MessageEvent, matcher: Matcher, text: str, approve: bool):
+    '''
+    /批量同意 [条件] [预览]
+    /批量拒绝 [条件] [预览] [理由 拒绝理由]
+    
+    条件：全部、群 群号、超过 时长、匹配 正则、入群/邀请/好友，见 function/bulkReview.py
+    '''
+    try:
+        bulk_filter = BulkFilter.parse(text)
+    except ValueError as e:
+        await matcher.finish(f"{e}\n格式：/批量同意 [全部|群 群号|超过 2小时|匹配 正则] [入群|邀请|好友] [预览]")
+    
+    # 好友请求只允许超级管理员处理
+    if TYPE_FRIEND in bulk_filter.types and not await SUPERUSER(bot, event):
+        await matcher.finish("只有超级管理员才能处理好友请求")
+    
+    now = time.time()
+    # 只处理本审核群中、当前用户可以审核的请求
+    superuser = await SUPERUSER(bot, event)
+    entries = [entry for entry in queue_of_chat(event).index.entries.values()
+               if bulk_filter.match(entry, now) and (superuser or is_reviewer(event.user_id, entry.info))]
+    if not entries:
+        await matcher.finish(f"没有符合条件的请求（{bulk_filter.describe()}）")
+    
+    action = "同意" if approve else "拒绝"
+    if bulk_filter.preview:
+        report = BulkReport(approve, preview=True)
+        report.succeeded = entries
+        await matcher.finish(report.summary())
+    
+    await matcher.send(f"开始批量{action} {len(entries)} 个请求（{bulk_filter.describe()}）")
+    report = await bulk_reviewer.decide(bot, entries, approve, bulk_filter.reason or "管理员拒绝")
+    # 所有调用完成后一次性删除成功处理的请求
+    remove_requests([entry.flag for entry in report.succeeded], APPROVED if approve else REJECTED)
+    logger.info(f"批量{action} {len(report.succeeded)} 个请求，失败 {len(report.failed)} 个")
+    await matcher.send(report.summary())
+
+# 查看各审核群的待处理数量和处理统计
+audit_stats = on_command("审核统计", rule=check_if_group_is_admin, permission=SUPERUSER | GROUP_ADMIN | GROUP_OWNER, priority=2, block=True)
+
+@audit_stats.handle()
+async def handle_audit_stats(bot: Bot, event: MessageEvent, matcher: Matcher):
+    # 审核群中只显示本群的统计，其他地方显示所有审核群
+    if isinstance(event, GroupMessageEvent) and audit_router.is_audit_group(event.group_id):
+        queues = [audit_router.queue(event.group_id)]
+    else:
+        queues = audit_router.all_queues()
+    await matcher.send("【审核统计】\n" + "\n".join(queue.summary() for queue in queues))
+
+# 重新读取自动审核规则
+reload_review_rules = on_command("/重载审核规则", permission=SUPERUSER, priority=2, block=True)
+
+@reload_review_rules.handle()
+async def handle_reload_review_rules(matcher: Matcher):
+    if auto_reviewer.load():
+        await matcher.send("已重新加载自动审核规则" if auto_reviewer.default else "未找到规则文件，所有入群申请转人工审核")
+    else:
+        await matcher.send("自动审核规则有误，继续使用之前的规则，详见日志")
+
+async def send_member_notice(gid: int, message: str):
+    await nonebot.get_bot().send_group_msg(group_id=audit_router.route(gid).audit_group, message=message)
+
+# 普通成员变动通知按群合并10秒后发送，机器人自身的通知直接发送
+notice_digest = NoticeDigest(send_member_notice, window=10)
+
 # 处理群成员增加通知事件
 group_increase_notice = on_notice(priority=2, block=True, rule=check_if_group_not_true)
 
@@ -775,6 +906,8 @@ async def handle_group_increase_notice(bot: Bot, event: GroupIncreaseNoticeEvent
     
     # 入群通知
     if user_id == event.self_id:
+        # 新加入的群，第一次查询角色时再加载
+        role_cache.invalidate(group_id)
     # 判断是否为机器人被邀请进群的情况
         if sub_type == "invite":
             # 被邀请
@@ -792,6 +925,7 @@ async def handle_group_increase_notice(bot: Bot, event: GroupIncreaseNoticeEvent
             )
     else:
         # 普通成员增加群的情况
+        role_cache.add_member(group_id, user_id)
         sub_type = "审核同意" if sub_type == "approve" else "直接邀请"
         notice_msg = (
             f"【群成员增加通知】\n"
@@ -805,9 +939,12 @@ async def handle_group_increase_notice(bot: Bot, event: GroupIncreaseNoticeEvent
         # await bot.send_group_msg(group_id=AUDIT_GROUP_ID, # AUDIT_GROUP_ID修改为实际群
         #                          message=MessageSegment.at(int(event.user_id))
         #                   + MessageSegment.text(" 欢迎"))
+        notice_digest.add(group_id, JOIN_APPROVE if event.sub_type == "approve" else JOIN_INVITE,
+                          user_id, operator_id, notice_msg)
+        return
 
     try:
-        await bot.send_group_msg(group_id=AUDIT_GROUP_ID, message=notice_msg)
+        await bot.send_group_msg(group_id=audit_router.route(group_id).audit_group, message=notice_msg)
     except Exception as e:
         logger.error(f"发送群成员增加通知消息失败: {e}")
 
@@ -824,6 +961,7 @@ async def handle_group_increase_notice(bot: Bot, event: GroupDecreaseNoticeEvent
 
     # 退群通知
     if user_id == event.self_id:
+        role_cache.invalidate(group_id)
         if sub_type == 'kick_me': 
 
             notice_msg = (
@@ -839,6 +977,7 @@ async def handle_group_increase_notice(bot: Bot, event: GroupDecreaseNoticeEvent
             )
     else:
         # 普通成员减少群的情况
+        role_cache.remove_member(group_id, user_id)
         if sub_type == "kick":
             # 当bot踢人时，operator_id为0
             operator_id = "BOT" if int(operator_id) == 0 else operator_id
@@ -854,13 +993,26 @@ async def handle_group_increase_notice(bot: Bot, event: GroupDecreaseNoticeEvent
                 f"群号: {group_id}\n"
                 f"成员: {user_id}\n"
             )
+        notice_digest.add(group_id, KICK if sub_type == "kick" else LEAVE, user_id, operator_id, notice_msg)
+        return
 
     try:
-        await bot.send_group_msg(group_id=AUDIT_GROUP_ID, message=notice_msg)
+        await bot.send_group_msg(group_id=audit_router.route(group_id).audit_group, message=notice_msg)
     except Exception as e:
         logger.error(f"发送群成员减少通知消息失败: {e}")
 
 
+# 处理管理员变更通知事件，同步角色缓存和邀请链中的角色
+group_admin_notice = on_notice(priority=2, block=False)
+
+@group_admin_notice.handle()
+async def handle_group_admin_notice(event: GroupAdminNoticeEvent):
+    role = 'admin' if event.sub_type == 'set' else 'member'
+    role_cache.set_role(event.group_id, event.user_id, role)
+    invite_graph.set_role(event.group_id, event.user_id, role)
+    logger.info(f"群 {event.group_id} 成员 {event.user_id} 的角色变更为 {role}")
+
+
 
 主动设置群头衔 = on_command("设置头衔", 
                              rule=check_if_bot_is_owner & to_me(), 
@@ -873,21 +1025,37 @@ async def handle_group_increase_notice(bot: Bot, event: GroupDecreaseNoticeEvent
 
 连坐踢出群 = on_command("lz踢出",
                             rule=check_if_bot_is_owner_or_admin, 
-                            permission=GROUP_ADMIN | GROUP_ADMIN| SUPERUSER, 
+                            permission=GROUP_ADMIN | GROUP_OWNER | SUPERUSER, 
                             priority=2)
 
 @连坐踢出群.handle()
 async def lzkick(event: GroupMessageEvent, args: Message = CommandArg()):
     '''
     连坐踢出群聊
+    
+    回复目标成员的消息或@目标成员：
+    lz踢出 [拉黑] [预览]
+    踢出目标成员及其直接或间接邀请的所有成员，预览时只列出将被踢出的成员
     '''
     gid = event.group_id
-    uid = event.user_id
-    uid_list = []
-    uid_list = await 获取连坐链子(gid, uid)
-    black = True if args.extract_plain_text() == '拉黑' else False
+    options = args.extract_plain_text().split()
+    black = '拉黑' in options
+    dry_run = '预览' in options
+
+    # 目标成员：被回复的消息发送者，或第一个被@的成员
+    target = None
+    if event.reply:
+        target = event.reply.sender.user_id
+    else:
+        for seg in args:
+            if seg.type == "at" and seg.data.get("qq") != "all":
+                target = int(seg.data["qq"])
+                break
+    if not target:
+        await 连坐踢出群.finish("踢谁？回复TA的消息或者@TA👀")
 
-    await 踢出(gid, uid_list, black)
+    report = await kick_executor.kick_subtree(gid, target, reject_add_request=black, dry_run=dry_run)
+    await 连坐踢出群.finish(report.summary())
 
 
 
@@ -953,6 +1121,6 @@ async def demo_(bot: Bot, event: MessageEvent, matcher: Matcher):
     uid = event.user_id
     data = await 获取连坐链子(gid, uid)
 
-    logger.debug(f"获取连坐链子: {data}")
+    logger.debug(f"获取连坐链子: {data}, 深度: {invite_graph.depth(gid, uid)}, 邀请的成员: {invite_graph.descendants(gid, uid)}")
 
 
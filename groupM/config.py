@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+class Config(BaseModel):
+    """群组与好友管理插件设置"""
+
+    GROUPM_CONFIG: dict = {
+        "AUDIT_GROUP_ID": 629590326,  # 默认审核群，没有单独配置的群都发送到这里
+        "FRIEND_AUDIT_GROUP_ID": None,  # 好友申请的审核群，为空时使用默认审核群
+        # 按被管理的群配置审核群和审核员，审核员为空时审核群的管理员都可以处理
+        # 如 {"123456789": {"audit_group": 987654321, "reviewers": [10001, 10002]}}
+        "ROUTES": {},
+    }
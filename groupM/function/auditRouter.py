@@ -0,0 +1,124 @@
+'''
+审核分流
+
+每个被管理的群可以单独配置审核群和审核员，请求按来源群发送到对应的审核群。
+每个审核群有自己的审核队列：
+- index:    该审核群的待审核请求索引（见 requestIndex.RequestIndex）
+- messages: 该审核群中审核消息ID -> 请求标识
+- stats:    收到、同意、拒绝、过期等计数和平均处理用时
+回复审核消息、查看列表、批量处理都只在所在审核群的队列中进行。
+'''
+import time
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+from .requestIndex import RequestIndex
+
+# 统计项
+RECEIVED = "收到"
+APPROVED = "同意"
+REJECTED = "拒绝"
+AUTO_APPROVED = "自动同意"
+AUTO_REJECTED = "自动拒绝"
+EXPIRED = "过期"
+STAT_NAMES = (RECEIVED, APPROVED, REJECTED, AUTO_APPROVED, AUTO_REJECTED, EXPIRED)
+
+
+class Route:
+    '''单个被管理的群的审核配置'''
+
+    __slots__ = ('audit_group', 'reviewers')
+
+    def __init__(self, audit_group: int, reviewers: Iterable = ()):
+        self.audit_group = int(audit_group)
+        self.reviewers: FrozenSet[int] = frozenset(int(uid) for uid in reviewers)
+
+
+class AuditQueue:
+    '''单个审核群的待审核队列'''
+
+    def __init__(self, audit_group: int):
+        self.audit_group = audit_group
+        self.index = RequestIndex()
+        self.messages: Dict[int, str] = {}
+        self.stats: Counter = Counter()
+        # 已处理请求的等待时间总和，用于计算平均处理用时
+        self._wait_total = 0.0
+        self._wait_count = 0
+
+    def add(self, flag: str, info: dict, type_: str):
+        self.index.add(flag, info, type_)
+        if info.get('message_id') is not None:
+            self.messages[info['message_id']] = flag
+
+    def remove(self, flag: str, info: Optional[dict]):
+        self.index.remove(flag)
+        if info and self.messages.get(info.get('message_id')) == flag:
+            self.messages.pop(info['message_id'])
+
+    def record(self, stat: str, info: Optional[dict] = None, count: int = 1):
+        '''记录统计，处理请求时传入 info 以计算处理用时'''
+        self.stats[stat] += count
+        if info is not None and info.get('time') and stat in (APPROVED, REJECTED):
+            self._wait_total += time.time() - info['time']
+            self._wait_count += 1
+
+    def summary(self) -> str:
+        lines = [f"审核群 {self.audit_group}: 待处理 {len(self.index.entries)} 个"]
+        counts = [f"{name} {self.stats[name]}" for name in STAT_NAMES if self.stats[name]]
+        if counts:
+            lines.append("  " + "，".join(counts))
+        if self._wait_count:
+            minutes = self._wait_total / self._wait_count / 60
+            lines.append(f"  平均处理用时 {minutes:.1f} 分钟")
+        return "\n".join(lines)
+
+
+class AuditRouter:
+    '''按来源群选择审核群'''
+
+    def __init__(self, default_group: int, friend_group: Optional[int] = None, routes: Optional[dict] = None):
+        '''
+        参数：
+
+        default_group: 默认审核群
+
+        friend_group: 好友申请的审核群，为空时使用默认审核群
+
+        routes: {被管理的群号: {"audit_group": 审核群, "reviewers": [审核员]}}
+        '''
+        self.default = Route(default_group)
+        self.friend = Route(friend_group or default_group)
+        self.routes: Dict[str, Route] = {}
+        for gid, route in (routes or {}).items():
+            self.routes[str(gid)] = Route(route.get("audit_group") or default_group, route.get("reviewers", ()))
+        self.queues: Dict[int, AuditQueue] = {}
+        for route in [self.default, self.friend, *self.routes.values()]:
+            self.queue(route.audit_group)
+
+    def route(self, gid=None) -> Route:
+        '''来源群的审核配置，gid 为空表示好友申请'''
+        if gid is None:
+            return self.friend
+        return self.routes.get(str(gid), self.default)
+
+    def queue(self, audit_group) -> AuditQueue:
+        audit_group = int(audit_group)
+        queue = self.queues.get(audit_group)
+        if queue is None:
+            queue = self.queues[audit_group] = AuditQueue(audit_group)
+        return queue
+
+    def queue_for(self, info: dict) -> AuditQueue:
+        '''请求所在的审核队列，旧数据没有记录审核群时按当前配置计算'''
+        audit_group = info.get('audit_group') or self.route(info.get('group_id')).audit_group
+        return self.queue(audit_group)
+
+    def is_audit_group(self, gid) -> bool:
+        return int(gid) in self.queues
+
+    def reviewers(self, gid=None) -> FrozenSet[int]:
+        return self.route(gid).reviewers
+
+    def all_queues(self) -> List[AuditQueue]:
+        return list(self.queues.values())
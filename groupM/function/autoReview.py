@@ -0,0 +1,269 @@
+'''
+入群申请自动审核
+
+规则保存在 data/review_rules.json，启动时（或发送 /重载审核规则 时）编译一次：
+- 关键词合并为一个正则表达式，黑名单/白名单转为集合
+- 每个群可以覆盖默认规则中的任意字段
+
+判断顺序：
+1. 黑名单 -> 拒绝；白名单 -> 同意
+2. 验证信息匹配拒绝规则 -> 拒绝
+3. 群内自动同意次数超过频率限制 -> 转人工（防止被刷）
+4. 账号等级/注册时间不满足 -> 按 on_profile_fail 处理（默认转人工）
+5. 验证信息匹配同意规则 -> 同意
+6. 其余按 on_no_match 处理（默认转人工）
+
+规则文件不存在时所有申请都转人工审核，与之前的行为相同。
+
+规则文件示例：
+{
+  "default": {
+    "blacklist": [10001],
+    "whitelist": [],
+    "approve_keywords": [],
+    "approve_patterns": ["^CTF\\\\d{4}$"],
+    "reject_keywords": ["代刷", "广告"],
+    "reject_patterns": [],
+    "min_level": 0,
+    "min_age_days": 0,
+    "rate_limit": {"count": 10, "seconds": 60},
+    "on_profile_fail": "escalate",
+    "on_no_match": "escalate"
+  },
+  "groups": {
+    "123456789": {"approve_keywords": ["ctf"], "min_level": 8}
+  }
+}
+'''
+import json
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Pattern
+
+from nonebot import logger
+
+APPROVE = "approve"
+REJECT = "reject"
+ESCALATE = "escalate"
+ACTIONS = (APPROVE, REJECT, ESCALATE)
+
+DEFAULT_RULES = {
+    "blacklist": [],
+    "whitelist": [],
+    "approve_keywords": [],
+    "approve_patterns": [],
+    "reject_keywords": [],
+    "reject_patterns": [],
+    "min_level": 0,
+    "min_age_days": 0,
+    "rate_limit": {"count": 0, "seconds": 60},
+    "on_profile_fail": ESCALATE,
+    "on_no_match": ESCALATE,
+}
+
+
+class Decision:
+    '''自动审核结果'''
+
+    __slots__ = ('action', 'reason', 'stamp')
+
+    def __init__(self, action: str, reason: str, stamp: Optional[float] = None):
+        self.action = action
+        self.reason = reason
+        # 自动同意时占用的频率限制名额，处理失败时用 AutoReviewer.release 归还
+        self.stamp = stamp
+
+    def __repr__(self):
+        return f"Decision({self.action}, {self.reason})"
+
+
+def compile_matcher(keywords, patterns) -> Optional[Pattern]:
+    '''把关键词和正则合并为一个正则表达式，都为空时返回 None'''
+    parts = [re.escape(word) for word in keywords if word] + [f"(?:{p})" for p in patterns if p]
+    return re.compile("|".join(parts), re.IGNORECASE) if parts else None
+
+
+class GroupPolicy:
+    '''编译后的单个群的规则'''
+
+    def __init__(self, rules: dict):
+        self.blacklist = frozenset(int(uid) for uid in rules["blacklist"])
+        self.whitelist = frozenset(int(uid) for uid in rules["whitelist"])
+        self.approve = compile_matcher(rules["approve_keywords"], rules["approve_patterns"])
+        self.reject = compile_matcher(rules["reject_keywords"], rules["reject_patterns"])
+        self.min_level = int(rules["min_level"])
+        self.min_age = float(rules["min_age_days"]) * 86400
+        self.rate_count = int(rules["rate_limit"].get("count", 0))
+        self.rate_seconds = float(rules["rate_limit"].get("seconds", 60))
+        self.on_profile_fail = rules["on_profile_fail"]
+        self.on_no_match = rules["on_no_match"]
+        for action in (self.on_profile_fail, self.on_no_match):
+            if action not in ACTIONS:
+                raise ValueError(f"未知的处理方式: {action}")
+
+    @property
+    def needs_profile(self) -> bool:
+        return self.min_level > 0 or self.min_age > 0
+
+
+class ProfileCache:
+    '''get_stranger_info 结果缓存'''
+
+    def __init__(self, ttl: float = 6 * 3600, size: int = 2048):
+        self.ttl = ttl
+        self.size = size
+        self._items: "OrderedDict[int, tuple]" = OrderedDict()
+
+    async def get(self, bot, uid: int) -> dict:
+        item = self._items.get(uid)
+        if item is not None and time.monotonic() - item[0] < self.ttl:
+            self._items.move_to_end(uid)
+            return item[1]
+        info = await bot.get_stranger_info(user_id=uid, no_cache=False)
+        self._items[uid] = (time.monotonic(), info)
+        self._items.move_to_end(uid)
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
+        return info
+
+
+class AutoReviewer:
+    '''入群申请自动审核'''
+
+    def __init__(self, rules_file: str):
+        self.rules_file = rules_file
+        self.default: Optional[GroupPolicy] = None
+        self.groups: Dict[str, GroupPolicy] = {}
+        self.profiles = ProfileCache()
+        # 每个群最近自动同意的时间
+        self._approved: Dict[str, Deque[float]] = {}
+
+    def load(self) -> bool:
+        '''
+        读取并编译规则
+
+        规则有误时保留之前的规则，返回是否成功
+        '''
+        if not os.path.exists(self.rules_file):
+            self.default, self.groups = None, {}
+            return True
+        try:
+            with open(self.rules_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            base = {**DEFAULT_RULES, **config.get("default", {})}
+            default = GroupPolicy(base)
+            groups = {str(gid): GroupPolicy({**base, **rules}) for gid, rules in config.get("groups", {}).items()}
+        except Exception as e:
+            logger.error(f"读取自动审核规则失败: {e}")
+            return False
+        self.default, self.groups = default, groups
+        logger.info(f"已加载自动审核规则，单独配置的群: {len(groups)}")
+        return True
+
+    def policy(self, gid) -> Optional[GroupPolicy]:
+        return self.groups.get(str(gid), self.default)
+
+    def _rate_limited(self, gid: str, policy: GroupPolicy, now: float) -> bool:
+        if policy.rate_count <= 0:
+            return False
+        approved = self._approved.setdefault(gid, deque())
+        while approved and now - approved[0] > policy.rate_seconds:
+            approved.popleft()
+        return len(approved) >= policy.rate_count
+
+    async def _check_profile(self, bot, uid: int, policy: GroupPolicy) -> Optional[str]:
+        '''返回不满足的原因，满足时返回 None'''
+        try:
+            info = await self.profiles.get(bot, uid)
+        except Exception as e:
+            return f"获取账号信息失败: {e}"
+        level = info.get('qqLevel', info.get('level'))
+        if policy.min_level > 0:
+            if level is None:
+                return "无法获取账号等级"
+            if int(level) < policy.min_level:
+                return f"账号等级 {level} 低于 {policy.min_level}"
+        if policy.min_age > 0:
+            reg_time = info.get('reg_time', info.get('regTime'))
+            if not reg_time:
+                return "无法获取注册时间"
+            days = (time.time() - int(reg_time)) / 86400
+            if days * 86400 < policy.min_age:
+                return f"账号注册 {days:.0f} 天，少于 {policy.min_age / 86400:.0f} 天"
+        return None
+
+    async def review(self, bot, gid, uid, comment: str) -> Decision:
+        '''
+        审核入群申请
+
+        参数：
+
+        gid: 群号
+
+        uid: 申请人
+
+        comment: 验证信息（已去掉「问题/答案」前缀）
+        '''
+        policy = self.policy(gid)
+        if policy is None:
+            return Decision(ESCALATE, "未配置自动审核规则")
+        gid, uid, comment = str(gid), int(uid), comment or ""
+
+        if uid in policy.blacklist:
+            return Decision(REJECT, "黑名单")
+        if uid in policy.whitelist:
+            return Decision(APPROVE, "白名单", self._reserve(gid, policy, time.monotonic()))
+        if policy.reject is not None:
+            match = policy.reject.search(comment)
+            if match:
+                return Decision(REJECT, f"验证信息包含「{match.group(0)}」")
+
+        now = time.monotonic()
+        if self._rate_limited(gid, policy, now):
+            return Decision(ESCALATE, f"{policy.rate_seconds:.0f}秒内自动同意已达 {policy.rate_count} 人")
+
+        # 在等待账号信息之前先占用名额，同时到达的申请不会都通过频率检查；最终没有同意时归还
+        stamp = self._reserve(gid, policy, now)
+        decision = await self._decide(bot, uid, comment, policy)
+        if decision.action == APPROVE:
+            decision.stamp = stamp
+        else:
+            self._release(gid, stamp)
+        return decision
+
+    async def _decide(self, bot, uid: int, comment: str, policy: GroupPolicy) -> Decision:
+        if policy.needs_profile:
+            failure = await self._check_profile(bot, uid, policy)
+            if failure is not None:
+                return Decision(policy.on_profile_fail, failure)
+
+        if policy.approve is not None and policy.approve.search(comment):
+            return Decision(APPROVE, "验证信息符合规则")
+        if policy.on_no_match == APPROVE:
+            return Decision(APPROVE, "默认同意")
+        return Decision(policy.on_no_match, "验证信息不符合规则")
+
+    def _reserve(self, gid: str, policy: GroupPolicy, now: float) -> Optional[float]:
+        '''占用一个自动同意的名额，没有频率限制时不记录'''
+        if policy.rate_count <= 0:
+            return None
+        self._approved.setdefault(gid, deque()).append(now)
+        return now
+
+    def _release(self, gid: str, stamp: Optional[float]):
+        approved = self._approved.get(gid)
+        if stamp is None or not approved:
+            return
+        try:
+            approved.remove(stamp)
+        except ValueError:
+            # 已经超出时间窗口被移除
+            pass
+
+    def release(self, gid, decision: Decision):
+        '''同意入群申请失败时归还占用的频率限制名额'''
+        self._release(str(gid), decision.stamp)
+
+auto_reviewer = AutoReviewer(os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "review_rules.json"))
@@ -0,0 +1,212 @@
+'''
+批量审核
+
+按条件筛选待审核请求，并发调用 set_group_add_request / set_friend_add_request：
+- 同时进行的请求数和每秒请求数都有上限，避免触发风控
+- 全部调用完成后，成功处理的请求在同一个数据库事务中删除
+
+条件（可以组合）：
+- 全部
+- 群 <群号>，或直接写五位以上的群号
+- 超过 <时长>，如 30分钟、2小时、1天、90s
+- 匹配 <正则>，匹配入群申请的验证信息
+- 入群 / 邀请 / 好友，默认只处理入群申请和群聊邀请
+- 预览，只列出符合条件的请求
+- 理由 <拒绝理由>，之后的内容都作为理由
+'''
+import asyncio
+import re
+import time
+from typing import List, Optional, Pattern, Set, Tuple
+
+from nonebot import logger
+
+from .kickExecutor import RateLimiter
+from .requestIndex import RequestEntry, TYPE_ADD, TYPE_INVITE, TYPE_FRIEND, TYPE_NAMES
+
+DURATION_UNITS = {
+    "秒": 1, "s": 1,
+    "分": 60, "分钟": 60, "m": 60,
+    "小时": 3600, "h": 3600,
+    "天": 86400, "d": 86400,
+}
+DURATION_PATTERN = re.compile(r'^(\d+)(秒|分钟|分|小时|天|s|m|h|d)$')
+
+
+def parse_duration(text: str) -> Optional[int]:
+    '''解析时长，单位秒，格式错误时返回 None'''
+    match = DURATION_PATTERN.match(text.strip().lower())
+    if not match:
+        return None
+    return int(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+class BulkFilter:
+    '''批量审核的筛选条件'''
+
+    def __init__(self):
+        self.all = False
+        self.group_id: Optional[str] = None
+        self.min_age: Optional[int] = None
+        self.pattern: Optional[Pattern] = None
+        self.types: Set[str] = {TYPE_ADD, TYPE_INVITE}
+        self.preview = False
+        self.reason: Optional[str] = None
+
+    @classmethod
+    def parse(cls, text: str) -> 'BulkFilter':
+        '''
+        解析命令参数
+
+        格式错误时抛出 ValueError，异常信息可以直接回复给用户
+        '''
+        result = cls()
+        words = text.split()
+        types = set()
+        i = 0
+        while i < len(words):
+            word = words[i]
+            value = words[i + 1] if i + 1 < len(words) else None
+            if word == "全部":
+                result.all = True
+            elif word == "预览":
+                result.preview = True
+            elif word in ("入群", "申请"):
+                types.add(TYPE_ADD)
+            elif word == "邀请":
+                types.add(TYPE_INVITE)
+            elif word == "好友":
+                types.add(TYPE_FRIEND)
+            elif word == "理由":
+                result.reason = " ".join(words[i + 1:]) or None
+                break
+            elif word == "群":
+                if value is None or not value.isdigit():
+                    raise ValueError("「群」后面需要群号")
+                result.group_id = value
+                i += 1
+            elif word.isdigit() and len(word) >= 5:
+                result.group_id = word
+            elif word == "超过":
+                seconds = parse_duration(value or "")
+                if seconds is None:
+                    raise ValueError("「超过」后面需要时长，如 30分钟、2小时、1天")
+                result.min_age = seconds
+                i += 1
+            elif word.startswith("超过") and parse_duration(word[2:]) is not None:
+                result.min_age = parse_duration(word[2:])
+            elif word == "匹配":
+                if value is None:
+                    raise ValueError("「匹配」后面需要正则表达式")
+                try:
+                    result.pattern = re.compile(value)
+                except re.error as e:
+                    raise ValueError(f"正则表达式错误: {e}")
+                i += 1
+            else:
+                raise ValueError(f"无法识别的条件: {word}")
+            i += 1
+
+        if types:
+            result.types = types
+        if not (result.all or result.group_id or result.min_age or result.pattern):
+            raise ValueError("请指定条件（全部、群、超过、匹配），避免误操作")
+        return result
+
+    def match(self, entry: RequestEntry, now: Optional[float] = None) -> bool:
+        if entry.type not in self.types:
+            return False
+        if self.group_id is not None and entry.group_id != self.group_id:
+            return False
+        if self.min_age is not None and (now or time.time()) - entry.time < self.min_age:
+            return False
+        if self.pattern is not None and not self.pattern.search(str(entry.info.get('comment') or "")):
+            return False
+        return True
+
+    def describe(self) -> str:
+        parts = ["/".join(TYPE_NAMES[t] for t in sorted(self.types))]
+        if self.group_id is not None:
+            parts.append(f"群 {self.group_id}")
+        if self.min_age is not None:
+            parts.append(f"超过 {self.min_age} 秒")
+        if self.pattern is not None:
+            parts.append(f"匹配 {self.pattern.pattern}")
+        return "，".join(parts)
+
+
+class BulkReport:
+    '''批量审核结果'''
+
+    def __init__(self, approve: bool, preview: bool = False):
+        self.approve = approve
+        self.preview = preview
+        self.succeeded: List[RequestEntry] = []
+        self.failed: List[Tuple[RequestEntry, str]] = []
+        self.elapsed = 0.0
+
+    @staticmethod
+    def _ids(items: List[str], limit: int = 20) -> str:
+        text = ", ".join(items[:limit])
+        return text + f" 等{len(items)}个" if len(items) > limit else text
+
+    def summary(self) -> str:
+        action = "同意" if self.approve else "拒绝"
+        users = [str(entry.info['user_id']) for entry in self.succeeded]
+        if self.preview:
+            return f"【批量{action}预览】将{action} {len(users)} 个请求: {self._ids(users) or '无'}"
+        lines = [f"【批量{action}结果】用时 {self.elapsed:.1f} 秒",
+                 f"成功 {len(users)} 个: {self._ids(users) or '无'}"]
+        if self.failed:
+            failed = [f"{entry.info['user_id']}({e})" for entry, e in self.failed]
+            lines.append(f"失败 {len(failed)} 个: {self._ids(failed)}")
+        return "\n".join(lines)
+
+
+class BulkReviewer:
+    '''并发审核执行器'''
+
+    def __init__(self, concurrency: int = 5, rate: float = 5):
+        '''
+        参数：
+
+        concurrency: 同时进行的请求数
+
+        rate: 每秒最多请求数
+        '''
+        self.concurrency = concurrency
+        self.rate = rate
+
+    async def decide(self, bot, entries: List[RequestEntry], approve: bool, reason: str = "管理员拒绝") -> BulkReport:
+        '''
+        并发处理多个请求，不修改存储
+
+        调用方根据 report.succeeded 一次性删除已处理的请求
+        '''
+        report = BulkReport(approve)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = RateLimiter(self.rate)
+        start = time.monotonic()
+
+        async def decide_one(entry: RequestEntry):
+            async with semaphore:
+                await limiter.acquire()
+                try:
+                    if entry.type == TYPE_FRIEND:
+                        await bot.set_friend_add_request(flag=entry.flag, approve=approve)
+                    else:
+                        sub_type = "invite" if entry.type == TYPE_INVITE else "add"
+                        await bot.set_group_add_request(flag=entry.flag, sub_type=sub_type, approve=approve,
+                                                        reason=' ' if approve else reason)
+                except Exception as e:
+                    report.failed.append((entry, str(e) or type(e).__name__))
+                    logger.warning(f"批量处理请求 {entry.flag} 失败: {e}")
+                else:
+                    report.succeeded.append(entry)
+
+        await asyncio.gather(*(decide_one(entry) for entry in entries))
+        report.elapsed = time.monotonic() - start
+        return report
+
+
+bulk_reviewer = BulkReviewer()
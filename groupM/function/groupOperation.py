@@ -1,5 +1,8 @@
 from nonebot import logger, get_driver
 import nonebot
+from .inviteGraph import invite_graph, ADMIN_ROLES
+from .kickExecutor import kick_executor
+from .roleCache import role_cache
 
 async def 踢出(gid, uid_or_uidlist:list | int, reject_add_request=False):
     '''
@@ -20,14 +23,14 @@ async def 踢出(gid, uid_or_uidlist:list | int, reject_add_request=False):
     
     # 一个人
     if isinstance(uid_or_uidlist, int): 
-        await bot.call_api("set_group_kick", gid, uid_or_uidlist, reject_add_request)
-        logger.debug(f"在群 {gid} 踢出 {uid}{state}")
+        await bot.set_group_kick(group_id=gid, user_id=uid_or_uidlist, reject_add_request=reject_add_request)
+        logger.debug(f"在群 {gid} 踢出 {uid_or_uidlist}{state}")
     
-    # 适用于连坐
-    if isinstance(uid_or_uidlist, int): 
-        for uid in uid_or_uidlist:
-            await bot.call_api("set_group_kick", gid, uid_or_uidlist, reject_add_request)
-            logger.debug(f"在群 {gid} 踢出 {uid}{state}")
+    # 适用于连坐，并发踢出
+    else:
+        report = await kick_executor.kick_many(bot, gid, [str(uid) for uid in uid_or_uidlist], reject_add_request)
+        logger.debug(f"在群 {gid} 踢出 {report.kicked}{state} 失败: {report.failed}")
+        return report
             
 
 
@@ -84,13 +87,15 @@ async def 查找用户角色(gid, uid) -> str:
     返回值：
 
     role: 用户角色，可能的值为：owner, admin, member
+
+    优先从 roleCache 查询，缓存中没有时才调用接口
     """
 
     bot = nonebot.get_bot()
 
-    result = await bot.get_group_member_info(group_id=gid, user_id=uid)
-    logger.info(f"查找用户角色成功，群号：{gid}，用户号：{uid}，角色：{result['role']}")
-    return result['role']
+    role = await role_cache.get_role(bot, gid, uid)
+    logger.debug(f"查找用户角色成功，群号：{gid}，用户号：{uid}，角色：{role}")
+    return role
 
 async def 设置群头衔(gid, uid, title):
     '''
@@ -159,7 +164,7 @@ async def 连坐链子(gid, uid, iuid):
     用户2邀请用户3
     细则：
     当链子中存在管理时，链子到此为止，不在迭代判断
-    保存每个用户的信息，json即可，考虑到后续人数较多，需要注意性能问题
+    保存每个用户的信息，见 inviteGraph.InviteGraph，每次入群只追加一条日志
     应该包括：（如果预留漏洞 可以用序列化存储数据，保存信息添加一个可控的字段，如保留QQ昵称？
         （内容不可控）
         邀请人
@@ -220,67 +225,19 @@ async def 连坐链子(gid, uid, iuid):
     }
     '''
 
-    import json
-    import os
-    import datetime
-    from nonebot import logger
-    
-    # 数据文件路径
-    data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-    invite_chain_file = os.path.join(data_dir, "invite_chain.json")
-    
-    # 确保数据目录存在
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-    
-    # 读取现有的邀请链数据
-    invite_data = {}
-    if os.path.exists(invite_chain_file):
-        try:
-            with open(invite_chain_file, 'r', encoding='utf-8') as f:
-                invite_data = json.load(f)
-        except json.JSONDecodeError:
-            logger.error(f"读取邀请链文件失败，文件可能损坏: {invite_chain_file}")
-        except Exception as e:
-            logger.error(f"读取邀请链文件时出错: {e}")
-    
-    # 确保群号存在于数据中
-    gid_str = str(gid)
-    if gid_str not in invite_data:
-        invite_data[gid_str] = {}
-    
-    # 获取被邀请人的角色
-    iuid_str = str(iuid)
-    uid_str = str(uid)
-    
     try:
         # 获取被邀请人的角色
         iuid_role = await 查找用户角色(gid, iuid)
         
         # 如果邀请人不在数据中，且不是被邀请人自己添加自己，则添加邀请人信息
-        if uid_str != iuid_str and uid_str not in invite_data[gid_str]:
+        uid_role = None
+        if str(uid) != str(iuid) and invite_graph.get(gid, uid) is None:
             # 获取邀请人的角色
             uid_role = await 查找用户角色(gid, uid)
-            invite_data[gid_str][uid_str] = {
-                "inviter": None,  # 邀请人未知或为初始成员
-                "invite_time": datetime.datetime.now().isoformat(),
-                "role": uid_role
-            }
-        
-        # 添加被邀请人信息
-        invite_data[gid_str][iuid_str] = {
-            "inviter": uid_str,
-            "invite_time": datetime.datetime.now().isoformat(),
-            "role": iuid_role
-        }
         
-        # 持久化到文件
-        try:
-            with open(invite_chain_file, 'w', encoding='utf-8') as f:
-                json.dump(invite_data, f, ensure_ascii=False, indent=2)
-            logger.info(f"邀请链数据已更新: 群 {gid}, 邀请人 {uid}, 被邀请人 {iuid}")
-        except Exception as e:
-            logger.error(f"保存邀请链数据失败: {e}")
+        # 只追加日志，不重写整个文件
+        invite_graph.add_member(gid, uid, iuid, invitee_role=iuid_role, inviter_role=uid_role)
+        logger.info(f"邀请链数据已更新: 群 {gid}, 邀请人 {uid}, 被邀请人 {iuid}")
             
     except Exception as e:
         logger.error(f"构建邀请链时出错: {e}")
@@ -299,70 +256,9 @@ async def 获取连坐链子(gid, uid):
     数组的第一个元素是传入的uid，最后一个元素是链条中的管理员/群主(如果存在)
     如果没有找到邀请链或者用户是初始成员，返回只包含该用户的数组
     '''
-    import json
-    import os
-    from nonebot import logger
-    
-    # 数据文件路径
-    data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-    invite_chain_file = os.path.join(data_dir, "invite_chain.json")
-    
-    # 验证数据文件是否存在
-    if not os.path.exists(invite_chain_file):
-        logger.warning(f"邀请链数据文件不存在: {invite_chain_file}")
-        return [str(uid)]  # 如果文件不存在，返回只包含当前用户的数组
-    
-    # 读取邀请链数据
-    try:
-        with open(invite_chain_file, 'r', encoding='utf-8') as f:
-            invite_data = json.load(f)
-    except Exception as e:
-        logger.error(f"读取邀请链数据失败: {e}")
-        return [str(uid)]  # 如果读取失败，返回只包含当前用户的数组
-    
-    # 检查群组是否在数据中
-    gid_str = str(gid)
-    if gid_str not in invite_data:
-        logger.info(f"群 {gid} 没有邀请链数据")
-        return [str(uid)]  # 如果群不在数据中，返回只包含当前用户的数组
-    
-    # 获取群组数据
-    group_data = invite_data[gid_str]
-    
-    # 初始化邀请链数组，第一个元素是传入的用户ID
-    invite_chain = [str(uid)]
-    current_uid = str(uid)
-    
-    # 循环查找邀请链，直到找到群主/管理员或者链条结束
-    while current_uid in group_data:
-        # 获取当前用户的数据
-        user_data = group_data[current_uid]
-        
-        # 检查是否有邀请人
-        if user_data.get('inviter') is None:
-            # 用户是初始成员或无邀请人记录
-            break
-        
-        # 获取邀请人ID
-        inviter_id = user_data['inviter']
-        
-        # 检查邀请人是否在群数据中
-        if inviter_id not in group_data:
-            # 邀请人数据不存在，可能是已退群或数据不完整
-            logger.warning(f"邀请人 {inviter_id} 在群 {gid} 中没有数据记录")
-            break
-        
-        # 将邀请人添加到链条中
-        invite_chain.append(inviter_id)
-        
-        # 检查邀请人角色
-        inviter_role = group_data[inviter_id].get('role')
-        if inviter_role in ['owner', 'admin']:
-            # 如果邀请人是群主或管理员，停止查找
-            logger.info(f"在邀请链中找到管理员/群主 {inviter_id}，角色: {inviter_role}")
-            break
-        
-        # 更新当前用户为邀请人，继续查找
-        current_uid = inviter_id
-    
-    return invite_chain
+    # 以当前群角色为准，邀请链中保存的角色可能已经过时
+    roles = await role_cache.members(nonebot.get_bot(), gid)
+    chain = invite_graph.ancestors(gid, uid, is_admin=lambda member: roles.get(int(member)) in ADMIN_ROLES)
+    if len(chain) > 1 and roles.get(int(chain[-1])) in ADMIN_ROLES:
+        logger.info(f"在邀请链中找到管理员/群主 {chain[-1]}")
+    return chain
@@ -0,0 +1,241 @@
+'''
+邀请关系图
+
+按群保存 邀请人 -> 被邀请人 的关系，用于连坐功能：
+- nodes:    {群号: {用户: {"inviter": 邀请人, "invite_time": 时间, "role": 角色}}}
+- children: {群号: {邀请人: {被邀请人, ...}}}
+
+启动时读取一次快照 invite_chain.json (与旧版本格式相同) 并重放日志 invite_chain.journal，
+之后每次变更只向日志追加一行，日志达到一定长度或关闭时再写入新的快照并清空日志。
+'''
+import datetime
+import json
+import os
+from collections import deque
+from typing import Callable, Dict, List, Optional, Set
+
+from nonebot import logger
+
+ADMIN_ROLES = ('owner', 'admin')
+
+
+class InviteGraph:
+    '''邀请关系图'''
+
+    def __init__(self, data_dir: str, compact_every: int = 500):
+        '''
+        参数：
+
+        data_dir: 数据目录
+
+        compact_every: 日志达到多少条时写入快照
+        '''
+        self.snapshot_file = os.path.join(data_dir, "invite_chain.json")
+        self.journal_file = os.path.join(data_dir, "invite_chain.journal")
+        self.compact_every = compact_every
+        self.nodes: Dict[str, Dict[str, dict]] = {}
+        self.children: Dict[str, Dict[str, Set[str]]] = {}
+        self._journal_size = 0
+        self._journal = None
+
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+        self._load()
+
+    # ---------- 持久化 ----------
+
+    def _load(self):
+        if os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                    for gid, members in json.load(f).items():
+                        for uid, info in members.items():
+                            self._set(gid, uid, info)
+            except Exception as e:
+                logger.error(f"读取邀请链快照失败: {e}")
+
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                        self._journal_size += 1
+                    except (ValueError, KeyError):
+                        # 写入中断导致的最后一行不完整
+                        logger.warning(f"跳过损坏的邀请链日志: {line.strip()[:50]}")
+
+    def _write(self, entry: dict):
+        '''应用变更并追加到日志'''
+        self._apply(entry)
+        if self._journal is None:
+            self._journal = open(self.journal_file, 'a', encoding='utf-8')
+        self._journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        self._journal_size += 1
+        if self._journal_size >= self.compact_every:
+            self.snapshot()
+
+    def snapshot(self):
+        '''写入完整快照并清空日志'''
+        tmp_file = self.snapshot_file + ".tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.nodes, f, ensure_ascii=False)
+            os.replace(tmp_file, self.snapshot_file)
+        except Exception as e:
+            logger.error(f"保存邀请链快照失败: {e}")
+            return
+        if self._journal is not None:
+            self._journal.close()
+        # 快照已包含日志中的全部变更
+        self._journal = open(self.journal_file, 'w', encoding='utf-8')
+        self._journal_size = 0
+
+    def close(self):
+        if self._journal_size:
+            self.snapshot()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    # ---------- 变更 ----------
+
+    def _set(self, gid: str, uid: str, info: dict):
+        members = self.nodes.setdefault(gid, {})
+        children = self.children.setdefault(gid, {})
+        old = members.get(uid)
+        if old and old.get('inviter') is not None:
+            children.get(old['inviter'], set()).discard(uid)
+        members[uid] = info
+        if info.get('inviter') is not None:
+            children.setdefault(info['inviter'], set()).add(uid)
+
+    def _apply(self, entry: dict):
+        op, gid, uid = entry['op'], entry['gid'], entry['uid']
+        if op == 'set':
+            self._set(gid, uid, entry['info'])
+        elif op == 'role':
+            if uid in self.nodes.get(gid, {}):
+                self.nodes[gid][uid]['role'] = entry['role']
+        elif op == 'remove':
+            members = self.nodes.get(gid, {})
+            info = members.pop(uid, None)
+            if info and info.get('inviter') is not None:
+                self.children.get(gid, {}).get(info['inviter'], set()).discard(uid)
+            # 被移除成员邀请的人保留邀请关系，仍能通过 descendants 找到
+        else:
+            raise KeyError(op)
+
+    def add_member(self, gid, inviter, invitee, invitee_role: str = 'member', inviter_role: Optional[str] = None):
+        '''
+        记录邀请关系
+
+        参数：
+
+        gid: 群号
+
+        inviter: 邀请人，与 invitee 相同表示没有邀请人
+
+        invitee: 被邀请人
+
+        invitee_role: 被邀请人的群角色
+
+        inviter_role: 邀请人的群角色，邀请人没有记录时用于创建记录
+        '''
+        gid, inviter, invitee = str(gid), str(inviter), str(invitee)
+        now = datetime.datetime.now().isoformat()
+        members = self.nodes.get(gid, {})
+        if inviter != invitee and inviter not in members:
+            self._write({'op': 'set', 'gid': gid, 'uid': inviter,
+                         'info': {'inviter': None, 'invite_time': now, 'role': inviter_role or 'member'}})
+        self._write({'op': 'set', 'gid': gid, 'uid': invitee,
+                     'info': {'inviter': inviter if inviter != invitee else None, 'invite_time': now,
+                              'role': invitee_role}})
+
+    def restore_member(self, gid, uid, info: dict):
+        '''恢复之前移除的成员记录'''
+        self._write({'op': 'set', 'gid': str(gid), 'uid': str(uid), 'info': dict(info)})
+
+    def set_role(self, gid, uid, role: str):
+        '''更新成员的群角色'''
+        gid, uid = str(gid), str(uid)
+        if self.nodes.get(gid, {}).get(uid, {}).get('role') != role and uid in self.nodes.get(gid, {}):
+            self._write({'op': 'role', 'gid': gid, 'uid': uid, 'role': role})
+
+    def remove_member(self, gid, uid) -> Optional[dict]:
+        '''移除成员记录，返回移除前的记录'''
+        gid, uid = str(gid), str(uid)
+        info = self.nodes.get(gid, {}).get(uid)
+        if info is None:
+            return None
+        info = dict(info)
+        self._write({'op': 'remove', 'gid': gid, 'uid': uid})
+        return info
+
+    # ---------- 查询 ----------
+
+    def get(self, gid, uid) -> Optional[dict]:
+        return self.nodes.get(str(gid), {}).get(str(uid))
+
+    def ancestors(self, gid, uid, is_admin: Optional[Callable[[str], bool]] = None) -> List[str]:
+        '''
+        获取用户的邀请链，直到找到群主或管理员为止
+
+        is_admin: 判断成员是否为管理员/群主，默认使用记录中保存的角色
+
+        返回值：
+
+        [用户, 邀请人, 邀请人的邀请人, ...]，最后一个元素是链条中的管理员/群主(如果存在)
+        '''
+        members = self.nodes.get(str(gid), {})
+        chain = [str(uid)]
+        seen = {str(uid)}
+        current = members.get(str(uid))
+        while current and current.get('inviter') is not None:
+            inviter = current['inviter']
+            if inviter in seen or inviter not in members:
+                # 邀请人已退群/数据不完整，或者数据异常出现了环
+                break
+            chain.append(inviter)
+            seen.add(inviter)
+            current = members[inviter]
+            if is_admin(inviter) if is_admin is not None else current.get('role') in ADMIN_ROLES:
+                break
+        return chain
+
+    def descendants(self, gid, uid, stop: Optional[Callable[[str], bool]] = None) -> List[str]:
+        '''
+        获取用户直接或间接邀请的所有成员（不含用户本身），按层次顺序
+
+        stop: 对返回 True 的成员（如管理员）不再继续查找其邀请的成员
+        '''
+        children = self.children.get(str(gid), {})
+        result = []
+        seen = {str(uid)}
+        queue = deque([str(uid)])
+        while queue:
+            for child in children.get(queue.popleft(), ()):
+                if child not in seen:
+                    seen.add(child)
+                    result.append(child)
+                    if stop is None or not stop(child):
+                        queue.append(child)
+        return result
+
+    def depth(self, gid, uid) -> int:
+        '''用户在邀请链中的深度，没有邀请人时为0'''
+        members = self.nodes.get(str(gid), {})
+        depth = 0
+        seen = {str(uid)}
+        current = members.get(str(uid))
+        while current and current.get('inviter') is not None:
+            inviter = current['inviter']
+            if inviter in seen:
+                break
+            seen.add(inviter)
+            depth += 1
+            current = members.get(inviter)
+        return depth
+
+
+invite_graph = InviteGraph(os.path.join(os.path.dirname(os.path.dirname(__file__)), "data"))
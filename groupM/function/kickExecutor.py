@@ -0,0 +1,168 @@
+'''
+批量踢人
+
+连坐踢出时按邀请关系取出整棵子树，并发调用 set_group_kick：
+- 同时进行的请求数和每秒请求数都有上限，避免触发风控
+- 群主、管理员和机器人自己不会被踢出
+- 踢出前先在邀请关系图中移除记录（写入日志），踢出失败时恢复
+- 支持只预览不执行
+'''
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import nonebot
+from nonebot import logger
+
+from .inviteGraph import invite_graph, ADMIN_ROLES
+from .roleCache import role_cache
+
+
+class RateLimiter:
+    '''限制每秒调用次数'''
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class KickReport:
+    '''批量踢人结果'''
+
+    def __init__(self, gid, root, dry_run: bool):
+        self.gid = gid
+        self.root = root
+        self.dry_run = dry_run
+        self.kicked: List[str] = []
+        self.failed: List[Tuple[str, str]] = []
+        # (用户, 原因)
+        self.skipped: List[Tuple[str, str]] = []
+        self.elapsed = 0.0
+
+    @staticmethod
+    def _ids(uids: List[str], limit: int = 20) -> str:
+        text = ", ".join(uids[:limit])
+        return text + f" 等{len(uids)}人" if len(uids) > limit else text
+
+    def summary(self) -> str:
+        if self.dry_run:
+            lines = [f"【连坐踢出预览】以 {self.root} 为起点", f"将踢出 {len(self.kicked)} 人: {self._ids(self.kicked) or '无'}"]
+        else:
+            lines = [f"【连坐踢出结果】以 {self.root} 为起点，用时 {self.elapsed:.1f} 秒",
+                     f"成功 {len(self.kicked)} 人: {self._ids(self.kicked) or '无'}"]
+            if self.failed:
+                lines.append(f"失败 {len(self.failed)} 人: {self._ids([f'{u}({e})' for u, e in self.failed])}")
+        if self.skipped:
+            lines.append(f"跳过 {len(self.skipped)} 人: {self._ids([f'{u}({r})' for u, r in self.skipped])}")
+        return "\n".join(lines)
+
+
+class KickExecutor:
+    '''并发踢人执行器'''
+
+    def __init__(self, concurrency: int = 5, rate: float = 5):
+        '''
+        参数：
+
+        concurrency: 同时进行的请求数
+
+        rate: 每秒最多请求数
+        '''
+        self.concurrency = concurrency
+        self.rate = rate
+
+    async def _roles(self, bot, gid) -> Dict[str, str]:
+        '''全部群成员的角色，来自 roleCache'''
+        members = await role_cache.members(bot, gid)
+        return {str(uid): role for uid, role in members.items()}
+
+    async def plan(self, bot, gid, root) -> Tuple[List[str], List[Tuple[str, str]]]:
+        '''
+        计算需要踢出的成员
+
+        返回值：
+
+        (需要踢出的成员, [(跳过的成员, 原因)])
+        '''
+        roles = await self._roles(bot, gid)
+        self_id = str(bot.self_id)
+        targets, skipped = [], []
+        # 管理员邀请的成员由管理员负责，不再向下连坐
+        subtree = invite_graph.descendants(gid, root, stop=lambda uid: roles.get(uid) in ADMIN_ROLES)
+        for uid in [str(root)] + subtree:
+            role = roles.get(uid)
+            if uid == self_id:
+                skipped.append((uid, "机器人"))
+            elif role is None:
+                skipped.append((uid, "不在群内"))
+            elif role in ADMIN_ROLES:
+                skipped.append((uid, "群主" if role == 'owner' else "管理员"))
+            else:
+                targets.append(uid)
+        return targets, skipped
+
+    async def kick_many(self, bot, gid, uids: List[str], reject_add_request: bool = False,
+                        report: Optional[KickReport] = None) -> KickReport:
+        '''并发踢出多个成员，不检查角色'''
+        report = report or KickReport(gid, uids[0] if uids else None, dry_run=False)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = RateLimiter(self.rate)
+        start = time.monotonic()
+
+        async def kick(uid: str):
+            async with semaphore:
+                await limiter.acquire()
+                # 先记录移除，失败时按日志中的旧记录恢复
+                info = invite_graph.remove_member(gid, uid)
+                try:
+                    await bot.set_group_kick(group_id=int(gid), user_id=int(uid),
+                                             reject_add_request=reject_add_request)
+                except Exception as e:
+                    if info is not None:
+                        invite_graph.restore_member(gid, uid, info)
+                    report.failed.append((uid, str(e) or type(e).__name__))
+                    logger.warning(f"在群 {gid} 踢出 {uid} 失败: {e}")
+                else:
+                    role_cache.remove_member(gid, uid)
+                    report.kicked.append(uid)
+
+        await asyncio.gather(*(kick(uid) for uid in uids))
+        report.elapsed = time.monotonic() - start
+        return report
+
+    async def kick_subtree(self, gid, root, reject_add_request: bool = False, dry_run: bool = False) -> KickReport:
+        '''
+        踢出用户及其直接或间接邀请的所有成员
+
+        参数：
+
+        gid: 群号
+
+        root: 起点用户
+
+        reject_add_request: 是否拉黑
+
+        dry_run: 只预览，不执行
+        '''
+        bot = nonebot.get_bot()
+        report = KickReport(gid, str(root), dry_run)
+        targets, report.skipped = await self.plan(bot, gid, root)
+        if dry_run:
+            report.kicked = targets
+            return report
+        await self.kick_many(bot, gid, targets, reject_add_request, report)
+        state = "，已拉黑" if reject_add_request else ""
+        logger.info(f"在群 {gid} 连坐踢出 {len(report.kicked)} 人{state}，失败 {len(report.failed)} 人")
+        return report
+
+
+kick_executor = KickExecutor()
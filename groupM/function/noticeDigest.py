@@ -0,0 +1,126 @@
+'''
+群成员变动通知合并
+
+普通成员的入群/退群/被移除通知按群缓存一段时间，之后合并成一条消息发送到审核群：
+- 窗口内只有一条通知时，原样发送该通知
+- 单个群缓存的通知达到上限时立即发送，不等待窗口结束
+- 机器人自己被邀请/移出等通知不经过这里，由调用方直接发送
+'''
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from nonebot import logger
+
+JOIN_APPROVE = "approve"
+JOIN_INVITE = "invite"
+LEAVE = "leave"
+KICK = "kick"
+
+
+class MemberNotice:
+    '''单条成员变动通知'''
+
+    __slots__ = ('kind', 'user_id', 'operator_id', 'message')
+
+    def __init__(self, kind: str, user_id, operator_id, message: str):
+        self.kind = kind
+        self.user_id = user_id
+        self.operator_id = operator_id
+        self.message = message
+
+
+class NoticeDigest:
+    '''按群合并成员变动通知'''
+
+    def __init__(self, send: Callable[[int, str], Awaitable], window: float = 10, max_batch: int = 100,
+                 list_limit: int = 30):
+        '''
+        参数：
+
+        send: 发送函数，参数为 (群号, 消息)
+
+        window: 合并窗口，单位秒，从该群第一条通知开始计算
+
+        max_batch: 单个群缓存的通知达到该数量时立即发送
+
+        list_limit: 每类通知最多列出的成员数量
+        '''
+        self.send = send
+        self.window = window
+        self.max_batch = max_batch
+        self.list_limit = list_limit
+        self._buffers: Dict[int, List[MemberNotice]] = {}
+        self._started: Dict[int, float] = {}
+        self._timers: Dict[int, asyncio.Task] = {}
+        # 达到上限后立即发送的任务，保留引用避免被回收，关闭时等待完成
+        self._sending: Set[asyncio.Task] = set()
+
+    def add(self, gid, kind: str, user_id, operator_id, message: str):
+        '''缓存一条成员变动通知，message 为只有这一条通知时发送的内容'''
+        gid = int(gid)
+        buffer = self._buffers.setdefault(gid, [])
+        buffer.append(MemberNotice(kind, user_id, operator_id, message))
+        if len(buffer) == 1:
+            self._started[gid] = time.time()
+            self._timers[gid] = asyncio.create_task(self._flush_later(gid))
+        elif len(buffer) >= self.max_batch:
+            # 先取出缓存，之后的通知进入新的窗口
+            task = asyncio.create_task(self._send(gid, self._take(gid)))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _flush_later(self, gid: int):
+        await asyncio.sleep(self.window)
+        await self.flush(gid)
+
+    def _take(self, gid: int) -> Optional[str]:
+        '''取出该群缓存的通知并生成消息，没有通知时返回 None'''
+        timer = self._timers.pop(gid, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        notices = self._buffers.pop(gid, None)
+        started = self._started.pop(gid, None)
+        if not notices:
+            return None
+        return notices[0].message if len(notices) == 1 else self.render(gid, notices, started)
+
+    async def flush(self, gid: int):
+        '''立即发送该群缓存的通知'''
+        await self._send(gid, self._take(gid))
+
+    async def _send(self, gid: int, message: Optional[str]):
+        if message is None:
+            return
+        try:
+            await self.send(gid, message)
+        except Exception as e:
+            logger.error(f"发送群 {gid} 成员变动通知失败: {e}")
+
+    async def close(self):
+        '''发送所有缓存的通知，并等待正在发送的通知完成，关闭时调用'''
+        for gid in list(self._buffers):
+            await self.flush(gid)
+        if self._sending:
+            await asyncio.gather(*self._sending)
+
+    def _ids(self, items: List[str]) -> str:
+        text = ", ".join(items[:self.list_limit])
+        return text + f" 等{len(items)}人" if len(items) > self.list_limit else text
+
+    def render(self, gid: int, notices: List[MemberNotice], started: Optional[float] = None) -> str:
+        '''生成合并后的通知'''
+        joined = [n for n in notices if n.kind in (JOIN_APPROVE, JOIN_INVITE)]
+        left = [n for n in notices if n.kind == LEAVE]
+        kicked = [n for n in notices if n.kind == KICK]
+        lines = ["【群成员变动汇总】", f"群号: {gid}"]
+        if started is not None:
+            lines.append(f"时间: {time.strftime('%H:%M:%S', time.localtime(started))} 起 {self.window:.0f} 秒内")
+        if joined:
+            lines.append(f"新成员 {len(joined)} 人: " + self._ids([
+                f"{n.user_id}({'审核同意' if n.kind == JOIN_APPROVE else f'{n.operator_id}邀请'})" for n in joined]))
+        if left:
+            lines.append(f"退群 {len(left)} 人: " + self._ids([str(n.user_id) for n in left]))
+        if kicked:
+            lines.append(f"被移除 {len(kicked)} 人: " + self._ids([f"{n.user_id}(操作人 {n.operator_id})" for n in kicked]))
+        return "\n".join(lines)
@@ -0,0 +1,235 @@
+'''
+待审核请求索引
+
+每个请求在收到时格式化一次，之后查看列表只拼接缓存好的文本：
+- block: 合并转发中每个请求的消息内容
+- line:  查看入群审核/查看好友审核 中的文本
+同时按 时间、类型、群 三种顺序维护有序列表，新增/删除请求只做一次二分插入/删除。
+
+分页使用游标（上一页最后一个请求的排序键），翻页期间有请求被处理也不会跳过或重复。
+'''
+import bisect
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 请求类型
+TYPE_ADD = 'group_add'
+TYPE_INVITE = 'group_invite'
+TYPE_FRIEND = 'friend'
+TYPE_NAMES = {TYPE_ADD: "入群", TYPE_INVITE: "邀请", TYPE_FRIEND: "好友"}
+# 按类型排序时的先后顺序
+TYPE_ORDER = {TYPE_ADD: 0, TYPE_INVITE: 1, TYPE_FRIEND: 2}
+
+SORT_TIME = "时间"
+SORT_TYPE = "类型"
+SORT_GROUP = "群"
+SORTS = (SORT_TIME, SORT_TYPE, SORT_GROUP)
+
+PAGE_SIZE = 10
+
+
+class RequestEntry:
+    '''单个请求及其缓存的显示文本'''
+
+    __slots__ = ('flag', 'type', 'info', 'time', 'group_id', 'name', 'block', 'line', 'keys')
+
+    def __init__(self, flag: str, info: dict, type_: str):
+        self.flag = flag
+        self.type = type_
+        self.info = info
+        self.time = int(info.get('time') or 0)
+        group_id = info.get('group_id')
+        self.group_id = str(group_id) if group_id is not None else None
+        time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.time))
+
+        if type_ == TYPE_FRIEND:
+            self.name = "好友申请"
+            head = f"【好友申请】\n申请人: {info['user_id']}\n验证信息: {info['comment']}"
+            self.line = (
+                f"请求标识: {flag}\n"
+                f"申请人: {info['user_id']}\n"
+                f"验证信息: {info['comment']}\n"
+                f"申请时间: {time_str}\n"
+            )
+        else:
+            self.name = "入群申请"
+            if type_ == TYPE_INVITE:
+                head = f"【群聊邀请】\n邀请人: {info['user_id']}\n目标群组: {info['group_id']}"
+            else:
+                head = f"【入群申请】\n申请人: {info['user_id']}\n目标群组: {info['group_id']}\n验证信息: {info['comment']}"
+            self.line = (
+                f"请求标识: {flag}\n"
+                f"申请人: {info['user_id']}\n"
+                f"目标群组: {info['group_id']}\n"
+                f"验证信息: {info['comment']}\n"
+                f"申请时间: {time_str}\n"
+            )
+        self.block = (
+            f"{head}\n"
+            f"请求标识: {flag}\n"
+            f"申请时间: {time_str}\n\n"
+            f"回复「同意 {flag}」或「拒绝 {flag} 原因」处理"
+        )
+
+        group_key = int(self.group_id) if self.group_id and self.group_id.isdigit() else 0
+        self.keys = {
+            SORT_TIME: (self.time, flag),
+            SORT_TYPE: (TYPE_ORDER.get(type_, 9), self.time, flag),
+            SORT_GROUP: (group_key, self.time, flag),
+        }
+
+
+def request_type(info: dict, type_: Optional[str] = None) -> str:
+    '''获取请求类型，兼容没有记录类型的旧数据'''
+    if type_:
+        return type_
+    if info.get('type') == 'friend' or 'group_id' not in info:
+        return TYPE_FRIEND
+    return TYPE_INVITE if info.get('sub_type') == 'invite' else TYPE_ADD
+
+
+class ListQuery:
+    '''一次列表查询的条件和翻页位置'''
+
+    def __init__(self, sort: str = SORT_TIME, types: Optional[Set[str]] = None, group_id: Optional[str] = None,
+                 size: int = PAGE_SIZE):
+        self.sort = sort
+        self.types = types
+        self.group_id = group_id
+        self.size = size
+        self.page_no = 1
+        # 每一页开始前的游标，第一页为 None
+        self.history: List[Optional[tuple]] = [None]
+        # 当前页最后一个请求的排序键
+        self.last: Optional[tuple] = None
+
+    def match(self, entry: RequestEntry) -> bool:
+        if self.types is not None and entry.type not in self.types:
+            return False
+        if self.group_id is not None and entry.group_id != self.group_id:
+            return False
+        return True
+
+    def describe(self) -> str:
+        parts = [f"按{self.sort}排序"]
+        if self.types is not None:
+            parts.append("/".join(TYPE_NAMES[t] for t in self.types))
+        if self.group_id is not None:
+            parts.append(f"群 {self.group_id}")
+        return "，".join(parts)
+
+
+class RequestIndex:
+    '''待审核请求索引'''
+
+    def __init__(self):
+        self.entries: Dict[str, RequestEntry] = {}
+        self._orders: Dict[str, List[tuple]] = {sort: [] for sort in SORTS}
+
+    def rebuild(self, items: Iterable[Tuple[str, dict, str]]):
+        '''从 (flag, info, type) 重新建立索引，启动时调用'''
+        self.entries = {flag: RequestEntry(flag, info, type_) for flag, info, type_ in items}
+        for sort in SORTS:
+            self._orders[sort] = sorted(entry.keys[sort] for entry in self.entries.values())
+
+    def add(self, flag: str, info: dict, type_: str):
+        self.remove(flag)
+        entry = RequestEntry(flag, info, type_)
+        self.entries[flag] = entry
+        for sort in SORTS:
+            bisect.insort(self._orders[sort], entry.keys[sort])
+
+    def remove(self, flag: str):
+        entry = self.entries.pop(flag, None)
+        if entry is None:
+            return
+        for sort in SORTS:
+            order = self._orders[sort]
+            i = bisect.bisect_left(order, entry.keys[sort])
+            if i < len(order) and order[i] == entry.keys[sort]:
+                del order[i]
+
+    def older_than(self, timestamp: float, types: Optional[Set[str]] = None) -> List[str]:
+        '''收到时间早于 timestamp 的请求标识'''
+        order = self._orders[SORT_TIME]
+        end = bisect.bisect_left(order, (timestamp,))
+        flags = [key[-1] for key in order[:end]]
+        if types is not None:
+            flags = [flag for flag in flags if self.entries[flag].type in types]
+        return flags
+
+    def count(self, query: ListQuery) -> int:
+        if query.types is None and query.group_id is None:
+            return len(self.entries)
+        return sum(1 for entry in self.entries.values() if query.match(entry))
+
+    def counts(self) -> Dict[str, int]:
+        '''各类型的请求数量'''
+        result = {type_: 0 for type_ in TYPE_ORDER}
+        for entry in self.entries.values():
+            result[entry.type] = result.get(entry.type, 0) + 1
+        return result
+
+    def page(self, query: ListQuery, after: Optional[tuple] = None, offset: int = 0) -> Tuple[List[RequestEntry], bool]:
+        '''
+        获取一页请求
+
+        参数：
+
+        after: 游标，从排序键大于该值的请求开始
+
+        offset: 从游标开始跳过的请求数，用于按页码跳转
+
+        返回值：
+
+        (本页请求, 是否还有下一页)
+        '''
+        order = self._orders[query.sort]
+        start = bisect.bisect_right(order, after) if after is not None else 0
+        result: List[RequestEntry] = []
+        for key in order[start:] if start else order:
+            entry = self.entries[key[-1]]
+            if not query.match(entry):
+                continue
+            if offset:
+                offset -= 1
+                continue
+            if len(result) == query.size:
+                return result, True
+            result.append(entry)
+        return result, False
+
+    def show(self, query: ListQuery, page_no: Optional[int] = None, step: int = 0) -> Tuple[List[RequestEntry], bool]:
+        '''
+        按查询条件显示指定页，并更新 query 中的翻页位置
+
+        page_no: 跳转到指定页码
+
+        step: 1 为下一页，-1 为上一页，0 为重新显示当前页
+        '''
+        if page_no is not None:
+            after, offset = None, (max(page_no, 1) - 1) * query.size
+            query.page_no, query.history = max(page_no, 1), [None]
+        elif step > 0:
+            after, offset = query.last, 0
+            query.page_no += 1
+            query.history.append(after)
+        elif step < 0 and len(query.history) > 1:
+            query.history.pop()
+            after, offset = query.history[-1], 0
+            query.page_no -= 1
+        elif step < 0:
+            # 通过页码跳转后没有之前的游标，退回按页码计算
+            query.page_no = max(query.page_no - 1, 1)
+            after, offset = None, (query.page_no - 1) * query.size
+        else:
+            after, offset = query.history[-1], 0
+
+        entries, has_more = self.page(query, after, offset)
+        if page_no is not None and entries and offset:
+            # 以本页第一个请求之前的位置作为游标，之后翻页不再依赖页码
+            i = bisect.bisect_left(self._orders[query.sort], entries[0].keys[query.sort])
+            query.history = [self._orders[query.sort][i - 1] if i > 0 else None]
+        if entries:
+            query.last = entries[-1].keys[query.sort]
+        return entries, has_more
@@ -0,0 +1,92 @@
+'''
+群成员角色缓存
+
+按群缓存 {成员: 角色}：
+- 第一次查询或缓存过期时用 get_group_member_list 一次加载整个群，同一个群同时只加载一次
+- 管理员变更、成员增加/减少通知到达时直接更新缓存
+- 缓存中没有的成员（如刚入群、通知还没到）单独调用 get_group_member_info
+'''
+import asyncio
+import time
+from typing import Dict, Optional
+
+from nonebot import logger
+
+
+class RoleCache:
+    '''群成员角色缓存'''
+
+    def __init__(self, ttl: float = 30 * 60):
+        '''
+        参数：
+
+        ttl: 整个群重新加载的间隔，单位秒
+        '''
+        self.ttl = ttl
+        self._roles: Dict[int, Dict[int, str]] = {}
+        self._loaded_at: Dict[int, float] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    def _is_fresh(self, gid: int) -> bool:
+        loaded_at = self._loaded_at.get(gid)
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+
+    async def _ensure_loaded(self, bot, gid: int):
+        if self._is_fresh(gid):
+            return
+        lock = self._locks.setdefault(gid, asyncio.Lock())
+        async with lock:
+            # 等待期间其他调用可能已经加载完成
+            if self._is_fresh(gid):
+                return
+            members = await bot.get_group_member_list(group_id=gid)
+            self._roles[gid] = {int(m['user_id']): m.get('role', 'member') for m in members}
+            self._loaded_at[gid] = time.monotonic()
+            logger.debug(f"已加载群 {gid} 的 {len(members)} 名成员角色")
+
+    async def members(self, bot, gid) -> Dict[int, str]:
+        '''获取整个群的 {成员: 角色}'''
+        gid = int(gid)
+        await self._ensure_loaded(bot, gid)
+        return self._roles.get(gid, {})
+
+    async def get_role(self, bot, gid, uid) -> str:
+        '''
+        获取成员角色
+
+        返回值：
+
+        owner, admin, member
+        '''
+        gid, uid = int(gid), int(uid)
+        await self._ensure_loaded(bot, gid)
+        role = self._roles.get(gid, {}).get(uid)
+        if role is None:
+            result = await bot.get_group_member_info(group_id=gid, user_id=uid)
+            role = result['role']
+            self._roles.setdefault(gid, {})[uid] = role
+        return role
+
+    def peek(self, gid, uid) -> Optional[str]:
+        '''只查询缓存，不调用接口'''
+        return self._roles.get(int(gid), {}).get(int(uid))
+
+    # ---------- 通知更新 ----------
+
+    def set_role(self, gid, uid, role: str):
+        if int(gid) in self._roles:
+            self._roles[int(gid)][int(uid)] = role
+
+    def add_member(self, gid, uid, role: str = 'member'):
+        self.set_role(gid, uid, role)
+
+    def remove_member(self, gid, uid):
+        self._roles.get(int(gid), {}).pop(int(uid), None)
+
+    def invalidate(self, gid):
+        '''丢弃整个群的缓存，如机器人退群'''
+        self._roles.pop(int(gid), None)
+        self._loaded_at.pop(int(gid), None)
+
+
+role_cache = RoleCache()
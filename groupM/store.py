@@ -0,0 +1,259 @@
+'''
+审核请求持久化存储
+
+使用 SQLite (WAL 模式) 保存待审核请求、审核消息映射和请求类型，
+每次新增或处理请求只写入相关的几行，并在同一个事务中完成，
+三张表不会出现互相不一致的情况。
+
+表结构:
+- requests: 待审核请求，flag 为主键，audit_group 为请求发送到的审核群
+- message_map: 审核消息ID -> flag
+- flag_types: flag -> 请求类型 (group_add / group_invite / friend)
+- meta: 内部状态，如是否已导入旧版本的JSON文件
+'''
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from nonebot import logger
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS requests (
+    flag       TEXT PRIMARY KEY,
+    kind       TEXT NOT NULL,          -- group / friend
+    user_id    INTEGER,
+    group_id   TEXT,
+    comment    TEXT,
+    time       INTEGER,
+    message_id INTEGER,
+    sub_type   TEXT,
+    audit_group INTEGER                -- 审核消息所在的群
+);
+CREATE INDEX IF NOT EXISTS idx_requests_kind_time ON requests (kind, time);
+CREATE INDEX IF NOT EXISTS idx_requests_group ON requests (group_id);
+
+CREATE TABLE IF NOT EXISTS message_map (
+    message_id INTEGER PRIMARY KEY,
+    flag       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_message_map_flag ON message_map (flag);
+
+CREATE TABLE IF NOT EXISTS flag_types (
+    flag TEXT PRIMARY KEY,
+    type TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+# 旧版本使用的JSON文件
+LEGACY_FILES = {
+    "requests": "pending_requests.json",
+    "friend_requests": "pending_friend_requests.json",
+    "message_map": "message_to_flag.json",
+    "flag_type": "flag_type.json",
+}
+
+
+class RequestStore:
+    '''审核请求存储'''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL 模式下 NORMAL 已能保证崩溃后数据库一致
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._upgrade()
+
+    def _upgrade(self):
+        '''为旧版本创建的数据库补充新增的列'''
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(requests)")}
+        if "audit_group" not in columns:
+            self._conn.execute("ALTER TABLE requests ADD COLUMN audit_group INTEGER")
+
+    def close(self):
+        self._conn.close()
+
+    def _transaction(self):
+        '''开启写事务，配合 with 使用，异常时自动回滚'''
+        return _Transaction(self._conn)
+
+    @staticmethod
+    def _row_to_info(row: sqlite3.Row) -> dict:
+        '''还原为旧版本JSON中的请求格式'''
+        if row["kind"] == "friend":
+            info = {
+                'user_id': row["user_id"],
+                'comment': row["comment"],
+                'time': row["time"],
+                'message_id': row["message_id"],
+                'type': 'friend',
+            }
+        else:
+            info = {
+                'user_id': row["user_id"],
+                'group_id': row["group_id"],
+                'comment': row["comment"],
+                'time': row["time"],
+                'message_id': row["message_id"],
+                'sub_type': row["sub_type"] or 'add',
+            }
+        if row["audit_group"] is not None:
+            info['audit_group'] = row["audit_group"]
+        return info
+
+    def load(self) -> Tuple[Dict[str, Dict], Dict[str, Dict], Dict[int, str], Dict[str, str]]:
+        '''
+        读取全部数据
+
+        返回值:
+        (入群请求, 好友请求, 消息ID到flag的映射, 请求类型)
+        '''
+        requests, friend_requests = {}, {}
+        for row in self._conn.execute("SELECT * FROM requests ORDER BY time, rowid"):
+            target = friend_requests if row["kind"] == "friend" else requests
+            target[row["flag"]] = self._row_to_info(row)
+        message_map = {row["message_id"]: row["flag"] for row in self._conn.execute("SELECT * FROM message_map")}
+        flag_type = {row["flag"]: row["type"] for row in self._conn.execute("SELECT * FROM flag_types")}
+        return requests, friend_requests, message_map, flag_type
+
+    def add(self, flag: str, kind: str, info: dict, type_: str):
+        '''
+        新增待审核请求，同时写入消息映射和请求类型
+
+        参数:
+        flag: 请求标识
+        kind: group 或 friend
+        info: 请求信息
+        type_: 请求类型
+        '''
+        message_id = info.get('message_id')
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO requests"
+                " (flag, kind, user_id, group_id, comment, time, message_id, sub_type, audit_group)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (flag, kind, info.get('user_id'), info.get('group_id'), info.get('comment'),
+                 info.get('time'), message_id, info.get('sub_type'), info.get('audit_group')),
+            )
+            if message_id is not None:
+                conn.execute("INSERT OR REPLACE INTO message_map (message_id, flag) VALUES (?, ?)", (message_id, flag))
+            conn.execute("INSERT OR REPLACE INTO flag_types (flag, type) VALUES (?, ?)", (flag, type_))
+
+    def remove(self, flag: str):
+        '''删除请求及其消息映射和请求类型'''
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM requests WHERE flag = ?", (flag,))
+            conn.execute("DELETE FROM message_map WHERE flag = ?", (flag,))
+            conn.execute("DELETE FROM flag_types WHERE flag = ?", (flag,))
+
+    def remove_many(self, flags: List[str]):
+        '''在同一个事务中删除多个请求'''
+        params = [(flag,) for flag in flags]
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM requests WHERE flag = ?", params)
+            conn.executemany("DELETE FROM message_map WHERE flag = ?", params)
+            conn.executemany("DELETE FROM flag_types WHERE flag = ?", params)
+
+    def prune_orphans(self) -> Tuple[int, int]:
+        '''
+        删除没有对应请求的消息映射和请求类型
+
+        返回值:
+        (删除的消息映射数量, 删除的请求类型数量)
+        '''
+        with self._transaction() as conn:
+            messages = conn.execute(
+                "DELETE FROM message_map WHERE flag NOT IN (SELECT flag FROM requests)").rowcount
+            types = conn.execute(
+                "DELETE FROM flag_types WHERE flag NOT IN (SELECT flag FROM requests)").rowcount
+        return messages, types
+
+    def compact(self, vacuum_ratio: float = 0.25) -> bool:
+        '''
+        整理数据库文件
+
+        把 WAL 日志合并回数据库并截断，空闲页超过 vacuum_ratio 时再执行 VACUUM，
+        返回是否执行了 VACUUM
+        '''
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        pages = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        free = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not pages or free / pages < vacuum_ratio:
+            return False
+        self._conn.execute("VACUUM")
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return True
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def migrate_json(self, data_dir: str) -> int:
+        '''
+        从旧版本的JSON文件导入数据
+
+        只导入一次，导入记录与数据在同一个事务中写入，返回导入的请求数量
+        '''
+        if self.get_meta("json_migrated"):
+            return 0
+        paths = {key: os.path.join(data_dir, name) for key, name in LEGACY_FILES.items()}
+
+        def read(key: str) -> dict:
+            try:
+                with open(paths[key], "r", encoding="utf-8") as f:
+                    return json.load(f) or {}
+            except FileNotFoundError:
+                return {}
+            except Exception as e:
+                logger.error(f"读取旧版审核数据 {paths[key]} 失败: {e}")
+                return {}
+
+        requests, friend_requests = read("requests"), read("friend_requests")
+        message_map, flag_type = read("message_map"), read("flag_type")
+
+        with self._transaction() as conn:
+            for kind, items in (("group", requests), ("friend", friend_requests)):
+                for flag, info in items.items():
+                    message_id = info.get('message_id')
+                    conn.execute(
+                        "INSERT OR REPLACE INTO requests (flag, kind, user_id, group_id, comment, time, message_id, sub_type)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (flag, kind, info.get('user_id'), info.get('group_id'), info.get('comment'),
+                         info.get('time'), int(message_id) if message_id is not None else None, info.get('sub_type')),
+                    )
+            for message_id, flag in message_map.items():
+                conn.execute("INSERT OR REPLACE INTO message_map (message_id, flag) VALUES (?, ?)", (int(message_id), flag))
+            for flag, type_ in flag_type.items():
+                conn.execute("INSERT OR REPLACE INTO flag_types (flag, type) VALUES (?, ?)", (flag, type_))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', '1')")
+
+        count = len(requests) + len(friend_requests)
+        if count:
+            logger.info(f"已从JSON文件迁移 {count} 条审核请求")
+        return count
+
+
+class _Transaction:
+    '''BEGIN IMMEDIATE ... COMMIT，异常时 ROLLBACK'''
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb) -> Optional[bool]:
+        if exc_type is None:
+            self._conn.execute("COMMIT")
+        else:
+            self._conn.execute("ROLLBACK")
+        return None
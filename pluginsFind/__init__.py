@@ -4,12 +4,17 @@ from nonebot.plugin import Plugin, PluginMetadata
 from nonebot.adapters.onebot.v11 import MessageEvent, Message, MessageSegment
 from nonebot import on_command
 from nonebot.params import CommandArg
-from typing import Dict, List, Optional, Tuple, Set
+from typing import Optional
 import os
 from nonebot.rule import to_me
 
 from pathlib import Path
 from nonebot.permission import SUPERUSER
+from nonebot.matcher import Matcher
+from nonebot.message import run_preprocessor, run_postprocessor
+from .catalog import PluginCatalog, format_search_results
+from .matchers import UsageStats, format_hot_paths, format_matcher_table
+from .search import best_match
 
 '''
 完成"获取插件的帮助信息"的计划
@@ -60,11 +65,12 @@ __plugin_meta__ = PluginMetadata(
     - /菜单: 获取所有的插件列表
     
     查询具体插件:
-    - /菜单 <插件名称>: 查询指定插件的详细信息
+    - /菜单 <插件名称>: 查询指定插件的详细信息，支持命令、关键词和拼音首字母搜索，例如 /菜单 ctf、/菜单 wj
     
     超级用户命令:
     - /屏蔽插件 <插件名称>: 将插件从列表中隐藏
     - /取消屏蔽 <插件名称>: 将插件恢复显示
+    - /命令统计: 查看各命令的调用次数和耗时，按累计耗时排列
     """,
     type="application",
     homepage="https://github.com/CG-Jue/NoneBotPlugins",
@@ -82,172 +88,26 @@ HIDDEN_PLUGINS_FILE = Path(os.path.dirname(os.path.abspath(__file__))) / "hidden
 findplugins = on_command("/菜单", priority=1, block=True, rule=to_me())
 hide_plugin = on_command("/屏蔽插件", permission=SUPERUSER, priority=1, block=True)
 show_plugin = on_command("/取消屏蔽", permission=SUPERUSER, priority=1, block=True)
+command_stats = on_command("/命令统计", permission=SUPERUSER, priority=1, block=True)
 
-def get_hidden_plugins() -> Set[str]:
-    """
-    获取屏蔽的插件列表
-    :return: 屏蔽插件名称集合
-    """
-    hidden_plugins = set()
-    if HIDDEN_PLUGINS_FILE.exists():
-        try:
-            with open(HIDDEN_PLUGINS_FILE, "r", encoding="utf-8") as f:
-                for line in f:
-                    plugin = line.strip()
-                    if plugin:
-                        hidden_plugins.add(plugin)
-        except Exception as e:
-            logger.error(f"读取屏蔽插件列表失败: {e}")
-    return hidden_plugins
+# 插件目录，启动后建立一次
+catalog = PluginCatalog(HIDDEN_PLUGINS_FILE)
 
-def save_hidden_plugins(hidden_plugins: Set[str]) -> bool:
-    """
-    保存屏蔽的插件列表
-    :param hidden_plugins: 屏蔽插件名称集合
-    :return: 是否保存成功
-    """
-    try:
-        with open(HIDDEN_PLUGINS_FILE, "w", encoding="utf-8") as f:
-            for plugin in hidden_plugins:
-                f.write(f"{plugin}\n")
-        return True
-    except Exception as e:
-        logger.error(f"保存屏蔽插件列表失败: {e}")
-        return False
+@nonebot.get_driver().on_startup
+async def build_catalog():
+    # 启动时所有插件都已加载完成
+    catalog.build()
 
-def build_plugin_mapping() -> Dict[str, str]:
-    """
-    建立插件显示名称和插件ID的映射关系
-    :return: 名称到插件ID的映射字典
-    """
-    mapping = {}
-    plugin_ids = nonebot.get_available_plugin_names()
-    
-    for plugin_id in plugin_ids:
-        plugin = nonebot.get_plugin(str(plugin_id))
-        if plugin and plugin.metadata:
-            # 如果插件有元数据，则使用元数据中的name作为显示名称
-            mapping[plugin.metadata.name] = plugin_id
-            
-    return mapping
-
-def get_plugin_list() -> List[Dict[str, str]]:
-    """
-    获取所有带元数据的插件列表（排除被屏蔽的插件）
-    :return: 插件列表，每个元素包含名称和描述
-    """
-    plugin_list = []
-    plugin_ids = nonebot.get_available_plugin_names()
-    hidden_plugins = get_hidden_plugins()
-    
-    for plugin_id in plugin_ids:
-        plugin = nonebot.get_plugin(str(plugin_id))
-        if plugin and plugin.metadata:
-            # 排除被屏蔽的插件
-            if plugin.metadata.name not in hidden_plugins:
-                plugin_list.append({
-                    "name": plugin.metadata.name,
-                    "description": plugin.metadata.description
-                })
-            
-    return plugin_list
+# 事件响应器的调用统计
+usage_stats = UsageStats()
 
-def get_all_plugin_list() -> List[Dict[str, str]]:
-    """
-    获取所有带元数据的插件列表（包括被屏蔽的插件）
-    :return: 完整插件列表，每个元素包含名称、描述和屏蔽状态
-    """
-    plugin_list = []
-    plugin_ids = nonebot.get_available_plugin_names()
-    hidden_plugins = get_hidden_plugins()
-    
-    for plugin_id in plugin_ids:
-        plugin = nonebot.get_plugin(str(plugin_id))
-        if plugin and plugin.metadata:
-            is_hidden = plugin.metadata.name in hidden_plugins
-            plugin_list.append({
-                "name": plugin.metadata.name,
-                "description": plugin.metadata.description,
-                "is_hidden": is_hidden
-            })
-            
-    return plugin_list
+@run_preprocessor
+async def record_matcher_start(matcher: Matcher):
+    usage_stats.start(matcher)
 
-def get_plugin_detail(plugin_name: str) -> Optional[Dict[str, str]]:
-    """
-    获取指定插件的详细信息，只能通过元数据中的name字段精确匹配
-    :param plugin_name: 插件名称（必须是元数据中的name）
-    :return: 插件详细信息，如果未找到插件则返回None
-    """
-    mapping = build_plugin_mapping()
-    
-    # 只通过name精确匹配，不再尝试通过插件ID或模糊匹配查询
-    if plugin_name in mapping:
-        plugin_id = mapping[plugin_name]
-        plugin = nonebot.get_plugin(plugin_id)
-        
-        if plugin and plugin.metadata:
-            return {
-                "name": plugin.metadata.name,
-                "description": plugin.metadata.description,
-                "usage": plugin.metadata.usage,
-                "type": plugin.metadata.type,
-                "extra": plugin.metadata.extra if plugin.metadata.extra else {}
-            }
-    
-    return None
-
-def format_plugin_list(plugin_list: List[Dict[str, str]]) -> str:
-    """
-    格式化插件列表为简洁易读的字符串
-    :param plugin_list: 插件列表
-    :return: 格式化后的字符串
-    """
-    if not plugin_list:
-        return "暂无可用插件信息"
-    
-    result = f"已安装的插件列表 | 共{len(plugin_list)} 个\n\n"
-    for i, plugin in enumerate(plugin_list, start=1):
-        # result += f"{i}. {plugin['name']} - {plugin['description']}\n"
-        result += f"{i}. {plugin['name']}\n"
-    
-    result += "\n详细用法➡️「/插件信息 插件名」"
-    
-    return result
-
-def format_all_plugin_list(plugin_list: List[Dict[str, str]]) -> str:
-    """
-    格式化所有插件列表，包括被屏蔽的插件，专供超级用户使用
-    :param plugin_list: 插件列表
-    :return: 格式化后的字符串
-    """
-    if not plugin_list:
-        return "暂无可用插件信息"
-    
-    visible_count = sum(1 for plugin in plugin_list if not plugin['is_hidden'])
-    hidden_count = len(plugin_list) - visible_count
-    
-    result = f"已安装的插件列表 (总计 {len(plugin_list)} 个，其中 {visible_count} 个可见，{hidden_count} 个已屏蔽)：\n\n"
-    
-    for i, plugin in enumerate(plugin_list, start=1):
-        status = "🔒" if plugin['is_hidden'] else "✅" 
-        result += f"{i}. {status} {plugin['name']} - {plugin['description']}\n"
-    
-    result += f"\n详细用法➡️「/菜单 插件名」"
-    
-    return result
-
-def format_plugin_detail(plugin_info: Dict[str, str]) -> str:
-    """
-    格式化插件详情为简洁易读的字符串
-    :param plugin_info: 插件详情
-    :return: 格式化后的字符串
-    """
-    result = f"【{plugin_info['name']}】\n"
-    result += f"{plugin_info['description']}\n\n"
-    result += f"使用方法:\n{plugin_info['usage']}"
-    
-    return result
+@run_postprocessor
+async def record_matcher_finish(matcher: Matcher, exception: Optional[Exception]):
+    usage_stats.finish(matcher, exception)
 
 @findplugins.handle()
 async def handle_findplugins(event: MessageEvent, args: Message = CommandArg()):
@@ -262,43 +122,53 @@ async def handle_findplugins(event: MessageEvent, args: Message = CommandArg()):
     
     # 判断是否为超级用户
     is_superuser = str(event.user_id) in nonebot.get_driver().config.superusers
-    hidden_plugins = get_hidden_plugins()
     
     # 如果没有输入插件名称，则返回插件列表
     if not plugin_name:
-        if is_superuser:
-            # 超级用户可以看到所有插件，包括被屏蔽的
-            all_plugins = get_all_plugin_list()
-            result = format_all_plugin_list(all_plugins)
-        else:
-            # 普通用户只能看到未被屏蔽的插件
-            plugin_list = get_plugin_list()
-            result = format_plugin_list(plugin_list)
-        await findplugins.finish(result)
-    
-    # 根据输入的插件名查找插件详情
-    plugin_info = get_plugin_detail(plugin_name)
+        # 超级用户可以看到所有插件，包括被屏蔽的；列表已预先格式化
+        await findplugins.finish(catalog.list_text(superuser=is_superuser))
+    
+    # 根据输入的插件名查找插件详情，名称不完全一致时模糊搜索
+    entry = catalog.get(plugin_name)
+    if not entry:
+        results = catalog.search(plugin_name, superuser=is_superuser)
+        best = best_match([(score, e.name) for score, e in results])
+        if best:
+            entry = catalog.entries[best]
+        elif results:
+            # 有多个差不多的结果，让用户选择
+            await findplugins.finish(format_search_results([e for _, e in results]))
     
     # 如果找到了插件信息
-    if plugin_info:
+    if entry:
         # 检查插件是否被屏蔽
-        if plugin_info["name"] in hidden_plugins:
+        if catalog.is_hidden(entry.name):
             # 对于非超级用户，被屏蔽的插件不可见
             if not is_superuser:
                 await findplugins.finish(f"未找到插件「{plugin_name}」的信息.")
             else:
                 # 超级用户可以看到被屏蔽的插件信息
-                result = format_plugin_detail(plugin_info)
-                result += "\n\n[⚠️] 此插件已被屏蔽，普通用户无法查看"
-                await findplugins.finish(result)
+                await findplugins.finish(superuser_detail(entry) + "\n\n[⚠️] 此插件已被屏蔽，普通用户无法查看")
         else:
-            # 未屏蔽的插件，所有用户都可以查看
-            result = format_plugin_detail(plugin_info)
-            await findplugins.finish(result)
+            # 未屏蔽的插件，所有用户都可以查看，超级用户额外看到事件响应器明细
+            await findplugins.finish(superuser_detail(entry) if is_superuser else entry.detail)
     else:
         # 插件不存在或没有元数据
         await findplugins.finish(f"未找到插件「{plugin_name}」的信息.")
 
+def superuser_detail(entry) -> str:
+    """插件详情加上事件响应器的优先级、规则、权限和调用统计"""
+    table = format_matcher_table(entry.matchers, usage_stats)
+    if not table:
+        return entry.detail
+    return f"{entry.detail}\n\n事件响应器:\n{table}"
+
+@command_stats.handle()
+async def handle_command_stats():
+    """按累计耗时列出调用最多的命令"""
+    catalog.ensure()
+    await command_stats.finish(format_hot_paths(usage_stats, catalog.matchers, catalog.names))
+
 @hide_plugin.handle()
 async def handle_hide_plugin(event: MessageEvent, args: Message = CommandArg()):
     """
@@ -311,19 +181,17 @@ async def handle_hide_plugin(event: MessageEvent, args: Message = CommandArg()):
         await hide_plugin.finish("请指定要屏蔽的插件名称")
     
     # 验证插件是否存在
-    plugin_info = get_plugin_detail(plugin_name)
-    if not plugin_info:
+    entry = catalog.get(plugin_name)
+    if not entry:
         await hide_plugin.finish(f"未找到插件「{plugin_name}」.")
     
     # 插件存在，将其添加到屏蔽列表
-    hidden_plugins = get_hidden_plugins()
-    real_name = plugin_info["name"]
+    real_name = entry.name
     
-    if real_name in hidden_plugins:
+    if catalog.is_hidden(real_name):
         await hide_plugin.finish(f"插件「{real_name}」已经在屏蔽列表中")
     
-    hidden_plugins.add(real_name)
-    if save_hidden_plugins(hidden_plugins):
+    if catalog.hide(real_name):
         await hide_plugin.finish(f"已成功屏蔽插件「{real_name}」")
     else:
         await hide_plugin.finish(f"屏蔽插件「{real_name}」失败，请检查日志")
@@ -339,20 +207,13 @@ async def handle_show_plugin(event: MessageEvent, args: Message = CommandArg()):
     if not plugin_name:
         await show_plugin.finish("请指定要取消屏蔽的插件名称")
     
-    # 获取所有插件，包括被屏蔽的
-    hidden_plugins = get_hidden_plugins()
-    
     # 尝试查找插件（即使被屏蔽了）
-    plugin_info = get_plugin_detail(plugin_name)
-    real_name = plugin_name  # 默认使用输入名称
-    
-    if plugin_info:
-        real_name = plugin_info["name"]
+    entry = catalog.get(plugin_name)
+    real_name = entry.name if entry else plugin_name  # 默认使用输入名称
     
     # 如果插件名在屏蔽列表中，移除它
-    if real_name in hidden_plugins:
-        hidden_plugins.remove(real_name)
-        if save_hidden_plugins(hidden_plugins):
+    if catalog.is_hidden(real_name):
+        if catalog.unhide(real_name):
             await show_plugin.finish(f"已成功取消屏蔽插件「{real_name}」")
         else:
             await show_plugin.finish(f"取消屏蔽插件「{real_name}」失败，请检查日志")
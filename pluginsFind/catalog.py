@@ -0,0 +1,262 @@
+'''
+插件目录
+
+启动后（所有插件加载完成）建立一次，保存在内存中：
+- 插件显示名称（metadata.name）到插件信息的映射
+- 格式化好的插件列表（普通用户和超级用户各一份）和每个插件的详情
+- 屏蔽的插件集合，只在启动时读取一次 hidden_plugins.txt
+- 插件搜索索引（见 search.py）
+- 每个插件注册的事件响应器（见 matchers.py）
+
+之后只有两种情况需要更新：
+- 已加载的插件数量变化时重新建立整个目录
+- 屏蔽列表变化时只重新生成插件列表
+'''
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import nonebot
+from nonebot.log import logger
+
+from .matchers import MatcherInfo, format_commands, index_matchers
+from .search import SearchIndex, extract_commands
+
+
+class PluginEntry:
+    '''单个带元数据的插件'''
+
+    __slots__ = ('plugin_id', 'name', 'description', 'usage', 'type', 'extra', 'matchers', 'commands',
+                 'detail')
+
+    def __init__(self, plugin_id: str, name: str, description: str, usage: str, type_: Optional[str],
+                 extra: dict, matchers: List[MatcherInfo]):
+        self.plugin_id = plugin_id
+        self.name = name
+        self.description = description
+        self.usage = usage
+        self.type = type_
+        self.extra = extra
+        self.matchers = matchers
+        # 注册的命令在前，再补充用法文本中提到的
+        self.commands: List[str] = []
+        for command in [c for m in matchers for c in m.commands] + extract_commands(usage):
+            if command not in self.commands:
+                self.commands.append(command)
+        self.detail = format_plugin_detail(self)
+
+
+def format_plugin_list(entries: List[PluginEntry]) -> str:
+    """
+    格式化插件列表为简洁易读的字符串
+    :param entries: 插件列表
+    :return: 格式化后的字符串
+    """
+    if not entries:
+        return "暂无可用插件信息"
+
+    result = f"已安装的插件列表 | 共{len(entries)} 个\n\n"
+    for i, entry in enumerate(entries, start=1):
+        result += f"{i}. {entry.name}\n"
+
+    result += "\n详细用法➡️「/插件信息 插件名」"
+
+    return result
+
+
+def format_all_plugin_list(entries: List[PluginEntry], hidden: Set[str]) -> str:
+    """
+    格式化所有插件列表，包括被屏蔽的插件，专供超级用户使用
+    :param entries: 插件列表
+    :param hidden: 屏蔽的插件名称
+    :return: 格式化后的字符串
+    """
+    if not entries:
+        return "暂无可用插件信息"
+
+    hidden_count = sum(1 for entry in entries if entry.name in hidden)
+    visible_count = len(entries) - hidden_count
+
+    result = f"已安装的插件列表 (总计 {len(entries)} 个，其中 {visible_count} 个可见，{hidden_count} 个已屏蔽)：\n\n"
+
+    for i, entry in enumerate(entries, start=1):
+        status = "🔒" if entry.name in hidden else "✅"
+        result += f"{i}. {status} {entry.name} - {entry.description}\n"
+
+    result += f"\n详细用法➡️「/菜单 插件名」"
+
+    return result
+
+
+def format_search_results(entries: List[PluginEntry]) -> str:
+    """
+    格式化搜索到的多个候选插件
+    :param entries: 按匹配程度排列的插件
+    :return: 格式化后的字符串
+    """
+    result = "找到以下相关插件：\n\n"
+    for i, entry in enumerate(entries, start=1):
+        result += f"{i}. {entry.name} - {entry.description}\n"
+
+    result += "\n详细用法➡️「/菜单 插件名」"
+
+    return result
+
+
+def format_plugin_detail(entry: PluginEntry) -> str:
+    """
+    格式化插件详情为简洁易读的字符串
+    :param entry: 插件信息
+    :return: 格式化后的字符串
+    """
+    result = f"【{entry.name}】\n"
+    result += f"{entry.description}\n\n"
+    result += f"使用方法:\n{entry.usage}"
+
+    commands = format_commands(entry.matchers)
+    if commands:
+        result += f"\n\n命令:\n{commands}"
+
+    return result
+
+
+class PluginCatalog:
+    '''插件目录'''
+
+    def __init__(self, hidden_file: Path):
+        self.hidden_file = hidden_file
+        self.hidden: Set[str] = self._load_hidden()
+        # 显示名称 -> 插件信息，按插件ID排序
+        self.entries: Dict[str, PluginEntry] = {}
+        self.index = SearchIndex()
+        # 所有插件（包括没有元数据的）的事件响应器，标识 -> 信息
+        self.matchers: Dict[str, MatcherInfo] = {}
+        # 插件ID -> 显示名称，没有元数据的插件用插件ID
+        self.names: Dict[str, str] = {}
+        self._plugin_count = -1
+        self._list_text = ""
+        self._all_list_text = ""
+
+    def _load_hidden(self) -> Set[str]:
+        """
+        读取屏蔽的插件列表，只在启动时调用一次
+        :return: 屏蔽插件名称集合
+        """
+        hidden_plugins = set()
+        if self.hidden_file.exists():
+            try:
+                with open(self.hidden_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        plugin = line.strip()
+                        if plugin:
+                            hidden_plugins.add(plugin)
+            except Exception as e:
+                logger.error(f"读取屏蔽插件列表失败: {e}")
+        return hidden_plugins
+
+    def _save_hidden(self) -> bool:
+        """
+        保存屏蔽的插件列表，先写入临时文件再替换
+        :return: 是否保存成功
+        """
+        tmp_file = self.hidden_file.with_suffix(".tmp")
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                for plugin in sorted(self.hidden):
+                    f.write(f"{plugin}\n")
+            os.replace(tmp_file, self.hidden_file)
+            return True
+        except Exception as e:
+            logger.error(f"保存屏蔽插件列表失败: {e}")
+            return False
+
+    def build(self):
+        """遍历已加载的插件，建立目录"""
+        plugins = nonebot.get_loaded_plugins()
+        entries = {}
+        matchers = {}
+        names = {}
+        for plugin in sorted(plugins, key=lambda p: p.id_):
+            infos = index_matchers(plugin.matcher)
+            matchers.update((info.key, info) for info in infos)
+            metadata = plugin.metadata
+            names[plugin.id_] = metadata.name if metadata else plugin.id_
+            # 没有元数据的插件不加入目录
+            if metadata is None or metadata.name in entries:
+                continue
+            entries[metadata.name] = PluginEntry(
+                plugin.id_, metadata.name, metadata.description, metadata.usage, metadata.type,
+                metadata.extra or {}, infos,
+            )
+        index = SearchIndex()
+        for entry in entries.values():
+            # 插件ID（目录名）也可以搜索
+            index.add(entry.name, [entry.plugin_id, *entry.commands], entry.description, entry.usage)
+        self.entries = entries
+        self.index = index
+        self.matchers = matchers
+        self.names = names
+        self._plugin_count = len(plugins)
+        self._render_lists()
+        logger.debug(f"插件目录已建立，共 {len(entries)} 个带元数据的插件")
+
+    def _render_lists(self):
+        entries = list(self.entries.values())
+        self._list_text = format_plugin_list([e for e in entries if e.name not in self.hidden])
+        self._all_list_text = format_all_plugin_list(entries, self.hidden)
+
+    def ensure(self):
+        """有新插件加载时重新建立目录"""
+        if len(nonebot.get_loaded_plugins()) != self._plugin_count:
+            self.build()
+
+    def get(self, name: str) -> Optional[PluginEntry]:
+        """通过元数据中的name精确查找插件"""
+        self.ensure()
+        return self.entries.get(name)
+
+    def search(self, query: str, superuser: bool = False, limit: int = 5) -> List[Tuple[float, PluginEntry]]:
+        """
+        模糊搜索插件，普通用户搜不到被屏蔽的插件
+        :return: 按分数从高到低排列的 (分数, 插件信息)
+        """
+        self.ensure()
+        # 多取一些，过滤掉屏蔽的插件后仍有足够的结果
+        results = self.index.search(query, limit + len(self.hidden))
+        return [
+            (score, self.entries[name]) for score, name in results
+            if superuser or name not in self.hidden
+        ][:limit]
+
+    def list_text(self, superuser: bool = False) -> str:
+        """插件列表，超级用户可以看到被屏蔽的插件"""
+        self.ensure()
+        return self._all_list_text if superuser else self._list_text
+
+    def is_hidden(self, name: str) -> bool:
+        return name in self.hidden
+
+    def hide(self, name: str) -> bool:
+        """
+        屏蔽插件
+        :return: 是否保存成功
+        """
+        self.hidden.add(name)
+        if not self._save_hidden():
+            # 保存失败时撤销，内存与文件保持一致
+            self.hidden.discard(name)
+            return False
+        self._render_lists()
+        return True
+
+    def unhide(self, name: str) -> bool:
+        """
+        取消屏蔽插件
+        :return: 是否保存成功
+        """
+        self.hidden.discard(name)
+        if not self._save_hidden():
+            self.hidden.add(name)
+            return False
+        self._render_lists()
+        return True
@@ -0,0 +1,240 @@
+'''
+事件响应器（matcher）索引和调用统计
+
+索引：遍历插件注册的事件响应器，读取 on_command 的命令和别名、正则、完全匹配的消息、
+优先级、规则和权限，/菜单 据此列出插件真实可用的命令
+
+统计：通过 run_preprocessor / run_postprocessor 记录每个事件响应器的调用次数、失败次数和处理耗时，
+只在内存中保存，重启后清零。会话中的后续消息（got/reject 产生的临时响应器）算在原响应器上
+'''
+import time
+import weakref
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional
+
+from nonebot.matcher import Matcher
+from nonebot.permission import SuperUser
+from nonebot.rule import (
+    CommandRule,
+    EndswithRule,
+    FullmatchRule,
+    KeywordsRule,
+    RegexRule,
+    ShellCommandRule,
+    StartswithRule,
+    ToMeRule,
+)
+
+# 常用权限的显示名称，键为权限检查函数名
+PERMISSION_NAMES = {
+    "_group": "群聊",
+    "_group_member": "群成员",
+    "_group_admin": "群管理员",
+    "_group_owner": "群主",
+    "_private": "私聊",
+    "_private_friend": "好友私聊",
+    "_private_group": "群临时会话",
+    "_private_other": "其他私聊",
+}
+# 计算P95时保留的最近耗时数量
+RECENT_SAMPLES = 256
+
+
+def matcher_key(matcher) -> str:
+    """事件响应器的标识：插件ID和定义所在行，临时响应器与原响应器相同"""
+    return f"{matcher.plugin_id}:{matcher._source and matcher._source.lineno}"
+
+
+def _callable_name(call) -> str:
+    return getattr(call, "__name__", None) or type(call).__name__
+
+
+class MatcherInfo:
+    '''单个事件响应器的静态信息'''
+
+    __slots__ = ('key', 'plugin_id', 'type', 'commands', 'triggers', 'rules', 'permissions',
+                 'priority', 'block', 'lineno')
+
+    def __init__(self, matcher):
+        self.key = matcher_key(matcher)
+        self.plugin_id: Optional[str] = matcher.plugin_id
+        self.type: str = matcher.type
+        self.priority: int = matcher.priority
+        self.block: bool = matcher.block
+        self.lineno: Optional[int] = matcher._source and matcher._source.lineno
+        # 命令和完全匹配的消息，可以直接发送
+        self.commands: List[str] = []
+        # 所有触发方式，包括正则、关键词等
+        self.triggers: List[str] = []
+        self.rules: List[str] = []
+        self.permissions: List[str] = []
+
+        for checker in matcher.rule.checkers:
+            self._add_rule(checker.call)
+        for checker in matcher.permission.checkers:
+            call = checker.call
+            if isinstance(call, SuperUser):
+                self.permissions.append("超级用户")
+            else:
+                name = _callable_name(call)
+                self.permissions.append(PERMISSION_NAMES.get(name, name))
+
+    def _add_rule(self, call):
+        if isinstance(call, (CommandRule, ShellCommandRule)):
+            # on_command 的命令和别名是集合，没有先后，按长度排列使主命令一般在前
+            commands = sorted((".".join(cmd) for cmd in call.cmds), key=lambda c: (len(c), c))
+            self.commands.extend(commands)
+            self.triggers.extend(commands)
+        elif isinstance(call, FullmatchRule):
+            self.commands.extend(call.msg)
+            self.triggers.extend(call.msg)
+        elif isinstance(call, RegexRule):
+            self.triggers.append(f"正则 {call.regex}")
+        elif isinstance(call, StartswithRule):
+            self.triggers.extend(f"以「{msg}」开头" for msg in call.msg)
+        elif isinstance(call, EndswithRule):
+            self.triggers.extend(f"以「{msg}」结尾" for msg in call.msg)
+        elif isinstance(call, KeywordsRule):
+            self.triggers.append("关键词 " + "、".join(call.keywords))
+        elif isinstance(call, ToMeRule):
+            self.rules.append("需要@机器人")
+        else:
+            self.rules.append(_callable_name(call))
+
+    @property
+    def title(self) -> str:
+        """用于显示的名称：命令或触发方式，都没有时用类型和行号"""
+        if self.triggers:
+            return " | ".join(self.triggers)
+        return f"{self.type}响应器(第{self.lineno}行)"
+
+
+def index_matchers(matchers: Iterable) -> List[MatcherInfo]:
+    """建立插件事件响应器的索引，按优先级和定义顺序排列，跳过临时响应器"""
+    infos = [MatcherInfo(m) for m in matchers if not m.temp]
+    return sorted(infos, key=lambda m: (m.priority, m.lineno or 0))
+
+
+class MatcherStats:
+    '''单个事件响应器的调用统计'''
+
+    __slots__ = ('count', 'errors', 'total', 'max', 'recent')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: Deque[float] = deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, elapsed: float, failed: bool):
+        self.count += 1
+        self.errors += failed
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.recent.append(elapsed)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def p95(self) -> float:
+        if not self.recent:
+            return 0.0
+        samples = sorted(self.recent)
+        return samples[max(0, int(len(samples) * 0.95) - 1)]
+
+
+class UsageStats:
+    '''所有事件响应器的调用统计'''
+
+    def __init__(self):
+        self.stats: Dict[str, MatcherStats] = {}
+        self.since = time.time()
+        # 正在运行的响应器实例 -> 开始时间
+        self._running: "weakref.WeakKeyDictionary[Matcher, float]" = weakref.WeakKeyDictionary()
+
+    def start(self, matcher: Matcher):
+        self._running[matcher] = time.perf_counter()
+
+    def finish(self, matcher: Matcher, exception: Optional[Exception]):
+        started = self._running.pop(matcher, None)
+        if started is None:
+            return
+        key = matcher_key(matcher)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = MatcherStats()
+        stats.add(time.perf_counter() - started, exception is not None)
+
+    def get(self, key: str) -> Optional[MatcherStats]:
+        return self.stats.get(key)
+
+    def hot_paths(self, limit: int = 10) -> List[tuple]:
+        """按累计耗时从高到低排列的 (标识, 统计)"""
+        return sorted(self.stats.items(), key=lambda x: x[1].total, reverse=True)[:limit]
+
+
+def format_ms(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    return f"{seconds * 1000:.1f}ms"
+
+
+def format_commands(matchers: List[MatcherInfo]) -> str:
+    """插件详情中的命令列表"""
+    lines = []
+    for info in matchers:
+        if not info.triggers:
+            continue
+        line = f"- {info.title}"
+        if info.permissions:
+            line += f"（{'/'.join(info.permissions)}）"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def format_matcher_table(matchers: List[MatcherInfo], usage: UsageStats) -> str:
+    """插件的事件响应器明细，专供超级用户使用"""
+    lines = []
+    for info in matchers:
+        lines.append(f"- {info.title}")
+        detail = f"  优先级{info.priority}{'，阻断' if info.block else ''}"
+        if info.rules:
+            detail += f"，规则:{'、'.join(info.rules)}"
+        if info.permissions:
+            detail += f"，权限:{'/'.join(info.permissions)}"
+        lines.append(detail)
+        stats = usage.get(info.key)
+        if stats:
+            lines.append(f"  调用{stats.count}次，失败{stats.errors}次，平均{format_ms(stats.mean)}，"
+                         f"P95 {format_ms(stats.p95)}")
+    return "\n".join(lines)
+
+
+def format_hot_paths(usage: UsageStats, infos: Dict[str, MatcherInfo], names: Dict[str, str],
+                     limit: int = 10) -> str:
+    """
+    按累计耗时排列的调用统计
+    :param usage: 调用统计
+    :param infos: 标识 -> 事件响应器信息
+    :param names: 插件ID -> 插件显示名称
+    :param limit: 最多显示的数量
+    """
+    hot = usage.hot_paths(limit)
+    if not hot:
+        return "暂无命令调用记录"
+
+    total = sum(s.count for s in usage.stats.values())
+    since = time.strftime("%Y-%m-%d %H:%M", time.localtime(usage.since))
+    result = f"命令调用统计（自 {since} 起）| 共 {total} 次\n\n"
+    for i, (key, stats) in enumerate(hot, start=1):
+        info = infos.get(key)
+        plugin_id = key.split(":", 1)[0]
+        title = info.title if info else key
+        result += f"{i}. 【{names.get(plugin_id, plugin_id)}】{title}\n"
+        result += (f"   调用{stats.count}次，失败{stats.errors}次，平均{format_ms(stats.mean)}，"
+                   f"P95 {format_ms(stats.p95)}，最长{format_ms(stats.max)}，累计{format_ms(stats.total)}\n")
+
+    return result.rstrip()
@@ -0,0 +1,162 @@
+'''
+插件搜索索引
+
+在插件目录建立时一起建立，覆盖插件名称、命令、描述和用法文本，支持：
+- 名称/命令的完整匹配和前缀匹配，例如 /菜单 ctf、/菜单 whois
+- 拼音全拼和首字母匹配，例如 /菜单 wj 找到「文件解读」（需要安装 pypinyin，未安装时跳过）
+- 二元组（n-gram）模糊匹配，名称和命令中的匹配权重最高，其次是描述、用法
+
+查询只做几次字典查找，不遍历插件列表
+'''
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from nonebot.log import logger
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+    logger.info("未安装pypinyin，插件搜索不支持拼音匹配")
+
+# 完整匹配和前缀匹配的基础分，按匹配到的字段区分
+KEY_SCORES = {
+    "name": 100,
+    "command": 95,
+    "pinyin": 85,
+    "initials": 80,
+}
+# 二元组匹配时各字段的权重
+GRAM_WEIGHTS = {
+    "name": 3.0,
+    "command": 3.0,
+    "description": 1.5,
+    "usage": 1.0,
+}
+MAX_GRAM_WEIGHT = max(GRAM_WEIGHTS.values())
+# 二元组匹配的满分，低于前缀匹配，只在名称和命令都对不上时起作用
+GRAM_SCORE = 50
+# 至少要有这个比例的二元组命中才算匹配
+MIN_GRAM_COVERAGE = 0.5
+# 第一名领先第二名这么多分时直接认为是要找的插件
+CLEAR_LEAD = 15
+# 直接返回详情所需的最低分数，较弱的匹配只作为候选列出
+MIN_BEST_SCORE = GRAM_SCORE
+
+# 用法文本中的命令，例如 "- /查询赛事 [权重]: ..."
+_COMMAND = re.compile(r"(?<![\w/:])/[^\s\[\]<>()（）:：,，]+")
+_SEPARATOR = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    """全角转半角、转小写，去掉空白和标点"""
+    return _SEPARATOR.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def extract_commands(usage: str) -> List[str]:
+    """从用法文本中提取以 / 开头的命令"""
+    commands = []
+    for command in _COMMAND.findall(usage or ""):
+        if command not in commands:
+            commands.append(command)
+    return commands
+
+
+def bigrams(text: str) -> Set[str]:
+    """按标点和空白分段后取二元组，不跨段"""
+    grams = set()
+    for part in _SEPARATOR.split(unicodedata.normalize("NFKC", text).lower()):
+        grams.update(part[i:i + 2] for i in range(len(part) - 1))
+    return grams
+
+
+def pinyin_keys(text: str) -> Tuple[str, str]:
+    """返回 (全拼, 首字母)，未安装pypinyin时返回空字符串"""
+    if lazy_pinyin is None or not text:
+        return "", ""
+    full = normalize("".join(lazy_pinyin(text)))
+    initials = normalize("".join(lazy_pinyin(text, style=Style.FIRST_LETTER)))
+    return full, initials
+
+
+class SearchIndex:
+    '''插件搜索索引，文档用插件显示名称标识'''
+
+    def __init__(self):
+        # 名称、命令、拼音的每个前缀 -> {插件名称: 分数}
+        self._keys: Dict[str, Dict[str, float]] = {}
+        # 二元组 -> {插件名称: 权重}
+        self._grams: Dict[str, Dict[str, float]] = {}
+
+    def _add_key(self, key: str, doc: str, base: float):
+        if not key:
+            return
+        length = len(key)
+        for i in range(1, length + 1):
+            # 完整匹配得满分，前缀按匹配长度的比例得分
+            score = base if i == length else base * (0.6 + 0.3 * i / length)
+            bucket = self._keys.setdefault(key[:i], {})
+            if score > bucket.get(doc, 0):
+                bucket[doc] = score
+
+    def _add_grams(self, text: str, doc: str, weight: float):
+        for gram in bigrams(text):
+            bucket = self._grams.setdefault(gram, {})
+            if weight > bucket.get(doc, 0):
+                bucket[doc] = weight
+
+    def add(self, name: str, commands: Iterable[str], description: str, usage: str):
+        """加入一个插件"""
+        self._add_key(normalize(name), name, KEY_SCORES["name"])
+        full, initials = pinyin_keys(name)
+        self._add_key(full, name, KEY_SCORES["pinyin"])
+        self._add_key(initials, name, KEY_SCORES["initials"])
+        self._add_grams(name, name, GRAM_WEIGHTS["name"])
+
+        for command in commands:
+            self._add_key(normalize(command), name, KEY_SCORES["command"])
+            full, initials = pinyin_keys(command)
+            # 命令的拼音比插件名称的拼音稍低
+            self._add_key(full, name, KEY_SCORES["pinyin"] - 5)
+            self._add_key(initials, name, KEY_SCORES["initials"] - 5)
+            self._add_grams(command, name, GRAM_WEIGHTS["command"])
+
+        self._add_grams(description or "", name, GRAM_WEIGHTS["description"])
+        self._add_grams(usage or "", name, GRAM_WEIGHTS["usage"])
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[float, str]]:
+        """
+        搜索插件
+        :param query: 用户输入
+        :param limit: 最多返回的数量
+        :return: 按分数从高到低排列的 (分数, 插件名称)
+        """
+        scores: Dict[str, float] = dict(self._keys.get(normalize(query), {}))
+
+        grams = bigrams(query)
+        if grams:
+            hits: Dict[str, List[float]] = {}
+            for gram in grams:
+                for doc, weight in self._grams.get(gram, {}).items():
+                    hit = hits.setdefault(doc, [0, 0.0])
+                    hit[0] += 1
+                    hit[1] += weight
+            for doc, (count, weight) in hits.items():
+                if count / len(grams) < MIN_GRAM_COVERAGE:
+                    continue
+                score = GRAM_SCORE * weight / (len(grams) * MAX_GRAM_WEIGHT)
+                if score > scores.get(doc, 0):
+                    scores[doc] = score
+
+        ranked = sorted(((score, doc) for doc, score in scores.items()), key=lambda x: (-x[0], x[1]))
+        return ranked[:limit]
+
+
+def best_match(results: List[Tuple[float, str]]) -> Optional[str]:
+    """分数足够高，并且只有一个结果或者第一名明显领先时返回它，否则需要用户从候选中选择"""
+    if not results or results[0][0] < MIN_BEST_SCORE:
+        return None
+    if len(results) == 1 or results[0][0] - results[1][0] >= CLEAR_LEAD:
+        return results[0][1]
+    return None